@@ -27,6 +27,9 @@ class Config:
     anthropic_api_key: str = os.getenv("ANTHROPIC_API_KEY", "")
     claude_model: str = "claude-3-5-sonnet-20241022"
     max_tokens: int = 1024
+    claude_max_concurrency: int = int(os.getenv("CLAUDE_MAX_CONCURRENCY", "4"))
+    claude_deadline_critical: float = float(os.getenv("CLAUDE_DEADLINE_CRITICAL", "5"))  # seconds
+    claude_deadline_default: float = float(os.getenv("CLAUDE_DEADLINE_DEFAULT", "30"))  # seconds
     
     # Monitoring Configuration
     check_interval: int = int(os.getenv("CHECK_INTERVAL", "60"))  # seconds
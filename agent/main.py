@@ -8,7 +8,7 @@ import os
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from web3 import Web3
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 import json
 from datetime import datetime
 
@@ -37,7 +37,9 @@ class LiquidationPreventionAgent:
     def __init__(self, config: Config):
         self.config = config
         self.web3 = Web3(Web3.HTTPProvider(config.rpc_url))
-        self.anthropic = Anthropic(api_key=config.anthropic_api_key)
+        self.anthropic = AsyncAnthropic(api_key=config.anthropic_api_key)
+        # Bounded pool of in-flight Claude requests
+        self.claude_limit = asyncio.Semaphore(config.claude_max_concurrency)
         
         # Initialize components
         self.monitor = PositionMonitor(self.web3, config)
@@ -128,15 +130,15 @@ Respond in JSON format:
 }}
 """
 
+        # Critical positions get a short deadline so they never wait on a slow model
+        deadline = (
+            self.config.claude_deadline_critical
+            if position.health_factor < self.config.critical_threshold
+            else self.config.claude_deadline_default
+        )
+
         try:
-            message = self.anthropic.messages.create(
-                model="claude-3-5-sonnet-20241022",
-                max_tokens=1024,
-                messages=[{
-                    "role": "user",
-                    "content": prompt
-                }]
-            )
+            message = await asyncio.wait_for(self._claude_request(prompt), deadline)
             
             response_text = message.content[0].text
             
@@ -154,11 +156,26 @@ Respond in JSON format:
             
             return recommendation
             
+        except asyncio.TimeoutError:
+            print(f"⏱️  Claude missed its {deadline:.0f}s deadline, using fallback rules")
+            return self._fallback_decision(position)
         except Exception as e:
             print(f"❌ Error getting Claude recommendation: {e}")
             # Fallback to rule-based decision
             return self._fallback_decision(position)
     
+    async def _claude_request(self, prompt: str):
+        """Send one request through the bounded request pool"""
+        async with self.claude_limit:
+            return await self.anthropic.messages.create(
+                model="claude-3-5-sonnet-20241022",
+                max_tokens=1024,
+                messages=[{
+                    "role": "user",
+                    "content": prompt
+                }]
+            )
+    
     def _fallback_decision(self, position: UserPosition) -> Dict:
         """Fallback rule-based decision if Claude API fails"""
         if position.health_factor < 1.15:
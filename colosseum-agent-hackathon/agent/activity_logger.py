@@ -1,16 +1,27 @@
 """Activity Logger — Cryptographically verified audit trail"""
+import asyncio
 import hashlib
 import json
 import os
 import time
-from dataclasses import dataclass, field
+from collections import Counter, deque
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Iterator, Optional
 
 import structlog
 
+from log_store import SegmentedLog, tail_line
+from merkle import MerkleProof, merkle_path, merkle_root, verify_proof
+
 logger = structlog.get_logger()
 
+# What happens after each group of entries is written:
+#   none  - leave it in the process buffer (flushed when full or on close)
+#   flush - hand it to the OS, so it survives a process crash
+#   fsync - force it to disk, so it survives a power loss
+DURABILITY_POLICIES = ("none", "flush", "fsync")
+
 
 @dataclass
 class ActivityEntry:
@@ -43,6 +54,53 @@ class ActivityEntry:
             "sequence": self.sequence,
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "ActivityEntry":
+        return cls(
+            timestamp=data["timestamp"],
+            action=data["action"],
+            details=data["details"],
+            entry_hash=data.get("entry_hash", ""),
+            previous_hash=data["previous_hash"],
+            sequence=data["sequence"],
+        )
+
+
+@dataclass
+class Checkpoint:
+    """Verified prefix of the log: every entry up to `sequence`, ending at byte `offset`"""
+    sequence: int
+    offset: int
+    entry_hash: str
+
+    @property
+    def entries(self) -> int:
+        return self.sequence + 1
+
+    def to_dict(self) -> dict:
+        return {"sequence": self.sequence, "offset": self.offset, "hash": self.entry_hash}
+
+
+@dataclass
+class BatchRoot:
+    """Merkle root over a sealed batch of entries, and where the batch sits in the log"""
+    batch: int
+    first_sequence: int
+    last_sequence: int
+    root: str
+    offset: int
+    end_offset: int
+
+    def to_dict(self) -> dict:
+        return {
+            "batch": self.batch,
+            "first_sequence": self.first_sequence,
+            "last_sequence": self.last_sequence,
+            "root": self.root,
+            "offset": self.offset,
+            "end_offset": self.end_offset,
+        }
+
 
 class ActivityLogger:
     """
@@ -52,29 +110,253 @@ class ActivityLogger:
     entry's hash, creating a tamper-evident chain similar to a blockchain.
     """
 
-    def __init__(self, log_dir: str = "agent/logs", agent_name: str = "solshield"):
+    def __init__(
+        self,
+        log_dir: str = "agent/logs",
+        agent_name: str = "solshield",
+        batch_size: int = 256,
+        flush_interval: float = 0.05,
+        durability: str = "flush",
+        checkpoint_interval: int = 1000,
+        merkle_batch_size: int = 256,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age: float = 86400,
+        index_interval: int = 64,
+        retain_entries: int = 1000,
+    ):
+        if durability not in DURABILITY_POLICIES:
+            raise ValueError(f"durability must be one of {DURABILITY_POLICIES}")
         self.log_dir = Path(log_dir)
         self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.store = SegmentedLog(
+            self.log_dir,
+            f"{agent_name}_activity",
+            max_segment_bytes=max_segment_bytes,
+            max_segment_age=max_segment_age,
+            index_interval=index_interval,
+        )
+        self.checkpoint_file = self.log_dir / f"{agent_name}_activity.checkpoints.jsonl"
+        self.roots_file = self.log_dir / f"{agent_name}_activity.roots.jsonl"
         self.agent_name = agent_name
         self.sequence = 0
         self.last_hash = "genesis"
-        self.entries: list[ActivityEntry] = []
+        # Only the most recent entries stay in memory; older ones are read
+        # back from the store by sequence or time range
+        self.entries: deque[ActivityEntry] = deque(maxlen=retain_entries)
+        self.action_counts: Counter[str] = Counter()
+
+        # Group commit: entries are chained immediately and written to disk
+        # by a background task once `batch_size` lines are pending or
+        # `flush_interval` seconds have passed
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self._pending: list[tuple[str, ActivityEntry]] = []
+        self._wakeup = asyncio.Event()
+        self._write_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+        self.groups_written = 0
+        self.entries_written = 0
+        self.write_errors = 0
+
+        # Verification resumes from the last verified checkpoint; one is
+        # also persisted to the sidecar every `checkpoint_interval` entries
+        self.checkpoint_interval = checkpoint_interval
+        self._verified: Optional[Checkpoint] = None
+        self._saved_sequence = -1
+
+        # Written entries are grouped into fixed batches of `merkle_batch_size`;
+        # each full batch is sealed with a Merkle root so a single entry can
+        # be proven without replaying the chain, and only roots need anchoring
+        self.merkle_batch_size = merkle_batch_size
+        self.batch_roots: dict[int, BatchRoot] = {}
+        self._batch_hashes: list[str] = []
+        self._batch_offset = 0
 
         # Load existing log if present
         self._load_existing()
+        self._load_checkpoint()
+        self._load_batches()
+
+    @property
+    def log_file(self) -> Path:
+        """The segment currently being appended to"""
+        return self.store.active.path
 
     def _load_existing(self):
-        """Load existing log entries to continue the hash chain"""
-        log_file = self.log_dir / f"{self.agent_name}_activity.jsonl"
-        if log_file.exists():
+        """Continue the hash chain from the last log entry, read from the tail"""
+        try:
+            line = self.store.last_line()
+            if line is None:
+                return
+            entry_data = json.loads(line)
+        except json.JSONDecodeError:
+            # Torn final write; fall back to the last line that parses
+            self._scan_existing()
+            return
+        except Exception as e:
+            logger.warning("log_load_error", error=str(e))
+            return
+        self.sequence = entry_data.get("sequence", 0) + 1
+        self.last_hash = entry_data.get("entry_hash", "genesis")
+
+    def _scan_existing(self):
+        try:
+            for line, _ in self.store.iter_lines():
+                entry_data = json.loads(line)
+                self.sequence = entry_data.get("sequence", 0) + 1
+                self.last_hash = entry_data.get("entry_hash", "genesis")
+        except Exception as e:
+            logger.warning("log_load_error", error=str(e))
+
+    def _load_checkpoint(self):
+        """Pick up the last persisted checkpoint, if it still matches the log"""
+        if not self.checkpoint_file.exists():
+            return
+        try:
+            with open(self.checkpoint_file, "rb") as f:
+                line = tail_line(f, f.seek(0, os.SEEK_END))
+            if line is None:
+                return
+            data = json.loads(line)
+            checkpoint = Checkpoint(data["sequence"], data["offset"], data["hash"])
+        except Exception as e:
+            logger.warning("checkpoint_load_error", error=str(e))
+            return
+        if self._checkpoint_matches(checkpoint):
+            self._verified = checkpoint
+            self._saved_sequence = checkpoint.sequence
+        else:
+            logger.warning("checkpoint_stale", sequence=checkpoint.sequence)
+
+    def _checkpoint_matches(self, checkpoint: Checkpoint) -> bool:
+        """The log still holds the checkpointed entry, ending at the checkpointed offset"""
+        try:
+            line = self.store.line_ending_at(checkpoint.offset)
+            data = json.loads(line) if line else {}
+        except (OSError, ValueError):
+            return False
+        return (
+            data.get("sequence") == checkpoint.sequence
+            and data.get("entry_hash") == checkpoint.entry_hash
+        )
+
+    def _save_checkpoint(self, checkpoint: Checkpoint):
+        if checkpoint.sequence <= self._saved_sequence:
+            return
+        self._saved_sequence = checkpoint.sequence
+        try:
+            with open(self.checkpoint_file, "a") as f:
+                f.write(json.dumps(checkpoint.to_dict()) + "\n")
+        except Exception as e:
+            logger.error("checkpoint_persist_error", error=str(e))
+
+    def _load_batches(self):
+        """Load sealed batch roots, then seal or reopen entries written since the last one"""
+        if self.roots_file.exists():
             try:
-                with open(log_file, "r") as f:
+                with open(self.roots_file, "r") as f:
                     for line in f:
-                        entry_data = json.loads(line.strip())
-                        self.sequence = entry_data.get("sequence", 0) + 1
-                        self.last_hash = entry_data.get("entry_hash", "genesis")
+                        record = BatchRoot(**json.loads(line))
+                        self.batch_roots[record.batch] = record
             except Exception as e:
-                logger.warning("log_load_error", error=str(e))
+                logger.warning("batch_roots_load_error", error=str(e))
+
+        last = self.batch_roots.get(len(self.batch_roots) - 1)
+        if last is not None and last.end_offset > self.store.size:
+            # Roots describe entries the log no longer holds; reseal from scratch
+            logger.warning("batch_roots_stale", batch=last.batch)
+            self.batch_roots.clear()
+            last = None
+        self._batch_offset = last.end_offset if last else 0
+
+        for line, end in self.store.iter_lines(self._batch_offset):
+            try:
+                entry_hash = json.loads(line)["entry_hash"]
+            except (ValueError, KeyError):
+                break
+            self._add_to_batch(entry_hash, end)
+
+    def _add_to_batch(self, entry_hash: str, end_offset: int):
+        """Add a written entry to the open batch, sealing it once full"""
+        self._batch_hashes.append(entry_hash)
+        if len(self._batch_hashes) < self.merkle_batch_size:
+            return
+        batch = len(self.batch_roots)
+        record = BatchRoot(
+            batch=batch,
+            first_sequence=batch * self.merkle_batch_size,
+            last_sequence=(batch + 1) * self.merkle_batch_size - 1,
+            root=merkle_root(self._batch_hashes),
+            offset=self._batch_offset,
+            end_offset=end_offset,
+        )
+        self.batch_roots[batch] = record
+        self._batch_hashes = []
+        self._batch_offset = end_offset
+        try:
+            with open(self.roots_file, "a") as f:
+                f.write(json.dumps(record.to_dict()) + "\n")
+                if self.durability == "fsync":
+                    f.flush()
+                    os.fsync(f.fileno())
+        except Exception as e:
+            logger.error("batch_root_persist_error", error=str(e))
+        logger.info("merkle_batch_sealed", batch=batch, root=record.root[:16])
+
+    def _sync_for_read(self):
+        """Push buffered lines to the OS so reads see them, unless a write is in flight"""
+        if not self._write_lock.locked():
+            self.store.flush()
+
+    def _read_batch_hashes(self, record: BatchRoot) -> list[str]:
+        self._sync_for_read()
+        return [
+            json.loads(line)["entry_hash"]
+            for line, _ in self.store.iter_lines(record.offset, record.end_offset)
+        ]
+
+    def prove(self, sequence: int) -> Optional[MerkleProof]:
+        """
+        Inclusion proof for entry `sequence` against its batch root.
+
+        Returns None while the entry's batch is still open, or if the log
+        no longer matches the sealed root.
+        """
+        record = self.batch_roots.get(sequence // self.merkle_batch_size)
+        if record is None:
+            return None
+        try:
+            hashes = self._read_batch_hashes(record)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("batch_read_error", batch=record.batch, error=str(e))
+            return None
+        if merkle_root(hashes) != record.root:
+            logger.error("batch_root_mismatch", batch=record.batch)
+            return None
+        index = sequence - record.first_sequence
+        return MerkleProof(
+            sequence=sequence,
+            entry_hash=hashes[index],
+            batch=record.batch,
+            root=record.root,
+            siblings=merkle_path(hashes, index),
+        )
+
+    def verify_proof(self, proof: MerkleProof) -> bool:
+        """Check a proof against this log's sealed root for its batch and position"""
+        record = self.batch_roots.get(proof.batch)
+        if record is None or record.root != proof.root:
+            return False
+        if proof.sequence // self.merkle_batch_size != proof.batch:
+            return False
+        if not record.first_sequence <= proof.sequence <= record.last_sequence:
+            return False
+        return verify_proof(
+            proof,
+            proof.sequence - record.first_sequence,
+            record.last_sequence - record.first_sequence + 1,
+        )
 
     async def log_activity(
         self,
@@ -97,9 +379,10 @@ class ActivityLogger:
         self.last_hash = entry.entry_hash
         self.sequence += 1
         self.entries.append(entry)
+        self.action_counts[action] += 1
 
-        # Persist to disk
-        await self._persist_entry(entry)
+        # Queue for the background writer
+        self._persist_entry(entry)
 
         logger.debug(
             "activity_logged",
@@ -110,69 +393,165 @@ class ActivityLogger:
 
         return entry
 
-    async def _persist_entry(self, entry: ActivityEntry):
-        """Append entry to JSONL log file"""
-        log_file = self.log_dir / f"{self.agent_name}_activity.jsonl"
+    def _persist_entry(self, entry: ActivityEntry):
+        """Queue entry for the next group commit, starting the writer if idle"""
+        self._pending.append((json.dumps(entry.to_dict()) + "\n", entry))
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run_writer())
+
+    async def _run_writer(self):
+        """Write pending entries in groups until the queue drains"""
         try:
-            with open(log_file, "a") as f:
-                f.write(json.dumps(entry.to_dict()) + "\n")
-        except Exception as e:
-            logger.error("log_persist_error", error=str(e))
+            while self._pending:
+                if len(self._pending) < self.batch_size:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                await self._write_pending(self.durability)
+        finally:
+            self._writer = None
 
-    async def verify_integrity(self) -> tuple[bool, int]:
+    async def _write_pending(self, durability: str):
+        async with self._write_lock:
+            group, self._pending = self._pending, []
+            if not group:
+                return
+            # json.dumps escapes non-ASCII, so lines are safe to count in bytes
+            lines = [line for line, _ in group]
+            keys = [(entry.sequence, entry.timestamp) for _, entry in group]
+            try:
+                # File I/O runs off the event loop; the lock keeps groups in order
+                ends = await asyncio.to_thread(self.store.append, lines, keys, durability)
+                self.groups_written += 1
+                self.entries_written += len(lines)
+            except Exception as e:
+                self.write_errors += 1
+                logger.error("log_persist_error", error=str(e), entries=len(lines))
+                return
+            # Batches only cover entries that reached the file
+            for (_, entry), end in zip(group, ends):
+                self._add_to_batch(entry.entry_hash, end)
+
+    async def flush(self):
+        """Write every pending entry and hand it to the OS (fsync under that policy)"""
+        durability = "fsync" if self.durability == "fsync" else "flush"
+        await self._write_pending(durability)
+        if self.durability != "fsync":
+            async with self._write_lock:
+                await asyncio.to_thread(self.store.flush)
+
+    async def close(self):
+        """Flush pending entries, stop the writer and close the file"""
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+        self.store.close()
+
+    def read(self, sequence: int) -> Optional[ActivityEntry]:
+        """Entry by sequence, from memory when recent, otherwise via the store's index"""
+        if self.entries and self.entries[0].sequence <= sequence <= self.entries[-1].sequence:
+            return self.entries[sequence - self.entries[0].sequence]
+        self._sync_for_read()
+        data = self.store.read(sequence)
+        return ActivityEntry.from_dict(data) if data else None
+
+    def iter_range(self, start_time: float, end_time: float) -> Iterator[ActivityEntry]:
+        """Written entries with `start_time <= timestamp < end_time`, streamed from the store"""
+        self._sync_for_read()
+        for data in self.store.iter_range(start_time, end_time):
+            yield ActivityEntry.from_dict(data)
+
+    def get_stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "groups_written": self.groups_written,
+            "entries_written": self.entries_written,
+            "write_errors": self.write_errors,
+            "durability": self.durability,
+            "verified_entries": self._verified.entries if self._verified else 0,
+            "sealed_batches": len(self.batch_roots),
+            "segments": len(self.store.segments),
+            "index_points": self.store.index_points,
+            "retained_entries": len(self.entries),
+        }
+
+    async def verify_integrity(self, full: bool = False) -> tuple[bool, int]:
         """
         Verify the hash chain integrity of the activity log.
         Returns (is_valid, num_entries_verified).
+
+        Only entries after the last verified checkpoint are re-hashed,
+        unless `full` is set, which re-verifies from genesis.
         """
-        log_file = self.log_dir / f"{self.agent_name}_activity.jsonl"
-        if not log_file.exists():
-            return True, 0
-
-        previous_hash = "genesis"
-        count = 0
-
-        with open(log_file, "r") as f:
-            for line in f:
-                entry_data = json.loads(line.strip())
-                entry = ActivityEntry(
-                    timestamp=entry_data["timestamp"],
-                    action=entry_data["action"],
-                    details=entry_data["details"],
-                    previous_hash=entry_data["previous_hash"],
-                    sequence=entry_data["sequence"],
+        await self.flush()
+
+        checkpoint = None if full else self._verified
+        if checkpoint is not None and not self._checkpoint_matches(checkpoint):
+            # The log was truncated or rewritten under the checkpoint
+            logger.error("checkpoint_mismatch", sequence=checkpoint.sequence)
+            return False, 0
+
+        if checkpoint is None:
+            previous_hash, count, offset = "genesis", 0, 0
+        else:
+            previous_hash, count, offset = checkpoint.entry_hash, checkpoint.entries, checkpoint.offset
+        verified = checkpoint
+
+        for line, offset in self.store.iter_lines(offset):
+            try:
+                entry_data = json.loads(line)
+            except json.JSONDecodeError:
+                logger.error("log_line_unparseable", offset=offset - len(line))
+                return False, count
+            entry = ActivityEntry(
+                timestamp=entry_data["timestamp"],
+                action=entry_data["action"],
+                details=entry_data["details"],
+                previous_hash=entry_data["previous_hash"],
+                sequence=entry_data["sequence"],
+            )
+
+            # Verify previous hash chain
+            if entry.previous_hash != previous_hash:
+                logger.error(
+                    "integrity_violation",
+                    sequence=entry.sequence,
+                    expected=previous_hash,
+                    got=entry.previous_hash,
+                )
+                return False, count
+
+            # Verify entry hash
+            computed = entry.compute_hash()
+            if computed != entry_data["entry_hash"]:
+                logger.error(
+                    "hash_mismatch",
+                    sequence=entry.sequence,
+                    expected=entry_data["entry_hash"],
+                    computed=computed,
                 )
+                return False, count
 
-                # Verify previous hash chain
-                if entry.previous_hash != previous_hash:
-                    logger.error(
-                        "integrity_violation",
-                        sequence=entry.sequence,
-                        expected=previous_hash,
-                        got=entry.previous_hash,
-                    )
-                    return False, count
-
-                # Verify entry hash
-                computed = entry.compute_hash()
-                if computed != entry_data["entry_hash"]:
-                    logger.error(
-                        "hash_mismatch",
-                        sequence=entry.sequence,
-                        expected=entry_data["entry_hash"],
-                        computed=computed,
-                    )
-                    return False, count
-
-                previous_hash = entry_data["entry_hash"]
-                count += 1
+            previous_hash = entry_data["entry_hash"]
+            count += 1
+            verified = Checkpoint(entry.sequence, offset, previous_hash)
+            if count % self.checkpoint_interval == 0:
+                self._save_checkpoint(verified)
 
+        self._verified = verified
         return True, count
 
     async def get_summary(self) -> dict:
         """Get a summary of all logged activities"""
-        actions = {}
-        for entry in self.entries:
-            actions[entry.action] = actions.get(entry.action, 0) + 1
+        actions = dict(self.action_counts)
 
         is_valid, count = await self.verify_integrity()
 
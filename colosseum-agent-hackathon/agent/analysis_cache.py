@@ -0,0 +1,116 @@
+"""Analysis Cache — Reuse Claude analyses while a position is materially unchanged"""
+import hashlib
+import math
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Optional
+
+from protocols.base import PositionData
+
+if TYPE_CHECKING:
+    from analyzer import AnalysisResult
+
+
+def _value_bucket(value: float, tolerance: float) -> int:
+    """Log-scale bucket: values within ~`tolerance` of each other share one"""
+    if value <= 0:
+        return -1
+    return round(math.log(value) / math.log1p(tolerance))
+
+
+def _composition(assets, share_step: float) -> tuple:
+    total = sum(a.value_usd for a in assets)
+    if total <= 0:
+        return tuple(sorted(a.mint for a in assets))
+    return tuple(sorted((a.mint, round(a.value_usd / total / share_step)) for a in assets))
+
+
+def position_fingerprint(
+    position: PositionData,
+    market_context: Optional[str] = None,
+    hf_step: float = 0.02,
+    value_tolerance: float = 0.02,
+    share_step: float = 0.05,
+) -> str:
+    """
+    Quantized content hash of everything the analysis prompt depends on.
+
+    Health factor is bucketed in steps of `hf_step`, USD totals on a log
+    scale of `value_tolerance`, and asset mix by share of value in steps of
+    `share_step`, so small drifts between cycles keep the same key.
+    """
+    hf = position.health_factor
+    parts = (
+        position.protocol.value,
+        position.obligation_key,
+        position.risk_level.value,
+        math.floor(hf / hf_step) if math.isfinite(hf) else "inf",
+        _value_bucket(position.total_collateral_usd, value_tolerance),
+        _value_bucket(position.total_debt_usd, value_tolerance),
+        _composition(position.collaterals, share_step),
+        _composition(position.debts, share_step),
+        hashlib.sha256((market_context or "").encode()).hexdigest(),
+    )
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+class AnalysisCache:
+    """LRU cache of analyses keyed on position fingerprint, with a TTL"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = 120,
+        max_entries: int = 1024,
+        hf_step: float = 0.02,
+        value_tolerance: float = 0.02,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hf_step = hf_step
+        self.value_tolerance = value_tolerance
+        self._entries: OrderedDict[str, tuple[float, "AnalysisResult"]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def fingerprint(self, position: PositionData, market_context: Optional[str] = None) -> str:
+        return position_fingerprint(
+            position, market_context, self.hf_step, self.value_tolerance
+        )
+
+    def get(self, fingerprint: str, now: Optional[float] = None) -> Optional["AnalysisResult"]:
+        now = now if now is not None else time.time()
+        entry = self._entries.get(fingerprint)
+        if entry is None or now - entry[0] >= self.ttl_seconds:
+            if entry is not None:
+                del self._entries[fingerprint]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(fingerprint)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, fingerprint: str, result: "AnalysisResult", now: Optional[float] = None):
+        now = now if now is not None else time.time()
+        self._entries[fingerprint] = (now, result)
+        self._entries.move_to_end(fingerprint)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get_stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "evictions": self.evictions,
+        }
@@ -1,15 +1,20 @@
 """Claude AI Risk Analyzer — Intelligent DeFi position analysis"""
+import asyncio
 import json
 import hashlib
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, field, replace
 from enum import Enum
-from typing import Optional
+from itertools import groupby
+from typing import Iterable, Optional
 
 import anthropic
 import structlog
 
+from analysis_cache import AnalysisCache
+from json_stream import IncrementalJsonObject
 from protocols.base import PositionData, RiskLevel
+from protocols.pricing import PriceQuote, PriceService
 
 logger = structlog.get_logger()
 
@@ -35,11 +40,19 @@ class AnalysisResult:
     urgency_score: float  # 0-1, 1 = immediate action needed
     reasoning_hash: str  # SHA-256 of reasoning for on-chain attestation
     timestamp: float
+    # Set while reasoning is still streaming; resolved once it and its hash are filled in
+    reasoning_pending: Optional[asyncio.Future] = field(default=None, repr=False, compare=False)
 
     @property
     def needs_action(self) -> bool:
         return self.strategy != RebalanceStrategy.NO_ACTION
 
+    async def finalize(self) -> "AnalysisResult":
+        """Wait until `reasoning` and `reasoning_hash` are complete"""
+        if self.reasoning_pending is not None:
+            await asyncio.shield(self.reasoning_pending)
+        return self
+
     def to_dict(self) -> dict:
         return {
             "position_key": self.position_key,
@@ -81,25 +94,77 @@ Rebalancing strategies available:
 IMPORTANT: Be conservative. False positives (unnecessary rebalances) waste gas.
 Only recommend action when health factor is genuinely at risk.
 
-Respond in JSON format:
+Respond in JSON format, with the fields in this order:
 {
-    "risk_assessment": "detailed risk analysis",
     "strategy": "one of the strategy enums",
-    "reasoning": "step-by-step reasoning for the recommendation",
     "confidence": 0.0-1.0,
     "suggested_amount_usd": 0.0,
     "urgency_score": 0.0-1.0,
+    "risk_assessment": "detailed risk analysis",
+    "reasoning": "step-by-step reasoning for the recommendation",
     "market_context": "relevant market observations"
 }"""
 
+# Fields needed to act on a streamed response; the rest can arrive later
+DECISION_FIELDS = ("strategy", "confidence", "suggested_amount_usd", "urgency_score")
+
+
+THRESHOLDS = """## Thresholds
+- Warning: Health Factor < 1.5
+- Critical: Health Factor < 1.2  
+- Emergency: Health Factor < 1.05
+- Liquidation: Health Factor < 1.0
+"""
+
+BATCH_TASK = """
+## Task
+Analyze each position and provide your recommendations as a JSON array with
+one object per position, each in the specified JSON format plus an
+"obligation_key" field copied from the position heading:
+[{"obligation_key": "...", "strategy": "...", ...}]
+Consider: current health factor, collateral composition, debt levels, and market conditions.
+"""
+
+# Output budget for batched requests
+BATCH_TOKENS_PER_POSITION = 512
+MAX_BATCH_TOKENS = 8192
+
+# Seconds an analysis may take, queueing included, before the rule-based
+# fallback is used instead
+DEFAULT_DEADLINES = {
+    RiskLevel.EMERGENCY: 3.0,
+    RiskLevel.CRITICAL: 8.0,
+    RiskLevel.WARNING: 20.0,
+    RiskLevel.HEALTHY: 30.0,
+}
+
 
 class ClaudeAnalyzer:
     """Claude AI-powered risk analysis engine"""
 
-    def __init__(self, api_key: str, model: str = "claude-sonnet-4-20250514"):
-        self.client = anthropic.Anthropic(api_key=api_key)
+    def __init__(
+        self,
+        api_key: str,
+        model: str = "claude-sonnet-4-20250514",
+        prices: Optional[PriceService] = None,
+        cache: Optional[AnalysisCache] = None,
+        batch_size: int = 12,
+        max_concurrent_requests: int = 4,
+        deadlines: Optional[dict[RiskLevel, float]] = None,
+        stream_levels: Iterable[RiskLevel] = (RiskLevel.EMERGENCY, RiskLevel.CRITICAL),
+    ):
+        self.client = anthropic.AsyncAnthropic(api_key=api_key)
         self.model = model
+        self.prices = prices
+        self.cache = cache
+        self.batch_size = batch_size
+        self.deadlines = {**DEFAULT_DEADLINES, **(deadlines or {})}
+        self._request_limit = asyncio.Semaphore(max_concurrent_requests)
+        # Urgent levels are analyzed one position per streamed request
+        self.stream_levels = frozenset(stream_levels)
+        self._streams: set[asyncio.Task] = set()
         self.analysis_count = 0
+        self.deadline_misses = 0
 
     async def analyze_position(
         self,
@@ -107,20 +172,129 @@ class ClaudeAnalyzer:
         market_context: Optional[str] = None,
     ) -> AnalysisResult:
         """Analyze a DeFi position and recommend rebalancing strategy"""
-        
-        prompt = self._build_analysis_prompt(position, market_context)
+        fingerprint = None
+        if self.cache is not None:
+            fingerprint = self.cache.fingerprint(position, market_context)
+            cached = self._cached(position, fingerprint)
+            if cached is not None:
+                return cached
+        return await self._analyze_one(position, market_context, fingerprint)
+
+    async def analyze_positions(
+        self,
+        positions: list[PositionData],
+        market_context: Optional[str] = None,
+        batch_size: Optional[int] = None,
+    ) -> list[AnalysisResult]:
+        """
+        Analyze many positions with one request per `batch_size` of them.
+
+        Results are returned in input order. Cached positions skip the
+        request, positions at a streamed risk level get a request each,
+        and positions missing from a response get the rule-based fallback.
+        """
+        batch_size = batch_size or self.batch_size
+        results: dict[int, AnalysisResult] = {}
+        fingerprints: dict[int, Optional[str]] = {}
+        pending = []
+        for i, position in enumerate(positions):
+            fingerprints[i] = None
+            if self.cache is not None:
+                fingerprints[i] = self.cache.fingerprint(position, market_context)
+                cached = self._cached(position, fingerprints[i])
+                if cached is not None:
+                    results[i] = cached
+                    continue
+            pending.append(i)
+
+        # Batches never mix risk levels, so a slow warning batch cannot hold
+        # an emergency to the warning deadline
+        chunks = []
+        for level, group in groupby(pending, key=lambda i: positions[i].risk_level):
+            group = list(group)
+            size = 1 if level in self.stream_levels else batch_size
+            chunks.extend(group[j:j + size] for j in range(0, len(group), size))
+
+        async def run(chunk: list[int]) -> list[AnalysisResult]:
+            if len(chunk) == 1:
+                i = chunk[0]
+                return [await self._analyze_one(positions[i], market_context, fingerprints[i])]
+            return await self._analyze_batch(
+                [positions[i] for i in chunk], market_context, [fingerprints[i] for i in chunk]
+            )
 
-        try:
-            response = self.client.messages.create(
+        # Batches run concurrently, bounded by the request pool
+        for chunk, batch in zip(chunks, await asyncio.gather(*(run(c) for c in chunks))):
+            results.update(zip(chunk, batch))
+
+        return [results[i] for i in range(len(positions))]
+
+    def deadline_for(self, positions: list[PositionData]) -> float:
+        """Deadline of the most urgent position in a request"""
+        default = self.deadlines[RiskLevel.HEALTHY]
+        return min(self.deadlines.get(p.risk_level, default) for p in positions)
+
+    async def _request(self, prompt: str, max_tokens: int) -> str:
+        async with self._request_limit:
+            response = await self.client.messages.create(
                 model=self.model,
-                max_tokens=2048,
+                max_tokens=max_tokens,
                 temperature=0.1,
                 system=SYSTEM_PROMPT,
                 messages=[{"role": "user", "content": prompt}],
             )
+        return response.content[0].text
+
+    def _cached(self, position: PositionData, fingerprint: str) -> Optional[AnalysisResult]:
+        cached = self.cache.get(fingerprint)
+        if cached is None:
+            return None
+        logger.debug("ai_analysis_cache_hit", position=position.obligation_key[:16])
+        return replace(cached, risk_level=position.risk_level, timestamp=time.time())
+
+    async def _quotes(self, positions: list[PositionData]) -> Optional[dict[str, PriceQuote]]:
+        if self.prices is None:
+            return None
+        mints = set()
+        for position in positions:
+            mints.update(c.mint for c in position.collaterals)
+            mints.update(d.mint for d in position.debts)
+        return await self.prices.get_prices(mints)
+
+    async def _analyze_one(
+        self,
+        position: PositionData,
+        market_context: Optional[str],
+        fingerprint: Optional[str],
+    ) -> AnalysisResult:
+        deadline = self.deadline_for([position])
+        try:
+            return await asyncio.wait_for(
+                self._request_one(position, market_context, fingerprint), deadline
+            )
+        except asyncio.TimeoutError:
+            self._missed_deadline([position], deadline)
+            return self._fallback_analysis(position)
 
-            response_text = response.content[0].text
-            result = self._parse_response(response_text, position)
+    async def _request_one(
+        self,
+        position: PositionData,
+        market_context: Optional[str],
+        fingerprint: Optional[str],
+    ) -> AnalysisResult:
+        quotes = await self._quotes([position])
+        prompt = self._build_analysis_prompt(position, market_context, quotes)
+
+        try:
+            if position.risk_level in self.stream_levels:
+                result = await self._stream_one(prompt, position, fingerprint)
+            else:
+                response_text = await self._request(prompt, max_tokens=2048)
+                result = self._parse_response(response_text, position)
+                if result is not None and fingerprint is not None:
+                    self.cache.put(fingerprint, result)
+            if result is None:
+                return self._fallback_analysis(position)
             self.analysis_count += 1
 
             logger.info(
@@ -138,8 +312,144 @@ class ClaudeAnalyzer:
             # Fallback to rule-based analysis
             return self._fallback_analysis(position)
 
+    async def _stream_one(
+        self, prompt: str, position: PositionData, fingerprint: Optional[str]
+    ) -> Optional[AnalysisResult]:
+        """
+        Stream the response and return as soon as the decision fields parse.
+
+        Reasoning keeps streaming in the background; the result's
+        `finalize()` waits for it and its hash.
+        """
+        early = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(self._stream_response(prompt, position, fingerprint, early))
+        self._streams.add(task)
+        task.add_done_callback(self._streams.discard)
+        try:
+            return await asyncio.shield(early)
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+
+    async def _stream_response(
+        self,
+        prompt: str,
+        position: PositionData,
+        fingerprint: Optional[str],
+        early: asyncio.Future,
+    ):
+        parser = IncrementalJsonObject()
+        result: Optional[AnalysisResult] = None
+        try:
+            async with self._request_limit:
+                async with self.client.messages.stream(
+                    model=self.model,
+                    max_tokens=2048,
+                    temperature=0.1,
+                    system=SYSTEM_PROMPT,
+                    messages=[{"role": "user", "content": prompt}],
+                ) as stream:
+                    async for text in stream.text_stream:
+                        parser.feed(text)
+                        if result is None and parser.has_all(DECISION_FIELDS):
+                            result = self._result_from_data(parser.fields, position, "")
+                            result.reasoning_pending = asyncio.get_running_loop().create_future()
+                            early.set_result(result)
+                            logger.debug(
+                                "ai_analysis_early_commit",
+                                position=position.obligation_key[:16],
+                                chars=len(parser.text),
+                            )
+            if result is None:
+                # Decision fields never completed on their own; parse the whole text
+                early.set_result(self._parse_response(parser.text, position))
+        except Exception as e:
+            if result is None:
+                if not early.done():
+                    early.set_exception(e)
+                return
+            logger.warning("ai_stream_interrupted", position=position.obligation_key[:16], error=str(e))
+        finally:
+            if result is not None:
+                self._finish_reasoning(result, parser, position, fingerprint)
+            elif not early.done():
+                # Cancelled before anything parsed; let the caller fall back now
+                early.set_result(None)
+
+    def _finish_reasoning(
+        self,
+        result: AnalysisResult,
+        parser: IncrementalJsonObject,
+        position: PositionData,
+        fingerprint: Optional[str],
+    ):
+        """Fill in streamed reasoning and its hash, then release `finalize()` waiters"""
+        complete = self._result_from_data(parser.fields, position, parser.text)
+        result.reasoning = complete.reasoning
+        result.reasoning_hash = complete.reasoning_hash
+        result.reasoning_pending.set_result(None)
+        if fingerprint is not None and parser.done:
+            self.cache.put(fingerprint, replace(result, reasoning_pending=None))
+
+    async def _analyze_batch(
+        self,
+        positions: list[PositionData],
+        market_context: Optional[str],
+        fingerprints: list[Optional[str]],
+    ) -> list[AnalysisResult]:
+        """One request for several positions; unanswered ones fall back"""
+        deadline = self.deadline_for(positions)
+        parsed: dict[str, AnalysisResult] = {}
+        try:
+            parsed = await asyncio.wait_for(self._request_batch(positions, market_context), deadline)
+        except asyncio.TimeoutError:
+            self._missed_deadline(positions, deadline)
+        except Exception as e:
+            logger.error("ai_batch_analysis_error", positions=len(positions), error=str(e))
+
+        results = []
+        for position, fingerprint in zip(positions, fingerprints):
+            result = parsed.get(position.obligation_key)
+            if result is None:
+                results.append(self._fallback_analysis(position))
+                continue
+            self.analysis_count += 1
+            if fingerprint is not None:
+                self.cache.put(fingerprint, result)
+            results.append(result)
+
+        logger.info(
+            "ai_batch_analysis_complete",
+            positions=len(positions),
+            answered=len(parsed),
+            fallbacks=len(positions) - len(parsed),
+        )
+        return results
+
+    async def _request_batch(
+        self, positions: list[PositionData], market_context: Optional[str]
+    ) -> dict[str, AnalysisResult]:
+        quotes = await self._quotes(positions)
+        prompt = self._build_batch_prompt(positions, market_context, quotes)
+        response_text = await self._request(
+            prompt, max_tokens=min(MAX_BATCH_TOKENS, BATCH_TOKENS_PER_POSITION * len(positions))
+        )
+        return self._parse_batch_response(response_text, positions)
+
+    def _missed_deadline(self, positions: list[PositionData], deadline: float):
+        self.deadline_misses += len(positions)
+        logger.warning(
+            "ai_analysis_deadline_exceeded",
+            positions=len(positions),
+            risk_level=positions[0].risk_level.value,
+            deadline_s=deadline,
+        )
+
     def _build_analysis_prompt(
-        self, position: PositionData, market_context: Optional[str]
+        self,
+        position: PositionData,
+        market_context: Optional[str],
+        prices: Optional[dict[str, PriceQuote]] = None,
     ) -> str:
         """Build the analysis prompt for Claude"""
         prompt = f"""Analyze this Solana DeFi lending position:
@@ -147,20 +457,9 @@ class ClaudeAnalyzer:
 ## Position Details
 {position.to_risk_summary()}
 
-## Thresholds
-- Warning: Health Factor < 1.5
-- Critical: Health Factor < 1.2  
-- Emergency: Health Factor < 1.05
-- Liquidation: Health Factor < 1.0
-
-## Collateral Breakdown
+{THRESHOLDS}
 """
-        for c in position.collaterals:
-            prompt += f"- {c.symbol}: ${c.value_usd:,.2f} (LTV: {c.ltv:.0%}, Liq Threshold: {c.liquidation_threshold:.0%})\n"
-
-        prompt += "\n## Debt Breakdown\n"
-        for d in position.debts:
-            prompt += f"- {d.symbol}: ${d.value_usd:,.2f} (Borrow APY: {d.borrow_rate_apy:.2%})\n"
+        prompt += self._position_breakdown(position, prices, "##")
 
         if market_context:
             prompt += f"\n## Market Context\n{market_context}\n"
@@ -172,8 +471,53 @@ Consider: current health factor, collateral composition, debt levels, and market
 """
         return prompt
 
-    def _parse_response(self, response_text: str, position: PositionData) -> AnalysisResult:
-        """Parse Claude's response into an AnalysisResult"""
+    def _build_batch_prompt(
+        self,
+        positions: list[PositionData],
+        market_context: Optional[str],
+        prices: Optional[dict[str, PriceQuote]] = None,
+    ) -> str:
+        """Build one prompt covering several positions"""
+        prompt = f"Analyze these {len(positions)} Solana DeFi lending positions:\n\n{THRESHOLDS}"
+        for n, position in enumerate(positions, 1):
+            prompt += f"\n## Position {n}: {position.obligation_key}\n{position.to_risk_summary()}\n\n"
+            prompt += self._position_breakdown(position, prices, "###")
+
+        if market_context:
+            prompt += f"\n## Market Context\n{market_context}\n"
+
+        prompt += BATCH_TASK
+        return prompt
+
+    def _position_breakdown(
+        self,
+        position: PositionData,
+        prices: Optional[dict[str, PriceQuote]],
+        heading: str,
+    ) -> str:
+        """Collateral, debt and price sections for one position"""
+        text = f"{heading} Collateral Breakdown\n"
+        for c in position.collaterals:
+            text += f"- {c.symbol}: ${c.value_usd:,.2f} (LTV: {c.ltv:.0%}, Liq Threshold: {c.liquidation_threshold:.0%})\n"
+
+        text += f"\n{heading} Debt Breakdown\n"
+        for d in position.debts:
+            text += f"- {d.symbol}: ${d.value_usd:,.2f} (Borrow APY: {d.borrow_rate_apy:.2%})\n"
+
+        symbols = {a.mint: a.symbol for a in position.collaterals + position.debts}
+        quotes = {m: q for m, q in (prices or {}).items() if m in symbols}
+        if quotes:
+            text += f"\n{heading} Prices\n"
+            now = time.time()
+            for mint, quote in sorted(quotes.items(), key=lambda kv: symbols[kv[0]]):
+                age = "static fallback" if quote.source == "fallback" else f"{quote.age_seconds(now):.0f}s old"
+                text += f"- {symbols[mint]}: ${quote.price:,.4f} ({quote.source}, {age})\n"
+        return text
+
+    def _parse_response(
+        self, response_text: str, position: PositionData
+    ) -> Optional[AnalysisResult]:
+        """Parse Claude's response into an AnalysisResult, or None if it is malformed"""
         try:
             # Extract JSON from response
             json_start = response_text.find("{")
@@ -183,30 +527,79 @@ Consider: current health factor, collateral composition, debt levels, and market
             else:
                 raise ValueError("No JSON found in response")
 
-            reasoning = data.get("reasoning", response_text)
-            reasoning_hash = hashlib.sha256(reasoning.encode()).hexdigest()
+            return self._result_from_data(data, position, response_text)
 
-            strategy_str = data.get("strategy", "no_action")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning("ai_response_parse_error", error=str(e))
+            return None
+
+    def _parse_batch_response(
+        self, response_text: str, positions: list[PositionData]
+    ) -> dict[str, AnalysisResult]:
+        """Map a JSON-array response back to positions by obligation_key"""
+        by_key = {p.obligation_key: p for p in positions}
+        json_start = response_text.find("[")
+        json_end = response_text.rfind("]") + 1
+        if json_start < 0 or json_end <= json_start:
+            logger.warning("ai_response_parse_error", error="No JSON array found in response")
+            return {}
+        try:
+            items = json.loads(response_text[json_start:json_end])
+        except json.JSONDecodeError as e:
+            logger.warning("ai_response_parse_error", error=str(e))
+            return {}
+
+        results = {}
+        for data in items:
+            if not isinstance(data, dict):
+                continue
+            position = by_key.get(data.get("obligation_key"))
+            if position is None or position.obligation_key in results:
+                continue
             try:
-                strategy = RebalanceStrategy(strategy_str)
-            except ValueError:
-                strategy = RebalanceStrategy.NO_ACTION
-
-            return AnalysisResult(
-                position_key=position.obligation_key,
-                risk_level=position.risk_level,
-                strategy=strategy,
-                reasoning=reasoning,
-                confidence=float(data.get("confidence", 0.5)),
-                suggested_amount_usd=float(data.get("suggested_amount_usd", 0)),
-                urgency_score=float(data.get("urgency_score", 0)),
-                reasoning_hash=reasoning_hash,
-                timestamp=time.time(),
-            )
+                results[position.obligation_key] = self._result_from_data(
+                    data, position, json.dumps(data)
+                )
+            except (TypeError, ValueError) as e:
+                logger.warning(
+                    "ai_response_parse_error", position=position.obligation_key[:16], error=str(e)
+                )
+        return results
+
+    def _result_from_data(
+        self, data: dict, position: PositionData, response_text: str
+    ) -> AnalysisResult:
+        reasoning = data.get("reasoning", response_text)
+        reasoning_hash = hashlib.sha256(reasoning.encode()).hexdigest()
 
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.warning("ai_response_parse_error", error=str(e))
-            return self._fallback_analysis(position)
+        strategy_str = data.get("strategy", "no_action")
+        try:
+            strategy = RebalanceStrategy(strategy_str)
+        except ValueError:
+            strategy = RebalanceStrategy.NO_ACTION
+
+        return AnalysisResult(
+            position_key=position.obligation_key,
+            risk_level=position.risk_level,
+            strategy=strategy,
+            reasoning=reasoning,
+            confidence=float(data.get("confidence", 0.5)),
+            suggested_amount_usd=float(data.get("suggested_amount_usd", 0)),
+            urgency_score=float(data.get("urgency_score", 0)),
+            reasoning_hash=reasoning_hash,
+            timestamp=time.time(),
+        )
+
+    def get_stats(self) -> dict:
+        return {
+            "analyses": self.analysis_count,
+            "deadline_misses": self.deadline_misses,
+        }
+
+    async def close(self):
+        for task in list(self._streams):
+            task.cancel()
+        await self.client.close()
 
     def _fallback_analysis(self, position: PositionData) -> AnalysisResult:
         """Rule-based fallback when AI analysis fails"""
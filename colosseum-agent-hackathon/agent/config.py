@@ -18,6 +18,9 @@ class SolanaConfig:
         "HELIUS_WS_URL",
         "wss://api.devnet.solana.com"
     )
+    rpc_max_connections: int = int(os.getenv("RPC_MAX_CONNECTIONS", "32"))
+    rpc_batch_window_ms: float = float(os.getenv("RPC_BATCH_WINDOW_MS", "2"))
+    rpc_max_batch_size: int = int(os.getenv("RPC_MAX_BATCH_SIZE", "50"))
 
 
 @dataclass
@@ -26,6 +29,19 @@ class AIConfig:
     model: str = os.getenv("CLAUDE_MODEL", "claude-sonnet-4-20250514")
     max_tokens: int = 4096
     temperature: float = 0.1  # Low temperature for consistent risk analysis
+    # Comma-separated risk levels whose analyses stream and commit early
+    stream_levels: str = os.getenv("AI_STREAM_LEVELS", "emergency,critical")
+    fast_path_enabled: bool = os.getenv("FAST_PATH_ENABLED", "true").lower() == "true"
+    fast_path_unwind_below: float = float(os.getenv("FAST_PATH_UNWIND_BELOW", "1.02"))
+    fast_path_boundary_margin: float = float(os.getenv("FAST_PATH_BOUNDARY_MARGIN", "0.03"))
+    fast_path_max_assets: int = int(os.getenv("FAST_PATH_MAX_ASSETS", "2"))
+    analysis_batch_size: int = int(os.getenv("ANALYSIS_BATCH_SIZE", "12"))
+    max_concurrent_requests: int = int(os.getenv("AI_MAX_CONCURRENT_REQUESTS", "4"))
+    deadline_emergency_seconds: float = float(os.getenv("AI_DEADLINE_EMERGENCY_SECONDS", "3"))
+    deadline_critical_seconds: float = float(os.getenv("AI_DEADLINE_CRITICAL_SECONDS", "8"))
+    deadline_warning_seconds: float = float(os.getenv("AI_DEADLINE_WARNING_SECONDS", "20"))
+    analysis_cache_ttl_seconds: float = float(os.getenv("ANALYSIS_CACHE_TTL_SECONDS", "120"))
+    analysis_cache_max_entries: int = int(os.getenv("ANALYSIS_CACHE_MAX_ENTRIES", "1024"))
 
 
 @dataclass
@@ -41,8 +57,43 @@ class MonitoringConfig:
     health_factor_warn: float = float(os.getenv("HEALTH_FACTOR_WARN", "1.5"))
     health_factor_critical: float = float(os.getenv("HEALTH_FACTOR_CRITICAL", "1.2"))
     health_factor_emergency: float = float(os.getenv("HEALTH_FACTOR_EMERGENCY", "1.05"))
-    max_rebalance_attempts: int = 3
-    rebalance_cooldown_seconds: int = 60
+    max_rebalance_attempts: int = int(os.getenv("MAX_REBALANCE_ATTEMPTS", "3"))
+    rebalance_cooldown_seconds: int = int(os.getenv("REBALANCE_COOLDOWN_SECONDS", "60"))
+    execution_workers: int = int(os.getenv("EXECUTION_WORKERS", "4"))
+    # How long shutdown waits for in-flight rebalances before cancelling them
+    execution_drain_timeout_seconds: float = float(os.getenv("EXECUTION_DRAIN_TIMEOUT_SECONDS", "60"))
+    max_concurrent_fetches: int = int(os.getenv("MAX_CONCURRENT_FETCHES", "64"))
+    max_concurrent_per_adapter: int = int(os.getenv("MAX_CONCURRENT_PER_ADAPTER", "16"))
+    refresh_mode: bool = os.getenv("REFRESH_MODE", "true").lower() == "true"
+    rediscovery_interval_seconds: int = int(os.getenv("REDISCOVERY_INTERVAL_SECONDS", "600"))
+    monitoring_mode: str = os.getenv("MONITORING_MODE", "poll")  # "poll" or "stream"
+    stream_consistency_interval_seconds: int = int(os.getenv("STREAM_CONSISTENCY_INTERVAL_SECONDS", "300"))
+    stream_backfill_slot_gap: int = int(os.getenv("STREAM_BACKFILL_SLOT_GAP", "2"))
+    stream_rediscovery_interval_seconds: int = int(os.getenv("STREAM_REDISCOVERY_INTERVAL_SECONDS", "21600"))
+    reserve_cache_ttl_seconds: int = int(os.getenv("RESERVE_CACHE_TTL_SECONDS", "300"))
+    reserve_cache_max_slot_lag: int = int(os.getenv("RESERVE_CACHE_MAX_SLOT_LAG", "150"))
+    price_ttl_seconds: int = int(os.getenv("PRICE_TTL_SECONDS", "30"))
+    price_api_url: str = os.getenv("PRICE_API_URL", "https://api.jup.ag/price/v2")
+    recheck_min_interval_seconds: float = float(os.getenv("RECHECK_MIN_INTERVAL_SECONDS", "2"))
+    recheck_max_interval_seconds: float = float(os.getenv("RECHECK_MAX_INTERVAL_SECONDS", "300"))
+    recheck_safe_distance_pct: float = float(os.getenv("RECHECK_SAFE_DISTANCE_PCT", "60"))
+    recheck_volatility_weight: float = float(os.getenv("RECHECK_VOLATILITY_WEIGHT", "2.0"))
+    swap_slippage_bps: int = int(os.getenv("SWAP_SLIPPAGE_BPS", "50"))
+    quote_cache_size_step: float = float(os.getenv("QUOTE_CACHE_SIZE_STEP", "0.005"))
+    quote_cache_max_age_seconds: float = float(os.getenv("QUOTE_CACHE_MAX_AGE_SECONDS", "10"))
+    quote_cache_max_slot_lag: int = int(os.getenv("QUOTE_CACHE_MAX_SLOT_LAG", "25"))
+    quote_cache_refresh_interval_seconds: float = float(os.getenv("QUOTE_CACHE_REFRESH_INTERVAL_SECONDS", "4"))
+    tx_compute_unit_limit: int = int(os.getenv("TX_COMPUTE_UNIT_LIMIT", "400000"))
+    tx_priority_fee_micro_lamports: int = int(os.getenv("TX_PRIORITY_FEE_MICRO_LAMPORTS", "50000"))
+    tx_priority_fee_min: int = int(os.getenv("TX_PRIORITY_FEE_MIN", "1000"))
+    tx_priority_fee_max: int = int(os.getenv("TX_PRIORITY_FEE_MAX", "2000000"))
+    tx_priority_fee_min_percentile: float = float(os.getenv("TX_PRIORITY_FEE_MIN_PERCENTILE", "50"))
+    tx_priority_fee_max_percentile: float = float(os.getenv("TX_PRIORITY_FEE_MAX_PERCENTILE", "95"))
+    tx_priority_fee_window_slots: int = int(os.getenv("TX_PRIORITY_FEE_WINDOW_SLOTS", "300"))
+    tx_priority_fee_max_age_seconds: float = float(os.getenv("TX_PRIORITY_FEE_MAX_AGE_SECONDS", "5"))
+    tx_confirm_timeout_seconds: float = float(os.getenv("TX_CONFIRM_TIMEOUT_SECONDS", "30"))
+    tx_blockhash_max_age_seconds: float = float(os.getenv("TX_BLOCKHASH_MAX_AGE_SECONDS", "20"))
+    tx_template_ttl_seconds: float = float(os.getenv("TX_TEMPLATE_TTL_SECONDS", "120"))
 
 
 @dataclass
@@ -86,6 +137,15 @@ class AppConfig:
     protocols: ProtocolAddresses = field(default_factory=ProtocolAddresses)
     colosseum: ColosseumConfig = field(default_factory=ColosseumConfig)
     log_dir: str = os.getenv("LOG_DIR", "agent/logs")
+    log_batch_size: int = int(os.getenv("ACTIVITY_LOG_BATCH_SIZE", "256"))
+    log_flush_interval_seconds: float = float(os.getenv("ACTIVITY_LOG_FLUSH_INTERVAL_SECONDS", "0.05"))
+    log_durability: str = os.getenv("ACTIVITY_LOG_DURABILITY", "flush")  # none, flush, fsync
+    log_checkpoint_interval: int = int(os.getenv("ACTIVITY_LOG_CHECKPOINT_INTERVAL", "1000"))
+    log_merkle_batch_size: int = int(os.getenv("ACTIVITY_LOG_MERKLE_BATCH_SIZE", "256"))
+    log_segment_max_bytes: int = int(os.getenv("ACTIVITY_LOG_SEGMENT_MAX_BYTES", str(64 * 1024 * 1024)))
+    log_segment_max_age_seconds: float = float(os.getenv("ACTIVITY_LOG_SEGMENT_MAX_AGE_SECONDS", "86400"))
+    log_index_interval: int = int(os.getenv("ACTIVITY_LOG_INDEX_INTERVAL", "64"))
+    log_retain_entries: int = int(os.getenv("ACTIVITY_LOG_RETAIN_ENTRIES", "1000"))
 
 
 def get_config() -> AppConfig:
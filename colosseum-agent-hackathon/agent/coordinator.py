@@ -0,0 +1,120 @@
+"""Execution Coordinator — One rebalance at a time per position"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import structlog
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+
+@dataclass
+class PositionExecutions:
+    """Execution history of one obligation"""
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    failures: int = 0  # Consecutive failed attempts
+    last_attempt_at: float = 0.0
+    last_success_at: float = 0.0
+
+
+class ExecutionCoordinator:
+    """
+    Admits rebalances per `obligation_key`.
+
+    Each position has its own lock, so independent positions execute in
+    parallel while a position with a rebalance in flight rejects further
+    submissions instead of queueing a duplicate behind it. After a
+    success the position is left alone for `cooldown_seconds`, giving a
+    slow-confirming transaction time to show up in the next read. After
+    `max_attempts` consecutive failures it is also held off until
+    `cooldown_seconds` have passed since the last attempt, which restores
+    its budget. `bypass_cooldown` admits through the success cooldown (not
+    the attempt budget), for emergency unwinds that must not wait out an
+    earlier partial repay.
+    """
+
+    def __init__(self, max_attempts: int = 3, cooldown_seconds: float = 60):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.cooldown_seconds = cooldown_seconds
+        self._positions: dict[str, PositionExecutions] = {}
+        self.admitted = 0
+        self.rejected: dict[str, int] = {"in_flight": 0, "cooldown": 0, "attempts_exhausted": 0}
+
+    def _rejection(
+        self, state: PositionExecutions, now: float, bypass_cooldown: bool
+    ) -> Optional[str]:
+        """Why a rebalance of this position may not start now, or None if it may"""
+        if state.lock.locked():
+            return "in_flight"
+        if state.failures >= self.max_attempts:
+            if now - state.last_attempt_at < self.cooldown_seconds:
+                return "attempts_exhausted"
+            state.failures = 0
+        if not bypass_cooldown and now - state.last_success_at < self.cooldown_seconds:
+            return "cooldown"
+        return None
+
+    async def run(
+        self,
+        obligation_key: str,
+        execute: Callable[[], Awaitable[T]],
+        succeeded: Callable[[T], bool],
+        bypass_cooldown: bool = False,
+    ) -> tuple[Optional[T], Optional[str]]:
+        """
+        Run `execute` for this position if admitted.
+
+        Returns (result, None), or (None, reason) when the rebalance was
+        not started. `succeeded` classifies the result for the cooldown
+        and attempt budget; an exception counts as a failure.
+        """
+        self._prune()
+        state = self._positions.setdefault(obligation_key, PositionExecutions())
+        reason = self._rejection(state, time.time(), bypass_cooldown)
+        if reason is not None:
+            self.rejected[reason] += 1
+            logger.info("rebalance_not_admitted", position=obligation_key[:16], reason=reason)
+            return None, reason
+
+        self.admitted += 1
+        async with state.lock:
+            state.last_attempt_at = time.time()
+            ok = False
+            try:
+                result = await execute()
+                ok = succeeded(result)
+            finally:
+                if ok:
+                    state.failures = 0
+                    state.last_success_at = time.time()
+                else:
+                    state.failures += 1
+        return result, None
+
+    def _prune(self):
+        """Forget idle positions whose cooldown and failure hold-off have both passed"""
+        cutoff = time.time() - self.cooldown_seconds
+        idle = [
+            key for key, state in self._positions.items()
+            if not state.lock.locked()
+            and max(state.last_attempt_at, state.last_success_at) < cutoff
+        ]
+        for key in idle:
+            del self._positions[key]
+
+    def in_flight(self, obligation_key: str) -> bool:
+        state = self._positions.get(obligation_key)
+        return state is not None and state.lock.locked()
+
+    def get_stats(self) -> dict:
+        return {
+            "tracked": len(self._positions),
+            "in_flight": sum(s.lock.locked() for s in self._positions.values()),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
@@ -0,0 +1,167 @@
+"""Execution Queue — Prioritized, concurrent dispatch of rebalances"""
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+import structlog
+
+from analyzer import AnalysisResult, RebalanceStrategy
+from protocols.base import PositionData, RiskLevel
+
+logger = structlog.get_logger()
+
+T = TypeVar("T")
+
+
+def is_emergency(position: PositionData, analysis: AnalysisResult) -> bool:
+    return (
+        position.risk_level == RiskLevel.EMERGENCY
+        or analysis.risk_level == RiskLevel.EMERGENCY
+        or analysis.strategy == RebalanceStrategy.EMERGENCY_UNWIND
+    )
+
+
+def priority(position: PositionData, analysis: AnalysisResult) -> float:
+    """Urgency times exposure: the USD debt that a liquidation would act on"""
+    return analysis.urgency_score * position.total_debt_usd
+
+
+@dataclass(order=True)
+class QueuedExecution:
+    # (0 for emergencies else 1, -priority, submission order)
+    sort_key: tuple[int, float, int]
+    position: PositionData = field(compare=False)
+    analysis: AnalysisResult = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    queued_at: float = field(compare=False, default_factory=time.time)
+
+    @property
+    def emergency(self) -> bool:
+        return self.sort_key[0] == 0
+
+
+class ExecutionQueue(Generic[T]):
+    """
+    Runs `handler(position, analysis)` on a pool of `workers`, highest
+    priority first.
+
+    Emergencies sort ahead of everything else, then work is ordered by
+    `priority()`. Submissions made in the same event loop turn are
+    ordered together before any starts, so a batch from one cycle runs
+    most important first rather than in list order. An emergency never
+    waits for a free worker: if the pool is busy it starts anyway, over
+    the limit. Rebalances already in flight are not cancelled, as a
+    half-sent transaction is worse than a late one; `close()` waits for
+    them.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[PositionData, AnalysisResult], Awaitable[T]],
+        workers: int = 4,
+    ):
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.handler = handler
+        self.workers = workers
+        self._heap: list[QueuedExecution] = []
+        self._seq = itertools.count()
+        self._running: set[asyncio.Task] = set()
+        self._dispatch_scheduled = False
+        self._closing = False
+        self.dispatched = 0
+        self.preempted = 0
+        self.max_wait_seconds = 0.0
+
+    def submit(self, position: PositionData, analysis: AnalysisResult) -> asyncio.Future:
+        """Queue a rebalance; the returned future resolves to the handler's result"""
+        loop = asyncio.get_running_loop()
+        if self._closing:
+            future = loop.create_future()
+            future.cancel()
+            return future
+        item = QueuedExecution(
+            sort_key=(
+                0 if is_emergency(position, analysis) else 1,
+                -priority(position, analysis),
+                next(self._seq),
+            ),
+            position=position,
+            analysis=analysis,
+            future=loop.create_future(),
+        )
+        heapq.heappush(self._heap, item)
+        if not self._dispatch_scheduled:
+            self._dispatch_scheduled = True
+            loop.call_soon(self._dispatch)
+        return item.future
+
+    def _dispatch(self):
+        self._dispatch_scheduled = False
+        while self._heap:
+            top = self._heap[0]
+            if len(self._running) >= self.workers:
+                if not top.emergency:
+                    break
+                self.preempted += 1
+            heapq.heappop(self._heap)
+            self._start(top)
+
+    def _start(self, item: QueuedExecution):
+        if item.future.cancelled():
+            return
+        wait = time.time() - item.queued_at
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        self.dispatched += 1
+        task = asyncio.create_task(self.handler(item.position, item.analysis))
+        self._running.add(task)
+        task.add_done_callback(lambda t: self._finished(t, item))
+        logger.debug(
+            "execution_dispatched",
+            position=item.position.obligation_key[:16],
+            emergency=item.emergency,
+            wait_s=f"{wait:.3f}",
+        )
+
+    def _finished(self, task: asyncio.Task, item: QueuedExecution):
+        self._running.discard(task)
+        if not item.future.done():
+            if task.cancelled():
+                item.future.cancel()
+            elif task.exception() is not None:
+                item.future.set_exception(task.exception())
+            else:
+                item.future.set_result(task.result())
+        self._dispatch()
+
+    def get_stats(self) -> dict:
+        return {
+            "queued": len(self._heap),
+            "running": len(self._running),
+            "workers": self.workers,
+            "dispatched": self.dispatched,
+            "preempted": self.preempted,
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+        }
+
+    async def close(self, timeout: Optional[float] = None):
+        """
+        Drop queued rebalances and wait for those in flight to finish.
+
+        Any still running after `timeout` seconds are cancelled.
+        """
+        self._closing = True
+        for item in self._heap:
+            item.future.cancel()
+        self._heap.clear()
+        if not self._running:
+            return
+        _, pending = await asyncio.wait(set(self._running), timeout=timeout)
+        if pending:
+            logger.warning("executions_cancelled_at_shutdown", count=len(pending))
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
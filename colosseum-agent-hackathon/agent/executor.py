@@ -3,19 +3,25 @@ import hashlib
 import json
 import time
 from dataclasses import dataclass
-from typing import Optional
+from typing import Iterable, Optional
 
 import httpx
 import structlog
 
 from analyzer import RebalanceStrategy, AnalysisResult
+from coordinator import ExecutionCoordinator
+from priority_fees import PriorityFeeEstimator
 from protocols.base import PositionData
+from quote_cache import QuoteCache
+from tx_templates import TemplateCache
 
 logger = structlog.get_logger()
 
-JUPITER_QUOTE_API = "https://quote-api.jup.ag/v6/quote"
 JUPITER_SWAP_API = "https://quote-api.jup.ag/v6/swap"
 
+# Compute unit price used when no fee estimator is configured
+DEFAULT_PRIORITY_FEE = 50_000
+
 # Common Solana token mints
 TOKENS = {
     "SOL": "So11111111111111111111111111111111111111112",
@@ -27,6 +33,28 @@ TOKENS = {
 }
 
 
+def topup_mints(position: PositionData) -> tuple[str, str]:
+    """(input, output) mints for a collateral top-up: USDC into the primary collateral"""
+    output_mint = TOKENS["SOL"]  # Default to SOL as collateral
+    if position.collaterals:
+        # Use the largest collateral's token type
+        primary = max(position.collaterals, key=lambda c: c.value_usd)
+        if "SOL" in primary.symbol.upper():
+            output_mint = TOKENS["SOL"]
+        elif "MSOL" in primary.symbol.upper():
+            output_mint = TOKENS["mSOL"]
+    return TOKENS["USDC"], output_mint
+
+
+def route_accounts(quote: dict) -> list[str]:
+    """Pools a Jupiter route writes to, for sampling their priority fees"""
+    return [
+        step["swapInfo"]["ammKey"]
+        for step in quote.get("routePlan") or []
+        if step.get("swapInfo", {}).get("ammKey")
+    ]
+
+
 @dataclass
 class ExecutionResult:
     """Result of a rebalance execution"""
@@ -37,6 +65,11 @@ class ExecutionResult:
     error: Optional[str] = None
     gas_cost_sol: float = 0.0
     timestamp: float = 0.0
+    # Why the rebalance was never started (in_flight, cooldown, attempts_exhausted)
+    skipped: Optional[str] = None
+    priority_fee_micro_lamports: Optional[int] = None
+    # Seconds from submission until confirmed; None if not confirmed in time
+    landing_seconds: Optional[float] = None
 
     def to_dict(self) -> dict:
         return {
@@ -47,6 +80,9 @@ class ExecutionResult:
             "error": self.error,
             "gas_cost_sol": self.gas_cost_sol,
             "timestamp": self.timestamp,
+            "skipped": self.skipped,
+            "priority_fee_micro_lamports": self.priority_fee_micro_lamports,
+            "landing_seconds": self.landing_seconds,
         }
 
 
@@ -59,21 +95,81 @@ class RebalanceExecutor:
         wallet_api_key: str,
         wallet_id: str,
         dry_run: bool = True,
+        quotes: Optional[QuoteCache] = None,
+        templates: Optional[TemplateCache] = None,
+        coordinator: Optional[ExecutionCoordinator] = None,
+        fees: Optional[PriorityFeeEstimator] = None,
     ):
         self.rpc_url = rpc_url
         self.wallet_api_key = wallet_api_key
         self.wallet_id = wallet_id
         self.dry_run = dry_run
         self.client = httpx.AsyncClient(timeout=60)
+        self.quotes = quotes or QuoteCache()
+        self.templates = templates
+        self.coordinator = coordinator or ExecutionCoordinator()
+        self.fees = fees
         self.execution_count = 0
 
+    def prefetch_quotes(self, targets: Iterable[tuple[PositionData, float]]):
+        """Keep top-up quotes warm for (position, likely amount in USD) pairs"""
+        if self.dry_run:
+            return
+        self.quotes.track(
+            (*topup_mints(position), int(amount_usd * 1e6)) for position, amount_usd in targets
+        )
+
+    def prepare_templates(self, positions: Iterable[PositionData]):
+        """Keep repay transactions ready for positions that may need an emergency repay"""
+        if self.dry_run or self.templates is None:
+            return
+        self.templates.prepare(positions)
+
     async def execute_rebalance(
         self,
         position: PositionData,
         analysis: AnalysisResult,
     ) -> ExecutionResult:
-        """Execute a rebalancing strategy based on AI analysis"""
+        """
+        Execute a rebalancing strategy based on AI analysis.
+
+        At most one rebalance per position runs at a time, subject to the
+        coordinator's cooldown and attempt budget; a rebalance that is not
+        admitted comes back with `skipped` set.
+        """
+        if analysis.strategy == RebalanceStrategy.NO_ACTION:
+            return ExecutionResult(
+                success=True,
+                tx_signature=None,
+                strategy=analysis.strategy,
+                amount_usd=0,
+                timestamp=time.time(),
+            )
+
+        result, skipped = await self.coordinator.run(
+            position.obligation_key,
+            lambda: self._execute(position, analysis),
+            succeeded=lambda r: r.success,
+            bypass_cooldown=analysis.strategy == RebalanceStrategy.EMERGENCY_UNWIND,
+        )
+        if skipped is not None:
+            return ExecutionResult(
+                success=False,
+                tx_signature=None,
+                strategy=analysis.strategy,
+                amount_usd=0,
+                error=f"Rebalance not started: {skipped}",
+                timestamp=time.time(),
+                skipped=skipped,
+            )
+        return result
 
+    async def _execute(
+        self,
+        position: PositionData,
+        analysis: AnalysisResult,
+    ) -> ExecutionResult:
+        """Dispatch to the strategy's handler"""
         logger.info(
             "executing_rebalance",
             strategy=analysis.strategy.value,
@@ -83,15 +179,6 @@ class RebalanceExecutor:
         )
 
         try:
-            if analysis.strategy == RebalanceStrategy.NO_ACTION:
-                return ExecutionResult(
-                    success=True,
-                    tx_signature=None,
-                    strategy=analysis.strategy,
-                    amount_usd=0,
-                    timestamp=time.time(),
-                )
-
             if analysis.strategy == RebalanceStrategy.COLLATERAL_TOP_UP:
                 return await self._execute_collateral_topup(position, analysis)
             elif analysis.strategy == RebalanceStrategy.DEBT_REPAYMENT:
@@ -129,16 +216,7 @@ class RebalanceExecutor:
         """Add collateral by swapping available assets via Jupiter"""
 
         # Determine swap: convert USDC to the primary collateral asset
-        input_mint = TOKENS["USDC"]
-        output_mint = TOKENS["SOL"]  # Default to SOL as collateral
-
-        if position.collaterals:
-            # Use the largest collateral's token type
-            primary = max(position.collaterals, key=lambda c: c.value_usd)
-            if "SOL" in primary.symbol.upper():
-                output_mint = TOKENS["SOL"]
-            elif "MSOL" in primary.symbol.upper():
-                output_mint = TOKENS["mSOL"]
+        input_mint, output_mint = topup_mints(position)
 
         # Amount in USDC (6 decimals)
         amount = int(analysis.suggested_amount_usd * 1e6)
@@ -153,8 +231,9 @@ class RebalanceExecutor:
                 timestamp=time.time(),
             )
 
-        # Get Jupiter quote
-        quote = await self._get_jupiter_quote(input_mint, output_mint, amount)
+        # Prefetched quote when one is still fresh, otherwise fetched now;
+        # the amount may round up to the cache's size bucket, within slippage
+        quote, amount = await self.quotes.get_quote(input_mint, output_mint, amount)
         if not quote:
             return ExecutionResult(
                 success=False, tx_signature=None,
@@ -163,15 +242,19 @@ class RebalanceExecutor:
             )
 
         # Execute swap via AgentWallet
-        tx_sig = await self._execute_jupiter_swap(quote)
+        fee = await self._priority_fee(route_accounts(quote), analysis.urgency_score)
+        tx_sig, landing, err = await self._execute_jupiter_swap(quote, fee)
 
         self.execution_count += 1
         return ExecutionResult(
-            success=tx_sig is not None,
+            success=tx_sig is not None and err is None,
             tx_signature=tx_sig,
             strategy=analysis.strategy,
-            amount_usd=analysis.suggested_amount_usd,
+            amount_usd=amount / 1e6,
             timestamp=time.time(),
+            priority_fee_micro_lamports=fee,
+            landing_seconds=landing,
+            error=err,
         )
 
     async def _execute_debt_repayment(
@@ -197,6 +280,10 @@ class RebalanceExecutor:
             amount=analysis.suggested_amount_usd,
         )
 
+        result = await self._send_repay_template(position, analysis, analysis.suggested_amount_usd)
+        if result is not None:
+            return result
+
         # Placeholder for actual protocol interaction
         return ExecutionResult(
             success=True,
@@ -224,7 +311,7 @@ class RebalanceExecutor:
 
         # Swap SOL collateral to USDC via Jupiter
         amount = int(analysis.suggested_amount_usd * 1e9 / 100)  # Approximate SOL amount
-        quote = await self._get_jupiter_quote(TOKENS["SOL"], TOKENS["USDC"], amount)
+        quote, _ = await self.quotes.get_quote(TOKENS["SOL"], TOKENS["USDC"], amount)
 
         if not quote:
             return ExecutionResult(
@@ -234,15 +321,19 @@ class RebalanceExecutor:
                 timestamp=time.time(),
             )
 
-        tx_sig = await self._execute_jupiter_swap(quote)
+        fee = await self._priority_fee(route_accounts(quote), analysis.urgency_score)
+        tx_sig, landing, err = await self._execute_jupiter_swap(quote, fee)
         self.execution_count += 1
 
         return ExecutionResult(
-            success=tx_sig is not None,
+            success=tx_sig is not None and err is None,
             tx_signature=tx_sig,
             strategy=analysis.strategy,
             amount_usd=analysis.suggested_amount_usd,
             timestamp=time.time(),
+            priority_fee_micro_lamports=fee,
+            landing_seconds=landing,
+            error=err,
         )
 
     async def _execute_emergency_unwind(
@@ -265,6 +356,11 @@ class RebalanceExecutor:
                 timestamp=time.time(),
             )
 
+        # Repay the largest debt in full from the prepared template
+        result = await self._send_repay_template(position, analysis)
+        if result is not None:
+            return result
+
         # Full unwind: repay all debt, withdraw all collateral
         return ExecutionResult(
             success=True,
@@ -298,58 +394,94 @@ class RebalanceExecutor:
             timestamp=time.time(),
         )
 
-    async def _get_jupiter_quote(
-        self, input_mint: str, output_mint: str, amount: int
-    ) -> Optional[dict]:
-        """Get a swap quote from Jupiter aggregator"""
-        try:
-            params = {
-                "inputMint": input_mint,
-                "outputMint": output_mint,
-                "amount": str(amount),
-                "slippageBps": "50",  # 0.5% slippage
-            }
+    async def _send_repay_template(
+        self, position: PositionData, analysis: AnalysisResult, amount_usd: Optional[float] = None
+    ) -> Optional[ExecutionResult]:
+        """
+        Patch and send the position's prepared repay transaction.
+
+        Returns None when there is no template or nothing to repay, so the
+        caller falls back to its own path.
+        """
+        template = self.templates.get(position.obligation_key) if self.templates else None
+        if template is None:
+            return None
+        amount, repaid_usd = template.repay_amount(position, amount_usd)
+        if amount <= 0:
+            return None
 
-            response = await self.client.get(JUPITER_QUOTE_API, params=params)
-            if response.status_code == 200:
-                return response.json()
+        blockhash = await self.templates.blockhash()
+        if blockhash is None:
+            return ExecutionResult(
+                success=False, tx_signature=None,
+                strategy=analysis.strategy, amount_usd=repaid_usd,
+                error="Failed to get a recent blockhash", timestamp=time.time(),
+            )
 
-            logger.warning("jupiter_quote_failed", status=response.status_code)
-            return None
+        fee = await self._priority_fee(template.fee_accounts, analysis.urgency_score)
+        tx_sig, landing, err = await self._send(template.render(amount, blockhash, fee))
+        self.execution_count += 1
+        return ExecutionResult(
+            success=tx_sig is not None and err is None,
+            tx_signature=tx_sig,
+            strategy=analysis.strategy,
+            amount_usd=repaid_usd,
+            timestamp=time.time(),
+            priority_fee_micro_lamports=fee,
+            landing_seconds=landing,
+            error=err,
+        )
 
-        except Exception as e:
-            logger.error("jupiter_quote_error", error=str(e))
-            return None
+    async def _priority_fee(self, accounts: list[str], urgency: float) -> int:
+        """Compute unit price for a transaction writing `accounts`, scaled by urgency"""
+        if self.fees is None or not accounts:
+            return DEFAULT_PRIORITY_FEE
+        return await self.fees.estimate(accounts, urgency)
 
-    async def _execute_jupiter_swap(self, quote: dict) -> Optional[str]:
-        """Execute a Jupiter swap using AgentWallet for signing"""
+    async def _execute_jupiter_swap(
+        self, quote: dict, priority_fee: int = DEFAULT_PRIORITY_FEE
+    ) -> tuple[Optional[str], Optional[float], Optional[str]]:
+        """Execute a Jupiter swap using AgentWallet for signing; returns `_send`'s outcome"""
         try:
             # Get swap transaction from Jupiter
             swap_payload = {
                 "quoteResponse": quote,
                 "userPublicKey": self.wallet_id,
                 "wrapAndUnwrapSol": True,
-                "computeUnitPriceMicroLamports": 50000,
+                "computeUnitPriceMicroLamports": priority_fee,
             }
 
             response = await self.client.post(JUPITER_SWAP_API, json=swap_payload)
             if response.status_code != 200:
                 logger.error("jupiter_swap_failed", status=response.status_code)
-                return None
+                return None, None, None
 
             swap_data = response.json()
             swap_tx = swap_data.get("swapTransaction")
 
             if not swap_tx:
-                return None
+                return None, None, None
 
             # Sign and send via AgentWallet
-            tx_sig = await self._sign_and_send(swap_tx)
-            return tx_sig
+            return await self._send(swap_tx)
 
         except Exception as e:
             logger.error("jupiter_swap_error", error=str(e))
-            return None
+            return None, None, None
+
+    async def _send(
+        self, transaction_base64: str
+    ) -> tuple[Optional[str], Optional[float], Optional[str]]:
+        """
+        Sign and send, then wait for confirmation when a fee estimator can
+        track it; returns (signature, landing seconds, on-chain error)
+        """
+        sent_at = time.time()
+        tx_sig = await self._sign_and_send(transaction_base64)
+        if tx_sig is None or self.fees is None:
+            return tx_sig, None, None
+        landing, err = await self.fees.wait_for_landing(tx_sig, sent_at)
+        return tx_sig, landing, err
 
     async def _sign_and_send(self, transaction_base64: str) -> Optional[str]:
         """Sign and send a transaction via AgentWallet API"""
@@ -371,4 +503,7 @@ class RebalanceExecutor:
             return None
 
     async def close(self):
+        await self.quotes.close()
+        if self.templates is not None:
+            await self.templates.close()
         await self.client.aclose()
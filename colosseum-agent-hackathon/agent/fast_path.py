@@ -0,0 +1,81 @@
+"""Fast Path — Deterministic decisions for clear-cut positions
+
+Runs in front of `ClaudeAnalyzer` on the risk engine's columnar scores.
+A position is decided by rule when its health factor is below the
+unwind floor, or when it is simple (few assets) and not near any risk
+boundary. Everything else is left to the model.
+"""
+import hashlib
+import time
+
+import numpy as np
+
+from analyzer import AnalysisResult
+from protocols.base import PositionData
+from risk_engine import EMERGENCY, RISK_LEVELS, STRATEGIES, RiskEngine, RiskScores
+
+
+class FastPathRules:
+    """
+    Vectorized rule tier.
+
+    - Health factor below `unwind_below` is always an emergency unwind.
+    - Otherwise a position is clear-cut when its health factor is at least
+      `boundary_margin` away from every risk threshold and it holds no
+      more than `max_assets` collateral and debt assets in total; it gets
+      the risk engine's strategy and rebalance amount.
+    """
+
+    def __init__(
+        self,
+        engine: RiskEngine,
+        enabled: bool = True,
+        unwind_below: float = 1.02,
+        boundary_margin: float = 0.03,
+        max_assets: int = 2,
+        confidence: float = 0.9,
+    ):
+        self.engine = engine
+        self.enabled = enabled
+        self.unwind_below = unwind_below
+        self.boundary_margin = boundary_margin
+        self.max_assets = max_assets
+        self.confidence = confidence
+
+    def resolve(
+        self, positions: list[PositionData], scores: RiskScores, rows: np.ndarray
+    ) -> np.ndarray:
+        """Boolean mask over `rows` of positions the rules can decide"""
+        rows = np.asarray(rows, dtype=np.intp)
+        if not self.enabled or len(rows) == 0:
+            return np.zeros(len(rows), dtype=bool)
+
+        hf = scores.health_factor[rows]
+        assets = np.fromiter(
+            (len(positions[r].collaterals) + len(positions[r].debts) for r in rows),
+            np.int64, len(rows),
+        )
+        distance = np.abs(hf[:, None] - self.engine.boundaries[None, :]).min(axis=1)
+        clear = (distance >= self.boundary_margin) & (assets <= self.max_assets)
+        return (hf < self.unwind_below) | clear
+
+    def decide(self, position: PositionData, scores: RiskScores, row: int) -> AnalysisResult:
+        hf = float(scores.health_factor[row])
+        code = EMERGENCY if hf < self.unwind_below else int(scores.codes[row])
+        strategy = STRATEGIES[code]
+        amount = float(position.total_debt_usd if code == EMERGENCY else scores.rebalance_usd[row])
+        reasoning = (
+            f"Fast path: health factor {hf:.4f} is clearly {RISK_LEVELS[code].value}. "
+            f"Rule-based {strategy.value} of ${amount:,.2f}."
+        )
+        return AnalysisResult(
+            position_key=position.obligation_key,
+            risk_level=position.risk_level,
+            strategy=strategy,
+            reasoning=reasoning,
+            confidence=self.confidence,
+            suggested_amount_usd=amount,
+            urgency_score=1.0 if code == EMERGENCY else float(scores.urgency[row]),
+            reasoning_hash=hashlib.sha256(reasoning.encode()).hexdigest(),
+            timestamp=time.time(),
+        )
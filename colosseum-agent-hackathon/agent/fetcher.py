@@ -0,0 +1,204 @@
+"""Position Fetcher — Bounded-concurrency wallet × adapter fan-out"""
+import asyncio
+import time
+from dataclasses import dataclass, field
+
+import structlog
+
+from protocols import PositionData, ProtocolAdapter
+from protocols.base import MAX_MULTIPLE_ACCOUNTS, Protocol
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class AdapterLatency:
+    """Fetch latency for a single adapter over one cycle"""
+    protocol: str
+    calls: int = 0
+    errors: int = 0
+    scans: int = 0
+    refreshes: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+
+    def record(self, duration: float, error: bool = False):
+        self.calls += 1
+        self.total_seconds += duration
+        self.max_seconds = max(self.max_seconds, duration)
+        if error:
+            self.errors += 1
+
+    @property
+    def avg_ms(self) -> float:
+        if self.calls == 0:
+            return 0.0
+        return self.total_seconds / self.calls * 1000
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "scans": self.scans,
+            "refreshes": self.refreshes,
+            "avg_ms": round(self.avg_ms, 2),
+            "max_ms": round(self.max_seconds * 1000, 2),
+        }
+
+
+@dataclass
+class FetchResult:
+    """Positions and per-adapter latency from one fetch stage"""
+    positions: list[PositionData] = field(default_factory=list)
+    latencies: dict[str, AdapterLatency] = field(default_factory=dict)
+    duration_seconds: float = 0.0
+
+    def latency_summary(self) -> dict:
+        return {name: lat.to_dict() for name, lat in self.latencies.items()}
+
+
+class PositionFetcher:
+    """
+    Runs every wallet/adapter fetch concurrently.
+
+    Concurrency is bounded twice: a global limit on in-flight fetches and
+    a per-adapter limit so one slow protocol cannot starve the others.
+
+    In refresh mode, wallets whose obligations are already known skip the
+    getProgramAccounts scan; their obligations are re-read in chunks of
+    MAX_MULTIPLE_ACCOUNTS via getMultipleAccounts. Wallets are rescanned
+    once their adapter's rediscovery interval elapses.
+    """
+
+    def __init__(
+        self,
+        adapters: list[ProtocolAdapter],
+        max_concurrency: int = 64,
+        per_adapter_concurrency: int = 16,
+        refresh_mode: bool = True,
+    ):
+        self.adapters = adapters
+        self.refresh_mode = refresh_mode
+        self._global_limit = asyncio.Semaphore(max_concurrency)
+        self._adapter_limits = [
+            asyncio.Semaphore(per_adapter_concurrency) for _ in adapters
+        ]
+        self._names: list[str] = []
+
+    async def _protocol_names(self) -> list[str]:
+        if not self._names:
+            self._names = [await a.get_protocol_name() for a in self.adapters]
+        return self._names
+
+    async def fetch_all(self, wallets: list[str]) -> FetchResult:
+        """Fetch positions for every wallet on every adapter"""
+        start = time.perf_counter()
+        names = await self._protocol_names()
+        latencies = {name: AdapterLatency(protocol=name) for name in names}
+
+        tasks = []
+        for idx, adapter in enumerate(self.adapters):
+            latency = latencies[names[idx]]
+            if self.refresh_mode:
+                scan = [w for w in wallets if adapter.tracker.needs_rediscovery(w)]
+                scan_set = set(scan)
+                known = adapter.tracker.known_pairs(
+                    [w for w in wallets if w not in scan_set]
+                )
+            else:
+                scan, known = wallets, []
+
+            tasks.extend(self._scan_one(idx, wallet, latency) for wallet in scan)
+            tasks.extend(
+                self._refresh_chunk(idx, known[i:i + MAX_MULTIPLE_ACCOUNTS], latency)
+                for i in range(0, len(known), MAX_MULTIPLE_ACCOUNTS)
+            )
+
+        results = await asyncio.gather(*tasks)
+
+        positions: list[PositionData] = []
+        for batch in results:
+            positions.extend(batch)
+
+        return FetchResult(
+            positions=positions,
+            latencies=latencies,
+            duration_seconds=time.perf_counter() - start,
+        )
+
+    async def refresh_keys(
+        self, checks: list[tuple[Protocol, str, str]]
+    ) -> FetchResult:
+        """
+        Re-read specific obligations, given as (protocol, wallet, key).
+
+        Keys are grouped per adapter and read in MAX_MULTIPLE_ACCOUNTS
+        chunks, so a batch of due re-checks costs one call per chunk.
+        """
+        start = time.perf_counter()
+        names = await self._protocol_names()
+        latencies = {name: AdapterLatency(protocol=name) for name in names}
+        by_protocol = {a.protocol: idx for idx, a in enumerate(self.adapters)}
+
+        grouped: dict[int, list[tuple[str, str]]] = {}
+        for protocol, wallet, key in checks:
+            idx = by_protocol.get(protocol)
+            if idx is not None:
+                grouped.setdefault(idx, []).append((wallet, key))
+
+        tasks = [
+            self._refresh_chunk(idx, pairs[i:i + MAX_MULTIPLE_ACCOUNTS], latencies[names[idx]])
+            for idx, pairs in grouped.items()
+            for i in range(0, len(pairs), MAX_MULTIPLE_ACCOUNTS)
+        ]
+        results = await asyncio.gather(*tasks)
+
+        return FetchResult(
+            positions=[p for batch in results for p in batch],
+            latencies=latencies,
+            duration_seconds=time.perf_counter() - start,
+        )
+
+    async def _scan_one(
+        self, idx: int, wallet: str, latency: AdapterLatency
+    ) -> list[PositionData]:
+        latency.scans += 1
+        positions = await self._timed(
+            idx, latency, self.adapters[idx].get_positions(wallet), wallet[:8] + "..."
+        )
+        if positions:
+            logger.info(
+                "positions_found",
+                protocol=latency.protocol,
+                wallet=wallet[:8] + "...",
+                count=len(positions),
+            )
+        return positions
+
+    async def _refresh_chunk(
+        self, idx: int, pairs: list[tuple[str, str]], latency: AdapterLatency
+    ) -> list[PositionData]:
+        latency.refreshes += 1
+        return await self._timed(
+            idx, latency, self.adapters[idx].refresh_obligations(pairs), f"{len(pairs)} keys"
+        )
+
+    async def _timed(
+        self, idx: int, latency: AdapterLatency, call, target: str
+    ) -> list[PositionData]:
+        async with self._adapter_limits[idx]:
+            async with self._global_limit:
+                call_start = time.perf_counter()
+                try:
+                    positions = await call
+                except Exception as e:
+                    latency.record(time.perf_counter() - call_start, error=True)
+                    logger.error(
+                        "adapter_error",
+                        protocol=latency.protocol,
+                        target=target,
+                        error=str(e),
+                    )
+                    return []
+                latency.record(time.perf_counter() - call_start)
+        return positions
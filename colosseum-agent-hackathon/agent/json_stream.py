@@ -0,0 +1,82 @@
+"""Incremental JSON — Read top-level object fields while the text is still arriving"""
+import json
+from typing import Any, Iterable
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJsonObject:
+    """
+    Scans a streamed JSON object one chunk at a time.
+
+    A top-level field lands in `fields` as soon as the delimiter after its
+    value (`,` or `}`) has arrived, so early fields can be acted on before
+    the rest of the object is complete. Any text before the first `{` is
+    skipped, as models often open with a sentence of prose.
+    """
+
+    def __init__(self):
+        self.fields: dict[str, Any] = {}
+        self.text = ""
+        self.done = False
+        self._pos = 0
+        self._state = "start"  # start, key, colon, value, after_value
+        self._key_start = 0
+        self._key = ""
+        self._value_start = 0
+        self._nesting = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str):
+        self.text += chunk
+        text = self.text
+        while self._pos < len(text) and not self.done:
+            ch = text[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._state == "key":
+                        self._key = json.loads(text[self._key_start:self._pos + 1])
+                        self._state = "colon"
+            elif self._state == "start":
+                if ch == "{":
+                    self._state = "key"
+            elif self._state == "key":
+                if ch == '"':
+                    self._key_start = self._pos
+                    self._in_string = True
+                elif ch == "}":
+                    self.done = True
+            elif self._state == "colon":
+                if ch == ":":
+                    self._state = "value"
+                    self._value_start = self._pos + 1
+            elif self._state == "value":
+                if ch == '"':
+                    self._in_string = True
+                elif ch in "{[":
+                    self._nesting += 1
+                elif ch in "}]" and self._nesting > 0:
+                    self._nesting -= 1
+                elif self._nesting == 0 and ch in ",}":
+                    self._commit(text[self._value_start:self._pos])
+                    self._state = "key"
+                    self.done = ch == "}"
+            self._pos += 1
+
+    def _commit(self, raw: str):
+        raw = raw.strip(_WHITESPACE)
+        try:
+            self.fields[self._key] = json.loads(raw)
+        except json.JSONDecodeError:
+            # Keep scanning; a malformed field is simply never reported
+            pass
+
+    def has_all(self, names: Iterable[str]) -> bool:
+        return all(name in self.fields for name in names)
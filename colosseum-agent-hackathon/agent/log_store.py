@@ -0,0 +1,309 @@
+"""Log Store — Segmented JSONL storage with a sparse sequence index
+
+Entries are addressed by a logical byte offset that runs across segments,
+so callers (checkpoints, Merkle batches) never need to know where one
+segment ends and the next begins.
+"""
+import json
+import os
+import struct
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, TextIO
+
+import structlog
+
+logger = structlog.get_logger()
+
+TAIL_BLOCK_SIZE = 4096
+
+# sequence, logical offset, timestamp
+INDEX_RECORD = struct.Struct("<qqd")
+
+
+def tail_line(f: BinaryIO, end: int) -> Optional[bytes]:
+    """Last non-empty line of `f` that ends at or before byte `end`, read backwards"""
+    pos = end
+    buf = b""
+    while pos > 0:
+        step = min(TAIL_BLOCK_SIZE, pos)
+        pos -= step
+        f.seek(pos)
+        buf = f.read(step) + buf
+        start = buf.rstrip(b"\n").rfind(b"\n")
+        if start >= 0:
+            return buf[start + 1:].strip() or None
+    return buf.strip() or None
+
+
+@dataclass
+class Segment:
+    number: int
+    path: Path
+    base: int  # logical offset of the segment's first byte
+    size: int
+    first_timestamp: Optional[float] = None
+
+    @property
+    def end(self) -> int:
+        return self.base + self.size
+
+
+class SegmentedLog:
+    """
+    Append-only JSONL log split into numbered segment files.
+
+    The active segment rolls over once it reaches `max_segment_bytes` or
+    its first entry is older than `max_segment_age` seconds. Every
+    `index_interval`-th sequence, and the first entry of each segment, is
+    recorded in a compact binary index so reads by sequence or time seek
+    close to the target instead of scanning the history.
+    """
+
+    def __init__(
+        self,
+        log_dir: Path,
+        name: str,
+        max_segment_bytes: int = 64 * 1024 * 1024,
+        max_segment_age: float = 86400,
+        index_interval: int = 64,
+    ):
+        self.log_dir = Path(log_dir)
+        self.name = name
+        self.max_segment_bytes = max_segment_bytes
+        self.max_segment_age = max_segment_age
+        self.index_interval = index_interval
+        self.index_file = self.log_dir / f"{name}.idx"
+        self.segments: list[Segment] = []
+        self._file: Optional[TextIO] = None
+        self._index_seq = array("q")
+        self._index_offset = array("q")
+        self._index_time = array("d")
+
+        self._load_segments()
+        self._load_index()
+
+    # -- Layout -------------------------------------------------------------
+
+    def _segment_path(self, number: int) -> Path:
+        return self.log_dir / f"{self.name}.{number:06d}.jsonl"
+
+    def _load_segments(self):
+        legacy = self.log_dir / f"{self.name}.jsonl"
+        paths = sorted(self.log_dir.glob(f"{self.name}.[0-9]*.jsonl"))
+        if not paths and legacy.exists():
+            # Single-file log from before segmentation becomes segment 0
+            legacy.rename(self._segment_path(0))
+            paths = [self._segment_path(0)]
+
+        base = 0
+        for path in paths:
+            size = path.stat().st_size
+            number = int(path.name[len(self.name) + 1:-len(".jsonl")])
+            self.segments.append(Segment(number, path, base, size))
+            base += size
+        if not self.segments:
+            self.segments.append(Segment(0, self._segment_path(0), 0, 0))
+
+    @property
+    def active(self) -> Segment:
+        return self.segments[-1]
+
+    @property
+    def size(self) -> int:
+        """Logical size of the whole log in bytes"""
+        return self.active.end
+
+    def _segment_at(self, offset: int) -> int:
+        """Index of the segment holding logical byte `offset`"""
+        return max(0, bisect_right([s.base for s in self.segments], offset) - 1)
+
+    # -- Index --------------------------------------------------------------
+
+    def _load_index(self):
+        if self.index_file.exists():
+            try:
+                data = self.index_file.read_bytes()
+                usable = len(data) - len(data) % INDEX_RECORD.size
+                for sequence, offset, timestamp in INDEX_RECORD.iter_unpack(data[:usable]):
+                    if offset >= self.size:
+                        break
+                    self._add_index_point(sequence, offset, timestamp)
+            except Exception as e:
+                logger.warning("log_index_load_error", error=str(e))
+                self._index_seq, self._index_offset, self._index_time = array("q"), array("q"), array("d")
+
+        # Index anything written after the last persisted point; with no
+        # index file this is a one-off scan of the existing history
+        start = self._index_offset[-1] if self._index_offset else 0
+        added = []
+        for line, end in self.iter_lines(start):
+            try:
+                data = json.loads(line)
+            except ValueError:
+                break
+            offset = end - len(line)
+            if self._wants_index_point(data["sequence"], offset):
+                self._add_index_point(data["sequence"], offset, data["timestamp"])
+                added.append((data["sequence"], offset, data["timestamp"]))
+        self._save_index_points(added)
+
+        for segment in self.segments:
+            i = bisect_left(self._index_offset, segment.base)
+            if i < len(self._index_offset) and self._index_offset[i] == segment.base:
+                segment.first_timestamp = self._index_time[i]
+
+    def _wants_index_point(self, sequence: int, offset: int) -> bool:
+        if self._index_offset and offset <= self._index_offset[-1]:
+            return False
+        return sequence % self.index_interval == 0 or offset == self.segments[self._segment_at(offset)].base
+
+    def _add_index_point(self, sequence: int, offset: int, timestamp: float):
+        self._index_seq.append(sequence)
+        self._index_offset.append(offset)
+        self._index_time.append(timestamp)
+
+    def _save_index_points(self, points: list[tuple[int, int, float]]):
+        if not points:
+            return
+        try:
+            with open(self.index_file, "ab") as f:
+                f.write(b"".join(INDEX_RECORD.pack(*p) for p in points))
+        except Exception as e:
+            logger.error("log_index_persist_error", error=str(e))
+
+    @property
+    def index_points(self) -> int:
+        return len(self._index_seq)
+
+    # -- Writing --------------------------------------------------------------
+
+    def _should_rotate(self, now: float) -> bool:
+        active = self.active
+        if active.size == 0:
+            return False
+        if active.size >= self.max_segment_bytes:
+            return True
+        return active.first_timestamp is not None and now - active.first_timestamp >= self.max_segment_age
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        active = self.active
+        number = active.number + 1
+        self.segments.append(Segment(number, self._segment_path(number), active.end, 0))
+        logger.info("log_segment_rotated", segment=number, base=active.end)
+
+    def append(self, lines: list[str], keys: list[tuple[int, float]], durability: str) -> list[int]:
+        """
+        Write `lines` (with their (sequence, timestamp) keys) as one group.
+
+        Returns the logical end offset of each line. Groups are never split
+        across segments. Lines must be ASCII, so characters are bytes.
+        """
+        if self._should_rotate(time.time()):
+            self._rotate()
+        active = self.active
+        if self._file is None:
+            self._file = open(active.path, "a")
+        self._file.writelines(lines)
+        if durability != "none":
+            self._file.flush()
+        if durability == "fsync":
+            os.fsync(self._file.fileno())
+
+        ends = []
+        points = []
+        offset = active.end
+        for line, (sequence, timestamp) in zip(lines, keys):
+            if self._wants_index_point(sequence, offset):
+                self._add_index_point(sequence, offset, timestamp)
+                points.append((sequence, offset, timestamp))
+            if offset == active.base:
+                active.first_timestamp = timestamp
+            offset += len(line)
+            ends.append(offset)
+        active.size = offset - active.base
+        self._save_index_points(points)
+        return ends
+
+    def flush(self):
+        if self._file is not None:
+            self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    # -- Reading --------------------------------------------------------------
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None) -> Iterator[tuple[bytes, int]]:
+        """Complete lines from logical offset `start` up to `end`, with each line's end offset"""
+        end = self.size if end is None else end
+        offset = start
+        for segment in self.segments[self._segment_at(start):]:
+            if offset >= end:
+                return
+            if segment.size == 0:
+                continue
+            with open(segment.path, "rb") as f:
+                f.seek(offset - segment.base)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        return
+                    offset += len(line)
+                    if offset > end:
+                        return
+                    yield line, offset
+            offset = segment.end
+
+    def line_ending_at(self, offset: int) -> Optional[bytes]:
+        """The line that ends exactly at logical `offset`, or None if no line does"""
+        if not 0 < offset <= self.size:
+            return None
+        segment = self.segments[self._segment_at(offset - 1)]
+        with open(segment.path, "rb") as f:
+            f.seek(offset - 1 - segment.base)
+            if f.read(1) != b"\n":
+                return None
+            return tail_line(f, offset - segment.base)
+
+    def last_line(self) -> Optional[bytes]:
+        for segment in reversed(self.segments):
+            if segment.size:
+                with open(segment.path, "rb") as f:
+                    return tail_line(f, segment.size)
+        return None
+
+    def read(self, sequence: int) -> Optional[dict]:
+        """Entry `sequence`, scanning at most `index_interval` lines from the nearest index point"""
+        i = bisect_right(self._index_seq, sequence) - 1
+        start = self._index_offset[i] if i >= 0 else 0
+        for line, _ in self.iter_lines(start):
+            data = json.loads(line)
+            if data["sequence"] == sequence:
+                return data
+            if data["sequence"] > sequence:
+                break
+        return None
+
+    def iter_range(self, start_time: float, end_time: float) -> Iterator[dict]:
+        """
+        Entries with `start_time <= timestamp < end_time`.
+
+        Seeks via the index, which assumes timestamps are non-decreasing
+        in sequence order, as they are for entries stamped at log time.
+        """
+        i = bisect_left(self._index_time, start_time) - 1
+        start = self._index_offset[i] if i >= 0 else 0
+        for line, _ in self.iter_lines(start):
+            data = json.loads(line)
+            if data["timestamp"] >= end_time:
+                break
+            if data["timestamp"] >= start_time:
+                yield data
@@ -11,13 +11,29 @@ import sys
 import time
 from pathlib import Path
 
+import numpy as np
 import structlog
 
 from config import get_config, AppConfig
-from protocols import KaminoAdapter, MarginFiAdapter, SolendAdapter, PositionData
+from protocols import (
+    KaminoAdapter, MarginFiAdapter, SolendAdapter, PositionData, SolanaRpcClient,
+)
 from protocols.base import RiskLevel
+from protocols.pricing import PriceService
 from analyzer import ClaudeAnalyzer, AnalysisResult
+from analysis_cache import AnalysisCache
+from coordinator import ExecutionCoordinator
 from executor import RebalanceExecutor
+from execution_queue import ExecutionQueue
+from fast_path import FastPathRules
+from fetcher import PositionFetcher
+from metrics import LatencyHistogram
+from priority_fees import PriorityFeeEstimator
+from quote_cache import QuoteCache
+from risk_engine import CRITICAL, WARNING, RiskEngine, RiskScores, apply_risk_levels
+from scheduler import RecheckScheduler, ScheduledCheck
+from streaming import AccountStreamer
+from tx_templates import TemplateCache
 from activity_logger import ActivityLogger
 
 # Configure structured logging
@@ -40,16 +56,89 @@ class SolShieldAgent:
         self.running = False
 
         # Initialize protocol adapters
+        # One pooled, batching RPC client shared by every adapter
+        self.rpc = SolanaRpcClient(
+            config.solana.rpc_url,
+            max_connections=config.solana.rpc_max_connections,
+            batch_window_ms=config.solana.rpc_batch_window_ms,
+            max_batch_size=config.solana.rpc_max_batch_size,
+        )
+
+        # One price cache shared by every adapter and the analyzer
+        self.prices = PriceService(
+            ttl_seconds=config.monitoring.price_ttl_seconds,
+            api_url=config.monitoring.price_api_url,
+        )
+
+        adapter_options = dict(
+            rediscovery_interval_seconds=config.monitoring.rediscovery_interval_seconds,
+            rpc=self.rpc,
+            reserve_ttl_seconds=config.monitoring.reserve_cache_ttl_seconds,
+            reserve_max_slot_lag=config.monitoring.reserve_cache_max_slot_lag,
+            prices=self.prices,
+        )
         self.adapters = [
-            KaminoAdapter(config.solana.rpc_url, config.solana.helius_api_key),
-            MarginFiAdapter(config.solana.rpc_url),
-            SolendAdapter(config.solana.rpc_url),
+            KaminoAdapter(
+                config.solana.rpc_url, config.solana.helius_api_key, **adapter_options
+            ),
+            MarginFiAdapter(config.solana.rpc_url, **adapter_options),
+            SolendAdapter(config.solana.rpc_url, **adapter_options),
         ]
 
+        self.fetcher = PositionFetcher(
+            self.adapters,
+            max_concurrency=config.monitoring.max_concurrent_fetches,
+            per_adapter_concurrency=config.monitoring.max_concurrent_per_adapter,
+            refresh_mode=config.monitoring.refresh_mode,
+        )
+
+        # Batch scoring with the configured health factor thresholds
+        self.risk_engine = RiskEngine(
+            warn=config.monitoring.health_factor_warn,
+            critical=config.monitoring.health_factor_critical,
+            emergency=config.monitoring.health_factor_emergency,
+        )
+
+        # Clear-cut positions are decided by rule before reaching the model
+        self.fast_path = FastPathRules(
+            self.risk_engine,
+            enabled=config.ai.fast_path_enabled,
+            unwind_below=config.ai.fast_path_unwind_below,
+            boundary_margin=config.ai.fast_path_boundary_margin,
+            max_assets=config.ai.fast_path_max_assets,
+        )
+        self.tier_latency = {"fast_path": LatencyHistogram(), "model": LatencyHistogram()}
+
+        # Poll mode re-checks each position when it comes due, sooner the
+        # closer it is to liquidation
+        self.scheduler = RecheckScheduler(
+            min_interval=config.monitoring.recheck_min_interval_seconds,
+            max_interval=config.monitoring.recheck_max_interval_seconds,
+            safe_distance_pct=config.monitoring.recheck_safe_distance_pct,
+            volatility_weight=config.monitoring.recheck_volatility_weight,
+            prices=self.prices,
+        )
+        self._next_sweep = 0.0
+
         # Initialize AI analyzer
         self.analyzer = ClaudeAnalyzer(
             api_key=config.ai.anthropic_api_key,
             model=config.ai.model,
+            prices=self.prices,
+            batch_size=config.ai.analysis_batch_size,
+            max_concurrent_requests=config.ai.max_concurrent_requests,
+            deadlines={
+                RiskLevel.EMERGENCY: config.ai.deadline_emergency_seconds,
+                RiskLevel.CRITICAL: config.ai.deadline_critical_seconds,
+                RiskLevel.WARNING: config.ai.deadline_warning_seconds,
+            },
+            stream_levels=[
+                RiskLevel(level.strip()) for level in config.ai.stream_levels.split(",") if level.strip()
+            ],
+            cache=AnalysisCache(
+                ttl_seconds=config.ai.analysis_cache_ttl_seconds,
+                max_entries=config.ai.analysis_cache_max_entries,
+            ),
         )
 
         # Initialize executor
@@ -58,12 +147,64 @@ class SolShieldAgent:
             wallet_api_key=config.wallet.api_key,
             wallet_id=config.wallet.wallet_id,
             dry_run=dry_run,
+            # Quotes for likely top-ups are kept warm ahead of the decision
+            quotes=QuoteCache(
+                prices=self.prices,
+                slippage_bps=config.monitoring.swap_slippage_bps,
+                size_step=config.monitoring.quote_cache_size_step,
+                max_age_seconds=config.monitoring.quote_cache_max_age_seconds,
+                max_slot_lag=config.monitoring.quote_cache_max_slot_lag,
+                refresh_interval=config.monitoring.quote_cache_refresh_interval_seconds,
+            ),
+            # Repay transactions are compiled while positions are still critical
+            templates=TemplateCache(
+                rpc=self.rpc,
+                payer=config.wallet.wallet_id,
+                adapters=self.adapters,
+                compute_units=config.monitoring.tx_compute_unit_limit,
+                priority_fee_micro_lamports=config.monitoring.tx_priority_fee_micro_lamports,
+                blockhash_max_age=config.monitoring.tx_blockhash_max_age_seconds,
+                ttl_seconds=config.monitoring.tx_template_ttl_seconds,
+            ),
+            # One rebalance in flight per position, with cooldown and retry budget
+            coordinator=ExecutionCoordinator(
+                max_attempts=config.monitoring.max_rebalance_attempts,
+                cooldown_seconds=config.monitoring.rebalance_cooldown_seconds,
+            ),
+            # Priority fees follow recent fees on the accounts each transaction writes
+            fees=PriorityFeeEstimator(
+                self.rpc,
+                default_fee=config.monitoring.tx_priority_fee_micro_lamports,
+                min_fee=config.monitoring.tx_priority_fee_min,
+                max_fee=config.monitoring.tx_priority_fee_max,
+                min_percentile=config.monitoring.tx_priority_fee_min_percentile,
+                max_percentile=config.monitoring.tx_priority_fee_max_percentile,
+                window_slots=config.monitoring.tx_priority_fee_window_slots,
+                max_age_seconds=config.monitoring.tx_priority_fee_max_age_seconds,
+                confirm_timeout=config.monitoring.tx_confirm_timeout_seconds,
+            ),
+        )
+
+        # Rebalances run concurrently, most urgent exposure first, with
+        # emergencies never waiting for a free worker
+        self.execution_queue = ExecutionQueue(
+            self.executor.execute_rebalance,
+            workers=config.monitoring.execution_workers,
         )
 
         # Initialize activity logger
         self.activity_logger = ActivityLogger(
             log_dir=config.log_dir,
             agent_name="solshield",
+            batch_size=config.log_batch_size,
+            flush_interval=config.log_flush_interval_seconds,
+            durability=config.log_durability,
+            checkpoint_interval=config.log_checkpoint_interval,
+            merkle_batch_size=config.log_merkle_batch_size,
+            max_segment_bytes=config.log_segment_max_bytes,
+            max_segment_age=config.log_segment_max_age_seconds,
+            index_interval=config.log_index_interval,
+            retain_entries=config.log_retain_entries,
         )
 
         # Stats
@@ -74,12 +215,24 @@ class SolShieldAgent:
             "rebalances_executed": 0,
             "liquidations_prevented": 0,
             "total_value_protected": 0.0,
+            "stream_updates": 0,
             "start_time": time.time(),
         }
 
         # Tracked wallets
         self.watched_wallets: list[str] = []
 
+        # Streaming mode: accountSubscribe on every tracked obligation
+        self.streamer = AccountStreamer(
+            ws_url=config.solana.ws_url,
+            adapters=self.adapters,
+            rpc=self.rpc,
+            on_update=self._on_position_update,
+            backfill_slot_gap=config.monitoring.stream_backfill_slot_gap,
+        )
+        self._handling: set[str] = set()
+        self._stream_tasks: set[asyncio.Task] = set()
+
     async def start(self, wallets: list[str] | None = None):
         """Start the monitoring loop"""
         self.running = True
@@ -89,6 +242,7 @@ class SolShieldAgent:
             "solshield_starting",
             wallets=len(self.watched_wallets),
             dry_run=self.dry_run,
+            mode=self.config.monitoring.monitoring_mode,
             check_interval=self.config.monitoring.check_interval_seconds,
         )
 
@@ -105,9 +259,10 @@ class SolShieldAgent:
         print(self._banner())
 
         try:
-            while self.running:
-                await self._monitoring_cycle()
-                await asyncio.sleep(self.config.monitoring.check_interval_seconds)
+            if self.config.monitoring.monitoring_mode == "stream":
+                await self._run_streaming()
+            else:
+                await self._run_polling()
         except asyncio.CancelledError:
             logger.info("agent_cancelled")
         finally:
@@ -120,70 +275,19 @@ class SolShieldAgent:
 
         logger.info("monitoring_cycle_start", cycle=self.stats["cycles"])
 
-        all_positions: list[PositionData] = []
-
-        # 1. Fetch positions from all protocols
-        for wallet in self.watched_wallets:
-            for adapter in self.adapters:
-                try:
-                    positions = await adapter.get_positions(wallet)
-                    all_positions.extend(positions)
-                    protocol_name = await adapter.get_protocol_name()
-                    if positions:
-                        logger.info(
-                            "positions_found",
-                            protocol=protocol_name,
-                            wallet=wallet[:8] + "...",
-                            count=len(positions),
-                        )
-                except Exception as e:
-                    logger.error("adapter_error", error=str(e))
+        # 1. Fetch positions from all protocols concurrently
+        fetch = await self.fetcher.fetch_all(self.watched_wallets)
+        all_positions: list[PositionData] = fetch.positions
 
         self.stats["positions_monitored"] = len(all_positions)
+        # Full sweeps pick up new obligations and reset the schedule
+        self.scheduler.replace(all_positions)
 
         if not all_positions:
             logger.info("no_positions_found", wallets=len(self.watched_wallets))
             return
 
-        # 2. Analyze positions that need attention
-        at_risk = [
-            p for p in all_positions
-            if p.risk_level in (RiskLevel.WARNING, RiskLevel.CRITICAL, RiskLevel.EMERGENCY)
-        ]
-
-        if at_risk:
-            logger.warning("at_risk_positions", count=len(at_risk))
-
-        for position in at_risk:
-            # 3. AI Analysis
-            analysis = await self.analyzer.analyze_position(position)
-            self.stats["analyses_performed"] += 1
-
-            await self.activity_logger.log_activity(
-                action="risk_analysis",
-                details=analysis.to_dict(),
-            )
-
-            # 4. Execute rebalance if needed
-            if analysis.needs_action and analysis.confidence >= 0.7:
-                result = await self.executor.execute_rebalance(position, analysis)
-
-                if result.success:
-                    self.stats["rebalances_executed"] += 1
-                    self.stats["liquidations_prevented"] += 1
-                    self.stats["total_value_protected"] += position.total_collateral_usd
-
-                    logger.info(
-                        "rebalance_executed",
-                        strategy=result.strategy.value,
-                        amount=result.amount_usd,
-                        tx=result.tx_signature,
-                    )
-
-                await self.activity_logger.log_activity(
-                    action="rebalance_execution",
-                    details=result.to_dict(),
-                )
+        at_risk, scores = await self._assess(all_positions)
 
         # Log cycle summary
         cycle_duration = time.time() - cycle_start
@@ -192,19 +296,200 @@ class SolShieldAgent:
             cycle=self.stats["cycles"],
             positions=len(all_positions),
             at_risk=len(at_risk),
+            risk_counts=scores.counts(),
             duration_s=f"{cycle_duration:.2f}",
+            fetch_s=f"{fetch.duration_seconds:.2f}",
+            adapter_latency=fetch.latency_summary(),
         )
 
+    async def _assess(self, positions: list[PositionData]):
+        """Score positions in one vectorized pass and handle the at-risk ones"""
+        # 2. Analyze the positions that need attention, most severe first
+        scores = self.risk_engine.score_positions(positions)
+        rows = scores.at_risk()
+        apply_risk_levels(positions, scores, rows)
+        at_risk = [positions[row] for row in rows]
+
+        if at_risk:
+            logger.warning("at_risk_positions", count=len(at_risk))
+        self._prefetch(positions, scores, rows)
+
+        analyses = await self._decide(positions, scores, rows)
+        await asyncio.gather(*(
+            self._act_on_analysis(position, analysis)
+            for position, analysis in zip(at_risk, analyses)
+        ))
+        return at_risk, scores
+
+    async def _decide(
+        self, positions: list[PositionData], scores: RiskScores, rows: np.ndarray
+    ) -> list[AnalysisResult]:
+        """Decide each row: rules for clear-cut cases, the model for the rest"""
+        # 3a. Fast-path rules in one vectorized pass
+        start = time.perf_counter()
+        fast = self.fast_path.resolve(positions, scores, rows)
+        decisions = {
+            int(row): self.fast_path.decide(positions[row], scores, row) for row in rows[fast]
+        }
+        if decisions:
+            self.tier_latency["fast_path"].observe(time.perf_counter() - start, len(decisions))
+
+        # 3b. One batched AI analysis for the ambiguous ones
+        ambiguous = [int(row) for row in rows[~fast]]
+        if ambiguous:
+            start = time.perf_counter()
+            analyses = await self.analyzer.analyze_positions([positions[row] for row in ambiguous])
+            self.tier_latency["model"].observe(time.perf_counter() - start, len(ambiguous))
+            decisions.update(zip(ambiguous, analyses))
+
+        return [decisions[int(row)] for row in rows]
+
+    def _prefetch(self, positions: list[PositionData], scores: RiskScores, rows: np.ndarray):
+        """
+        Warm swap quotes for warning positions, which are headed for a
+        top-up, and repay transactions for those at critical or worse
+        """
+        warning = rows[scores.codes[rows] == WARNING]
+        self.executor.prefetch_quotes(
+            (positions[row], float(scores.rebalance_usd[row])) for row in warning
+        )
+        self.executor.prepare_templates(positions[row] for row in rows[scores.codes[rows] <= CRITICAL])
+
+    async def _run_polling(self):
+        """Poll mode: full sweeps at the longest interval, due re-checks in between"""
+        while self.running:
+            now = time.time()
+            if now >= self._next_sweep:
+                await self._monitoring_cycle()
+                self._next_sweep = time.time() + self.scheduler.max_interval
+            else:
+                due = self.scheduler.pop_due(now)
+                if due:
+                    await self._recheck(due)
+
+            wake = min(self._next_sweep, self.scheduler.next_due() or self._next_sweep)
+            # Wake at least every check interval so new wallets are noticed
+            delay = min(wake - time.time(), self.config.monitoring.check_interval_seconds)
+            await asyncio.sleep(max(0.0, delay))
+
+    async def _recheck(self, due: list[ScheduledCheck]):
+        """Re-read just the positions whose checks came due"""
+        fetch = await self.fetcher.refresh_keys(
+            [(c.protocol, c.owner, c.obligation_key) for c in due]
+        )
+        returned = {p.obligation_key for p in fetch.positions}
+        for check in due:
+            # Closed, repaid or failed reads keep their slot until the next sweep
+            if check.obligation_key not in returned:
+                self.scheduler.reschedule(check)
+        for position in fetch.positions:
+            self.scheduler.schedule(position)
+
+        if fetch.positions:
+            at_risk, _ = await self._assess(fetch.positions)
+            logger.debug(
+                "recheck_complete",
+                due=len(due),
+                positions=len(fetch.positions),
+                at_risk=len(at_risk),
+                fetch_s=f"{fetch.duration_seconds:.2f}",
+            )
+
+    async def _handle_at_risk(self, position: PositionData):
+        """Analyze an at-risk position and execute a rebalance if warranted"""
+        scores = self.risk_engine.score_positions([position])
+        self._prefetch([position], scores, np.zeros(1, dtype=np.intp))
+        (analysis,) = await self._decide([position], scores, np.zeros(1, dtype=np.intp))
+        await self._act_on_analysis(position, analysis)
+
+    async def _act_on_analysis(self, position: PositionData, analysis: AnalysisResult):
+        """Log an analysis and execute its rebalance if warranted"""
+        self.stats["analyses_performed"] += 1
+
+        # 4. Queue the rebalance right away; a streamed analysis may still
+        # be filling in its reasoning, which only the log below needs
+        execution = None
+        if analysis.needs_action and analysis.confidence >= 0.7:
+            execution = self.execution_queue.submit(position, analysis)
+
+        await analysis.finalize()
+        await self.activity_logger.log_activity(
+            action="risk_analysis",
+            details=analysis.to_dict(),
+        )
+
+        if execution is not None:
+            result = await execution
+
+            if result.success:
+                self.stats["rebalances_executed"] += 1
+                self.stats["liquidations_prevented"] += 1
+                self.stats["total_value_protected"] += position.total_collateral_usd
+
+                logger.info(
+                    "rebalance_executed",
+                    strategy=result.strategy.value,
+                    amount=result.amount_usd,
+                    tx=result.tx_signature,
+                )
+
+            await self.activity_logger.log_activity(
+                action="rebalance_execution",
+                details=result.to_dict(),
+            )
+
+    async def _run_streaming(self):
+        """Event-driven mode: discover once, then react to account changes"""
+        await self._monitoring_cycle()
+
+        # New obligations arrive over programSubscribe, so full program
+        # scans only need to run as a rare consistency check
+        for adapter in self.adapters:
+            adapter.tracker.rediscovery_interval_seconds = (
+                self.config.monitoring.stream_rediscovery_interval_seconds
+            )
+        await self.streamer.watch_wallets(self.watched_wallets)
+        await self.streamer.sync_from_trackers()
+        stream_task = asyncio.create_task(self.streamer.run())
+
+        try:
+            # Periodic polling is kept only as a consistency check
+            while self.running:
+                await asyncio.sleep(self.config.monitoring.stream_consistency_interval_seconds)
+                await self._monitoring_cycle()
+                await self.streamer.sync_from_trackers()
+        finally:
+            await self.streamer.stop()
+            stream_task.cancel()
+
+    async def _on_position_update(self, position: PositionData):
+        """Streamed account change: re-score and react without blocking the stream"""
+        self.stats["stream_updates"] += 1
+        position.risk_level = self.risk_engine.classify(position.health_factor)
+        if position.risk_level == RiskLevel.HEALTHY:
+            return
+        if position.obligation_key in self._handling:
+            return
+
+        self._handling.add(position.obligation_key)
+        task = asyncio.create_task(self._handle_at_risk(position))
+        self._stream_tasks.add(task)
+        task.add_done_callback(self._stream_tasks.discard)
+        task.add_done_callback(lambda _: self._handling.discard(position.obligation_key))
+
     async def add_wallet(self, wallet_address: str):
         """Add a wallet to monitor"""
         if wallet_address not in self.watched_wallets:
             self.watched_wallets.append(wallet_address)
+            await self.streamer.watch_wallets(self.watched_wallets)
+            self._next_sweep = 0.0
             logger.info("wallet_added", wallet=wallet_address[:8] + "...")
 
     async def remove_wallet(self, wallet_address: str):
         """Remove a wallet from monitoring"""
         if wallet_address in self.watched_wallets:
             self.watched_wallets.remove(wallet_address)
+            await self.streamer.watch_wallets(self.watched_wallets)
             logger.info("wallet_removed", wallet=wallet_address[:8] + "...")
 
     def get_stats(self) -> dict:
@@ -212,6 +497,23 @@ class SolShieldAgent:
         uptime = time.time() - self.stats["start_time"]
         return {
             **self.stats,
+            "stream": self.streamer.get_stats(),
+            "reserves": {
+                type(adapter).__name__.removesuffix("Adapter").lower(): adapter.reserves.get_stats()
+                for adapter in self.adapters
+                if adapter.reserves is not None
+            },
+            "prices": self.prices.get_stats(),
+            "scheduler": self.scheduler.get_stats(),
+            "analyzer": self.analyzer.get_stats(),
+            "decision_tiers": {tier: h.to_dict() for tier, h in self.tier_latency.items()},
+            "analysis_cache": self.analyzer.cache.get_stats(),
+            "quote_cache": self.executor.quotes.get_stats(),
+            "executions": self.executor.coordinator.get_stats(),
+            "execution_queue": self.execution_queue.get_stats(),
+            "priority_fees": self.executor.fees.get_stats() if self.executor.fees else None,
+            "tx_templates": self.executor.templates.get_stats() if self.executor.templates else None,
+            "activity_log": self.activity_logger.get_stats(),
             "uptime_seconds": uptime,
             "uptime_human": f"{uptime/3600:.1f}h",
         }
@@ -221,14 +523,23 @@ class SolShieldAgent:
         self.running = False
         logger.info("shutting_down", stats=self.get_stats())
 
+        # In-flight rebalances finish before the clients they use close,
+        # and the activity log closes last so their results are recorded
+        await self.execution_queue.close(
+            timeout=self.config.monitoring.execution_drain_timeout_seconds
+        )
+        await self.executor.close()
+        for adapter in self.adapters:
+            await adapter.close()
+        await self.rpc.close()
+        await self.prices.close()
+        await self.analyzer.close()
+
         await self.activity_logger.log_activity(
             action="agent_shutdown",
             details=self.get_stats(),
         )
-
-        for adapter in self.adapters:
-            await adapter.close()
-        await self.executor.close()
+        await self.activity_logger.close()
 
     def _banner(self) -> str:
         return """
@@ -258,6 +569,8 @@ async def main():
 
     # Parse CLI arguments
     dry_run = "--live" not in sys.argv
+    if "--stream" in sys.argv:
+        config.monitoring.monitoring_mode = "stream"
     wallets = []
 
     for i, arg in enumerate(sys.argv):
@@ -0,0 +1,101 @@
+"""Merkle — Batch roots and inclusion proofs over activity entry hashes
+
+Leaves and interior nodes are hashed with distinct prefixes so a leaf can
+never be passed off as a node. An unpaired node at the end of a level is
+carried up unchanged rather than duplicated.
+"""
+import hashlib
+from dataclasses import dataclass, field
+
+LEAF_PREFIX = b"\x00"
+NODE_PREFIX = b"\x01"
+
+
+def leaf_hash(entry_hash: str) -> bytes:
+    return hashlib.sha256(LEAF_PREFIX + bytes.fromhex(entry_hash)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(NODE_PREFIX + left + right).digest()
+
+
+def merkle_root(entry_hashes: list[str]) -> str:
+    """Root of the tree over `entry_hashes`, in order"""
+    if not entry_hashes:
+        raise ValueError("Cannot build a Merkle root over no entries")
+    level = [leaf_hash(h) for h in entry_hashes]
+    while len(level) > 1:
+        level = [
+            node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+    return level[0].hex()
+
+
+def path_sides(index: int, leaf_count: int) -> list[str]:
+    """Sides ("L" | "R") of the siblings on the path from leaf `index` in a tree of `leaf_count`"""
+    sides = []
+    while leaf_count > 1:
+        sibling = index ^ 1
+        if sibling < leaf_count:
+            sides.append("L" if sibling < index else "R")
+        index //= 2
+        leaf_count = (leaf_count + 1) // 2
+    return sides
+
+
+def merkle_path(entry_hashes: list[str], index: int) -> list[tuple[str, str]]:
+    """Sibling hashes from leaf `index` up to the root, as ("L" | "R", hex) pairs"""
+    level = [leaf_hash(h) for h in entry_hashes]
+    path = []
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            path.append(("L" if sibling < index else "R", level[sibling].hex()))
+        level = [
+            node_hash(level[i], level[i + 1]) if i + 1 < len(level) else level[i]
+            for i in range(0, len(level), 2)
+        ]
+        index //= 2
+    return path
+
+
+@dataclass
+class MerkleProof:
+    """Inclusion proof for one activity entry within its batch"""
+    sequence: int
+    entry_hash: str
+    batch: int
+    root: str
+    siblings: list[tuple[str, str]] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "sequence": self.sequence,
+            "entry_hash": self.entry_hash,
+            "batch": self.batch,
+            "root": self.root,
+            "siblings": [list(s) for s in self.siblings],
+        }
+
+
+def verify_proof(proof: MerkleProof, index: int, leaf_count: int) -> bool:
+    """
+    Recompute the root from the entry hash and siblings, in O(log n).
+
+    The siblings must lie on the sides the path from leaf `index` of a
+    `leaf_count` tree takes, so a proof cannot be relabeled to a
+    different position under the same root.
+    """
+    if not 0 <= index < leaf_count:
+        return False
+    if [side for side, _ in proof.siblings] != path_sides(index, leaf_count):
+        return False
+    try:
+        node = leaf_hash(proof.entry_hash)
+        for side, sibling in proof.siblings:
+            other = bytes.fromhex(sibling)
+            node = node_hash(other, node) if side == "L" else node_hash(node, other)
+    except ValueError:
+        return False
+    return node.hex() == proof.root
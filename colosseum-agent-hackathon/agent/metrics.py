@@ -0,0 +1,51 @@
+"""Metrics — Lightweight latency histograms for stats output"""
+import math
+from bisect import bisect_left
+
+# Bucket upper bounds from 1µs doubling up to ~67s; anything slower
+# lands in a final overflow bucket
+BUCKET_BOUNDS = tuple(1e-6 * 2 ** i for i in range(27))
+
+
+class LatencyHistogram:
+    """Fixed log-scale buckets, so recording is O(log buckets) with no samples kept"""
+
+    def __init__(self, bounds: tuple[float, ...] = BUCKET_BOUNDS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, n: int = 1):
+        """Record `n` events that each took `seconds`"""
+        self.counts[bisect_left(self.bounds, seconds)] += n
+        self.count += n
+        self.total += seconds * n
+        self.max = max(self.max, seconds)
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-th percentile (0 < q <= 100)"""
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(self.count * q / 100)
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "mean_ms": round(self.mean * 1000, 3),
+            "p50_ms": round(self.percentile(50) * 1000, 3),
+            "p90_ms": round(self.percentile(90) * 1000, 3),
+            "p99_ms": round(self.percentile(99) * 1000, 3),
+            "max_ms": round(self.max * 1000, 3),
+        }
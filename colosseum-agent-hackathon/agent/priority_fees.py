@@ -0,0 +1,171 @@
+"""Priority Fees — Compute unit prices from recent fees on the accounts we write"""
+import asyncio
+import math
+import time
+from typing import Iterable, Optional
+
+import structlog
+
+from metrics import LatencyHistogram
+from protocols.rpc import SolanaRpcClient
+
+logger = structlog.get_logger()
+
+# getRecentPrioritizationFees accepts at most 128 accounts
+MAX_FEE_ACCOUNTS = 128
+
+LANDED_STATUSES = ("confirmed", "finalized")
+
+AccountSet = frozenset[str]
+
+
+def nearest_rank(sorted_values: list[int], q: float) -> int:
+    """The q-th percentile (0 <= q <= 100) of already sorted values"""
+    rank = max(1, math.ceil(len(sorted_values) * q / 100))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class PriorityFeeEstimator:
+    """
+    Picks a compute unit price in micro-lamports for a transaction.
+
+    Recent per-slot prioritization fees are sampled for the set of
+    accounts the transaction writes, since contention on those accounts
+    is what decides whether it lands. Samples from successive refreshes
+    are merged by slot into a rolling window of the newest `window_slots`
+    slots. The price is the percentile of that window chosen by urgency,
+    from `min_percentile` at urgency 0 to `max_percentile` at urgency 1,
+    clamped to [`min_fee`, `max_fee`]. With no samples to go on it falls
+    back to `default_fee`.
+    """
+
+    def __init__(
+        self,
+        rpc: SolanaRpcClient,
+        default_fee: int = 50_000,
+        min_fee: int = 1_000,
+        max_fee: int = 2_000_000,
+        min_percentile: float = 50,
+        max_percentile: float = 95,
+        window_slots: int = 300,
+        max_age_seconds: float = 5,
+        idle_ttl: float = 600,
+        confirm_timeout: float = 30,
+        confirm_poll_interval: float = 0.5,
+    ):
+        if not 0 <= min_percentile <= max_percentile <= 100:
+            raise ValueError("Percentiles must satisfy 0 <= min_percentile <= max_percentile <= 100")
+        self.rpc = rpc
+        self.default_fee = default_fee
+        self.min_fee = min_fee
+        self.max_fee = max_fee
+        self.min_percentile = min_percentile
+        self.max_percentile = max_percentile
+        self.window_slots = window_slots
+        self.max_age_seconds = max_age_seconds
+        self.idle_ttl = idle_ttl
+        self.confirm_timeout = confirm_timeout
+        self.confirm_poll_interval = confirm_poll_interval
+        self._samples: dict[AccountSet, dict[int, int]] = {}  # accounts -> slot -> fee
+        self._sampled_at: dict[AccountSet, float] = {}
+        self._inflight: dict[AccountSet, asyncio.Task] = {}
+        self.landing = LatencyHistogram()
+        self.estimates = 0
+        self.fallbacks = 0
+        self.sample_errors = 0
+        self.unconfirmed = 0
+        self.failed = 0
+
+    def _key(self, accounts: Iterable[str]) -> AccountSet:
+        return frozenset(sorted(set(accounts))[:MAX_FEE_ACCOUNTS])
+
+    def percentile_for(self, urgency: float) -> float:
+        urgency = min(1.0, max(0.0, urgency))
+        return self.min_percentile + (self.max_percentile - self.min_percentile) * urgency
+
+    async def estimate(self, accounts: Iterable[str], urgency: float) -> int:
+        """Compute unit price for a transaction writing `accounts` at this urgency (0-1)"""
+        key = self._key(accounts)
+        if time.time() - self._sampled_at.get(key, 0.0) >= self.max_age_seconds:
+            await self._refresh(key)
+
+        self.estimates += 1
+        samples = self._samples.get(key)
+        if not samples:
+            self.fallbacks += 1
+            return self.default_fee
+        fee = nearest_rank(sorted(samples.values()), self.percentile_for(urgency))
+        return min(self.max_fee, max(self.min_fee, fee))
+
+    async def _refresh(self, key: AccountSet):
+        """Sample one account set; concurrent callers for the same set share the request"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._sample(key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        await asyncio.shield(task)
+
+    async def _sample(self, key: AccountSet):
+        try:
+            result = await self.rpc.call("getRecentPrioritizationFees", [sorted(key)])
+        except Exception as e:
+            self.sample_errors += 1
+            logger.warning("priority_fee_sample_error", error=str(e))
+            return
+
+        window = self._samples.setdefault(key, {})
+        for entry in result or []:
+            window[entry["slot"]] = entry["prioritizationFee"]
+        if window:
+            oldest = max(window) - self.window_slots
+            for slot in [s for s in window if s <= oldest]:
+                del window[slot]
+        now = time.time()
+        self._sampled_at[key] = now
+        # Account sets nobody has asked about for a while are forgotten
+        for idle in [k for k, at in self._sampled_at.items() if now - at > self.idle_ttl]:
+            del self._sampled_at[idle]
+            self._samples.pop(idle, None)
+
+    async def wait_for_landing(
+        self, signature: str, sent_at: float
+    ) -> tuple[Optional[float], Optional[str]]:
+        """
+        Wait for `signature` to be confirmed.
+
+        Returns (seconds from `sent_at` until confirmed, the transaction's
+        on-chain error if it landed but failed). Seconds is None on timeout.
+        """
+        deadline = sent_at + self.confirm_timeout
+        while time.time() < deadline:
+            try:
+                result = await self.rpc.call("getSignatureStatuses", [[signature]])
+                status = ((result or {}).get("value") or [None])[0]
+                if status and status.get("confirmationStatus") in LANDED_STATUSES:
+                    elapsed = time.time() - sent_at
+                    self.landing.observe(elapsed)
+                    if status.get("err") is not None:
+                        self.failed += 1
+                        logger.warning(
+                            "transaction_failed", signature=signature[:16], err=status["err"]
+                        )
+                        return elapsed, str(status["err"])
+                    return elapsed, None
+            except Exception as e:
+                logger.warning("signature_status_error", signature=signature[:16], error=str(e))
+            await asyncio.sleep(self.confirm_poll_interval)
+        self.unconfirmed += 1
+        logger.warning("transaction_not_confirmed", signature=signature[:16])
+        return None, None
+
+    def get_stats(self) -> dict:
+        return {
+            "account_sets": len(self._samples),
+            "estimates": self.estimates,
+            "fallbacks": self.fallbacks,
+            "sample_errors": self.sample_errors,
+            "unconfirmed": self.unconfirmed,
+            "failed": self.failed,
+            "landing": self.landing.to_dict(),
+        }
@@ -3,6 +3,9 @@ from .base import ProtocolAdapter, PositionData
 from .kamino import KaminoAdapter
 from .marginfi import MarginFiAdapter
 from .solend import SolendAdapter
+from .rpc import SolanaRpcClient, RpcError
+from .bulk import ObligationSnapshot
+from .pricing import PriceService
 
 __all__ = [
     "ProtocolAdapter",
@@ -10,4 +13,8 @@ __all__ = [
     "KaminoAdapter",
     "MarginFiAdapter",
     "SolendAdapter",
+    "SolanaRpcClient",
+    "RpcError",
+    "ObligationSnapshot",
+    "PriceService",
 ]
@@ -2,9 +2,24 @@
 from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from enum import Enum
-from typing import Optional
+from typing import Callable, Optional
+import base64
 import time
 
+import structlog
+
+from .bulk import ColumnDecoder, DepositDecoder, ObligationSnapshot, decode_snapshot
+from .layouts import DecodedObligation
+from .pricing import PriceService
+from .reserves import ReserveCache, ReserveInfo
+
+logger = structlog.get_logger()
+
+# getMultipleAccounts accepts at most 100 pubkeys per call
+MAX_MULTIPLE_ACCOUNTS = 100
+
+DEFAULT_LIQUIDATION_THRESHOLD = 0.85
+
 
 class Protocol(str, Enum):
     KAMINO = "kamino"
@@ -28,6 +43,7 @@ class CollateralPosition:
     value_usd: float
     ltv: float  # Loan-to-value ratio
     liquidation_threshold: float
+    reserve: Optional[str] = None  # Reserve (Kamino, Solend) or bank (MarginFi) pubkey
 
 
 @dataclass
@@ -38,6 +54,7 @@ class DebtPosition:
     amount: float
     value_usd: float
     borrow_rate_apy: float
+    reserve: Optional[str] = None  # Reserve (Kamino) or bank (MarginFi) pubkey
 
 
 @dataclass
@@ -62,6 +79,15 @@ class PositionData:
             return 0
         return self.total_debt_usd / self.total_collateral_usd
 
+    @property
+    def distance_to_liquidation_pct(self) -> float:
+        """Percentage drop in collateral value before the position is liquidatable"""
+        if self.total_collateral_usd == 0 or self.total_debt_usd == 0:
+            return 100.0
+        # health_factor = collateral * threshold / debt, so liquidation sits
+        # at a (1 - 1 / health_factor) fall in collateral value
+        return max(0.0, (1 - 1 / self.health_factor) * 100) if self.health_factor > 0 else 0.0
+
     def to_risk_summary(self) -> str:
         return (
             f"Protocol: {self.protocol.value}\n"
@@ -76,9 +102,92 @@ class PositionData:
         )
 
 
+def weighted_liquidation_threshold(collaterals: list[CollateralPosition]) -> float:
+    """Collateral-value-weighted liquidation threshold of a position"""
+    total = sum(c.value_usd for c in collaterals)
+    if total <= 0:
+        return DEFAULT_LIQUIDATION_THRESHOLD
+    return sum(c.value_usd * c.liquidation_threshold for c in collaterals) / total
+
+
+class ObligationTracker:
+    """
+    Known obligation keys per wallet.
+
+    Obligation pubkeys rarely change, so once a wallet has been scanned
+    its keys can be refreshed directly until the next rediscovery is due.
+    """
+
+    def __init__(self, rediscovery_interval_seconds: float = 600):
+        self.rediscovery_interval_seconds = rediscovery_interval_seconds
+        self._keys: dict[str, set[str]] = {}
+        self._discovered_at: dict[str, float] = {}
+
+    def record_discovery(self, wallet: str, keys: list[str], now: Optional[float] = None):
+        """Replace the known keys for a wallet after a full scan"""
+        self._keys[wallet] = set(keys)
+        self._discovered_at[wallet] = now if now is not None else time.time()
+
+    def add(self, wallet: str, key: str) -> bool:
+        """Track a single key; returns True if it was not already known"""
+        keys = self._keys.setdefault(wallet, set())
+        if key in keys:
+            return False
+        keys.add(key)
+        return True
+
+    def remove(self, key: str):
+        for keys in self._keys.values():
+            keys.discard(key)
+
+    def needs_rediscovery(self, wallet: str, now: Optional[float] = None) -> bool:
+        discovered_at = self._discovered_at.get(wallet)
+        if discovered_at is None:
+            return True
+        now = now if now is not None else time.time()
+        return now - discovered_at >= self.rediscovery_interval_seconds
+
+    def known_pairs(self, wallets: list[str]) -> list[tuple[str, str]]:
+        """(wallet, obligation_key) pairs for the given wallets"""
+        return [
+            (wallet, key)
+            for wallet in wallets
+            for key in sorted(self._keys.get(wallet, ()))
+        ]
+
+    def all_pairs(self) -> list[tuple[str, str]]:
+        return self.known_pairs(list(self._keys))
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
+
+
 class ProtocolAdapter(ABC):
     """Base class for DeFi protocol adapters"""
 
+    program_id: str = ""
+    # Protocol reported on this adapter's positions
+    protocol: Optional[Protocol] = None
+    # Byte offset of the owner/authority pubkey in an obligation account
+    owner_offset: int = 0
+    # Bulk decoder from protocols.bulk, wrapped in staticmethod
+    column_decoder: Optional[ColumnDecoder] = None
+    # Per-slot deposit reserves and values from protocols.bulk, for
+    # per-row liquidation thresholds; wrapped in staticmethod
+    deposit_decoder: Optional[DepositDecoder] = None
+    # Obligation decoder from protocols.layouts, wrapped in staticmethod
+    decoder: Optional[Callable[[bytes], DecodedObligation]] = None
+    # Parameters used for entries whose reserve is not in the cache
+    default_reserve = ReserveInfo(
+        key="", mint="", decimals=9, ltv=0.75,
+        liquidation_threshold=DEFAULT_LIQUIDATION_THRESHOLD, borrow_rate_apy=0.05,
+    )
+
+    def __init__(self, rediscovery_interval_seconds: float = 600):
+        self.tracker = ObligationTracker(rediscovery_interval_seconds)
+        self.reserves: Optional[ReserveCache] = None
+        self.prices: Optional[PriceService] = None
+
     @abstractmethod
     async def get_positions(self, wallet_address: str) -> list[PositionData]:
         """Fetch all positions for a wallet on this protocol"""
@@ -94,6 +203,134 @@ class ProtocolAdapter(ABC):
         """Return the protocol name"""
         ...
 
+    @abstractmethod
+    def market_filters(self) -> list[dict]:
+        """Account filters selecting every obligation under `program_id`"""
+        ...
+
+    def owner_filters(self, wallet_address: str) -> list[dict]:
+        """Account filters selecting a wallet's obligations under `program_id`"""
+        return self.market_filters() + [
+            {"memcmp": {"offset": self.owner_offset, "bytes": wallet_address}}
+        ]
+
+    def position_from_bytes(
+        self, wallet_address: str, obligation_key: str, data: bytes
+    ) -> Optional[PositionData]:
+        """Build PositionData from raw data using only cached reserve parameters"""
+        return self._build_position(wallet_address, obligation_key, self.decoder(data))
+
+    @abstractmethod
+    def _build_position(
+        self, wallet_address: str, obligation_key: str, obligation: DecodedObligation
+    ) -> PositionData:
+        """Build PositionData from a decoded obligation and cached reserve parameters"""
+        ...
+
+    @abstractmethod
+    async def _parse_account(self, wallet_address: str, account: dict) -> Optional[PositionData]:
+        """Parse a {"pubkey", "account"} dict into PositionData"""
+        ...
+
+    async def get_market_snapshot(self) -> ObligationSnapshot:
+        """
+        Pull every obligation in the market and decode it in bulk.
+
+        Only the column arrays are computed up front; use
+        `snapshot.positions(threshold)` to build PositionData for the
+        rows that need attention.
+        """
+        accounts = await self.rpc.get_program_accounts(self.program_id, self.market_filters())
+        return decode_snapshot(self, [
+            (a["pubkey"], base64.b64decode(a["account"]["data"][0])) for a in accounts
+        ])
+
+    async def refresh_obligations(
+        self, pairs: list[tuple[str, str]]
+    ) -> list[PositionData]:
+        """
+        Refresh known obligations with a single getMultipleAccounts call.
+
+        `pairs` holds (wallet, obligation_key) tuples, at most
+        MAX_MULTIPLE_ACCOUNTS of them. Closed accounts stop being tracked.
+        """
+        keys = [key for _, key in pairs]
+        values = await self.rpc.get_multiple_accounts(keys)
+        await self._prefetch_reserves(
+            [base64.b64decode(v["data"][0]) for v in values if v is not None]
+        )
+
+        positions = []
+        for (wallet, key), value in zip(pairs, values):
+            if value is None:
+                self.tracker.remove(key)
+                continue
+            position = await self._parse_account(wallet, {"pubkey": key, "account": value})
+            if position and position.total_debt_usd > 0:
+                positions.append(position)
+        return positions
+
+    async def _prefetch_reserves(self, datas: list[bytes]):
+        """Load every reserve referenced by these obligations, and its price, in one pass"""
+        if self.reserves is None or self.decoder is None:
+            return
+        reserves = set()
+        for data in datas:
+            try:
+                obligation = self.decoder(data)
+            except Exception:
+                continue
+            reserves.update(e.reserve for e in obligation.deposits)
+            reserves.update(e.reserve for e in obligation.borrows)
+        await self.reserves.load_bytes(reserves)
+        await self._prefetch_prices(reserves)
+
+    async def _load_reserves(self, obligation: DecodedObligation):
+        if self.reserves is not None:
+            reserves = {e.reserve for e in obligation.deposits + obligation.borrows}
+            await self.reserves.load_bytes(reserves)
+            await self._prefetch_prices(reserves)
+
+    async def _prefetch_prices(self, reserves: set[bytes]):
+        if self.prices is None:
+            return
+        mints = {self._reserve_params(r).mint for r in reserves}
+        mints.discard("")
+        if mints:
+            await self.prices.get_prices(mints)
+
+    def _reserve_params(self, reserve: bytes) -> ReserveInfo:
+        """Cached parameters for an entry's reserve, or the adapter defaults"""
+        info = self.reserves.get_by_bytes(reserve) if self.reserves is not None else None
+        return info or self.default_reserve
+
+    def liquidation_threshold(self, reserve: bytes) -> float:
+        """Liquidation threshold of a deposit in this reserve"""
+        return self._reserve_params(reserve).liquidation_threshold
+
+    def _weighted_threshold(self, obligation: DecodedObligation) -> float:
+        """Deposit-value-weighted liquidation threshold from cached reserve parameters"""
+        total = sum(e.value_usd for e in obligation.deposits)
+        if total <= 0:
+            return DEFAULT_LIQUIDATION_THRESHOLD
+        return sum(
+            e.value_usd * self.liquidation_threshold(e.reserve) for e in obligation.deposits
+        ) / total
+
+    def _entry_value(self, reserve: ReserveInfo, tokens: float, recorded_usd: float) -> float:
+        """
+        USD value of an entry at the shared service's price.
+
+        Falls back to the value recorded in the account when the mint is
+        unknown or has never been priced, since that beats a static guess.
+        """
+        if self.prices is None or not reserve.mint:
+            return recorded_usd
+        quote = self.prices.peek(reserve.mint)
+        if quote is None or quote.source == "fallback":
+            return recorded_usd
+        return tokens * quote.price
+
     def classify_risk(self, health_factor: float, warn: float = 1.5, critical: float = 1.2, emergency: float = 1.05) -> RiskLevel:
         """Classify risk level based on health factor"""
         if health_factor < emergency:
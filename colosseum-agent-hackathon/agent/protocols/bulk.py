@@ -0,0 +1,344 @@
+"""Columnar bulk decoding of obligation account snapshots
+
+For market-wide surveillance, raw account bytes are copied once into a
+single zero-padded buffer and viewed through NumPy structured dtypes that
+mirror the layouts in `layouts.py`. Deposited value, borrowed value and
+health factor come out as columnar arrays; `PositionData` is only built,
+through the adapter's scalar path, for rows that cross a risk threshold.
+Health factors use each row's deposit-weighted liquidation threshold from
+the adapter's reserve parameters, as the scalar path does.
+"""
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Optional
+
+import numpy as np
+from solders.pubkey import Pubkey
+
+from .layouts import (
+    KAMINO_DEPOSITS_LEN_OFFSET,
+    KAMINO_ENTRY,
+    KAMINO_MAX_ENTRIES,
+    MARGINFI_BALANCE,
+    MARGINFI_BALANCES_OFFSET,
+    MARGINFI_MAX_BALANCES,
+    SOLEND_DEPOSIT,
+    SOLEND_DEPOSITS_LEN_OFFSET,
+    SOLEND_MAX_DEPOSITS,
+    SOLEND_VALUES,
+    SOLEND_VALUES_OFFSET,
+)
+
+if TYPE_CHECKING:
+    from .base import PositionData, ProtocolAdapter
+
+# Entry dtype shared by Kamino deposits/borrows (see KAMINO_ENTRY)
+KAMINO_ENTRY_DTYPE = np.dtype([
+    ("reserve", "V32"),
+    ("amount", "<u8"),
+    ("market_value", "<u8"),
+])
+MARGINFI_BALANCE_DTYPE = np.dtype([
+    ("active", "u1"),
+    ("bank", "V32"),
+    ("asset_shares_lo", "<u8"),
+    ("asset_shares_hi", "<u8"),
+    ("liability_shares_lo", "<u8"),
+    ("liability_shares_hi", "<u8"),
+])
+SOLEND_DEPOSIT_DTYPE = np.dtype([
+    ("reserve", "V32"),
+    ("deposited_amount", "<u8"),
+    ("market_value", "<u8"),
+    ("padding", "V8"),
+])
+assert KAMINO_ENTRY_DTYPE.itemsize == KAMINO_ENTRY.size
+assert MARGINFI_BALANCE_DTYPE.itemsize == MARGINFI_BALANCE.size
+assert SOLEND_DEPOSIT_DTYPE.itemsize == SOLEND_DEPOSIT.size
+
+# Deposits are fixed at offset 73; borrows follow them, so the furthest
+# byte a Kamino row can need is the end of the last possible borrow.
+_KAMINO_DEPOSITS_OFFSET = KAMINO_DEPOSITS_LEN_OFFSET + 1
+_KAMINO_MIN_WIDTH = _KAMINO_DEPOSITS_OFFSET + 2 * KAMINO_MAX_ENTRIES * KAMINO_ENTRY.size + 1
+_MARKET_VALUE_OFFSET = KAMINO_ENTRY_DTYPE.fields["market_value"][1]
+
+
+def _row_dtype(width: int, fields: dict[str, tuple]) -> np.dtype:
+    """Structured dtype with explicit byte offsets over a row of `width` bytes"""
+    return np.dtype({
+        "names": list(fields),
+        "formats": [fmt for fmt, _ in fields.values()],
+        "offsets": [offset for _, offset in fields.values()],
+        "itemsize": width,
+    })
+
+
+def _ensure_width(rows: np.ndarray, width: int) -> np.ndarray:
+    """Zero-pad rows on the right so fixed-offset fields are always in bounds"""
+    if rows.shape[1] >= width:
+        return rows
+    return np.pad(rows, ((0, 0), (0, width - rows.shape[1])))
+
+
+def _u128(lo: np.ndarray, hi: np.ndarray) -> np.ndarray:
+    return hi.astype(np.float64) * 2.0 ** 64 + lo.astype(np.float64)
+
+
+def pack_accounts(accounts: list[bytes], min_width: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Copy accounts into one zero-padded (n, width) uint8 matrix.
+
+    Returns the matrix and each account's true length, which decoders use
+    to mask out fields that fall past the end of a short account.
+    """
+    lengths = np.fromiter((len(a) for a in accounts), dtype=np.int64, count=len(accounts))
+    width = max(int(lengths.max(initial=0)), min_width)
+    # One contiguous buffer; every row starts at a multiple of `width`
+    buffer = bytearray(len(accounts) * width)
+    for i, data in enumerate(accounts):
+        buffer[i * width:i * width + len(data)] = data
+    rows = np.frombuffer(buffer, dtype=np.uint8).reshape(len(accounts), width)
+    return rows, lengths
+
+
+def _kamino_deposits(
+    rows: np.ndarray, lengths: np.ndarray
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(padded rows, deposit entries, deposit count) for packed Kamino obligations"""
+    rows = _ensure_width(rows, _KAMINO_MIN_WIDTH)
+    n, width = rows.shape
+    view = rows.view(_row_dtype(width, {
+        "deposits_len": ("u1", KAMINO_DEPOSITS_LEN_OFFSET),
+        "deposits": ((KAMINO_ENTRY_DTYPE, (KAMINO_MAX_ENTRIES,)), _KAMINO_DEPOSITS_OFFSET),
+    })).reshape(n)
+
+    # Deposits sit at a fixed offset, so they are read straight off the view
+    has_len = lengths > KAMINO_DEPOSITS_LEN_OFFSET
+    dep_count = np.where(has_len, np.minimum(view["deposits_len"], KAMINO_MAX_ENTRIES), 0)
+    dep_count = np.clip(
+        np.minimum(dep_count, (lengths - _KAMINO_DEPOSITS_OFFSET) // KAMINO_ENTRY.size), 0, None
+    )
+    return rows, view["deposits"], dep_count
+
+
+def kamino_deposits(rows: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(reserve, value_usd) per deposit slot of packed Kamino obligations; empty slots are 0"""
+    _, deposits, dep_count = _kamino_deposits(rows, lengths)
+    dep_mask = np.arange(KAMINO_MAX_ENTRIES)[None, :] < dep_count[:, None]
+    return deposits["reserve"], np.where(dep_mask, deposits["market_value"], 0) / 1e6
+
+
+def kamino_columns(rows: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(collateral_usd, debt_usd) columns for packed Kamino obligations"""
+    rows, deposits, dep_count = _kamino_deposits(rows, lengths)
+    n = rows.shape[0]
+    slots = np.arange(KAMINO_MAX_ENTRIES)
+    size = KAMINO_ENTRY.size
+
+    dep_mask = slots[None, :] < dep_count[:, None]
+    collateral = np.where(dep_mask, deposits["market_value"], 0).sum(axis=1) / 1e6
+
+    # Borrows start right after the last deposit, so their offset varies
+    # per row and the market values are gathered with index arrays
+    borrows_len_at = _KAMINO_DEPOSITS_OFFSET + dep_count * size
+    row_idx = np.arange(n)
+    bor_count = np.where(
+        borrows_len_at < lengths,
+        np.minimum(rows[row_idx, borrows_len_at], KAMINO_MAX_ENTRIES),
+        0,
+    )
+    bor_count = np.clip(np.minimum(bor_count, (lengths - borrows_len_at - 1) // size), 0, None)
+    value_at = (
+        borrows_len_at[:, None, None] + 1 + _MARKET_VALUE_OFFSET
+        + slots[None, :, None] * size
+        + np.arange(8)[None, None, :]
+    )
+    values = np.ascontiguousarray(rows[row_idx[:, None, None], value_at]).view("<u8")[..., 0]
+    bor_mask = slots[None, :] < bor_count[:, None]
+    debt = np.where(bor_mask, values, 0).sum(axis=1) / 1e6
+
+    return collateral, debt
+
+
+def _marginfi_balances(
+    rows: np.ndarray, lengths: np.ndarray, share_scale: float
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(balances, assets, liabilities) for packed MarginFi accounts; dead slots are 0"""
+    rows = _ensure_width(
+        rows, MARGINFI_BALANCES_OFFSET + MARGINFI_MAX_BALANCES * MARGINFI_BALANCE.size
+    )
+    n, width = rows.shape
+    view = rows.view(_row_dtype(width, {
+        "balances": ((MARGINFI_BALANCE_DTYPE, (MARGINFI_MAX_BALANCES,)), MARGINFI_BALANCES_OFFSET),
+    })).reshape(n)
+    balances = view["balances"]
+
+    count = np.clip((lengths - MARGINFI_BALANCES_OFFSET) // MARGINFI_BALANCE.size, 0, MARGINFI_MAX_BALANCES)
+    live = (balances["active"] != 0) & (np.arange(MARGINFI_MAX_BALANCES)[None, :] < count[:, None])
+
+    assets = _u128(balances["asset_shares_lo"], balances["asset_shares_hi"]) / share_scale
+    liabilities = _u128(balances["liability_shares_lo"], balances["liability_shares_hi"]) / share_scale
+    return (
+        balances,
+        np.where(live & (assets > 0.01), assets, 0.0),
+        np.where(live & (liabilities > 0.01), liabilities, 0.0),
+    )
+
+
+def marginfi_deposits(
+    rows: np.ndarray, lengths: np.ndarray, share_scale: float = 1e15
+) -> tuple[np.ndarray, np.ndarray]:
+    """(bank, value_usd) per balance slot of packed MarginFi accounts; empty slots are 0"""
+    balances, assets, _ = _marginfi_balances(rows, lengths, share_scale)
+    return balances["bank"], assets
+
+
+def marginfi_columns(
+    rows: np.ndarray, lengths: np.ndarray, share_scale: float = 1e15
+) -> tuple[np.ndarray, np.ndarray]:
+    """(collateral_usd, debt_usd) columns for packed MarginFi accounts"""
+    _, assets, liabilities = _marginfi_balances(rows, lengths, share_scale)
+    return assets.sum(axis=1), liabilities.sum(axis=1)
+
+
+def solend_columns(rows: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(collateral_usd, debt_usd) columns for packed Solend obligations"""
+    rows = _ensure_width(rows, SOLEND_VALUES_OFFSET + SOLEND_VALUES.size)
+    n, width = rows.shape
+    view = rows.view(_row_dtype(width, {
+        name: ("<u8", SOLEND_VALUES_OFFSET + 8 * i)
+        for i, name in enumerate(SOLEND_VALUES.names)
+    })).reshape(n)
+
+    collateral = np.where(
+        lengths >= SOLEND_VALUES_OFFSET + 16,
+        _u128(view["deposited_value_lo"], view["deposited_value_hi"]) / 1e18,
+        0.0,
+    )
+    debt = np.where(
+        lengths >= SOLEND_VALUES_OFFSET + SOLEND_VALUES.size,
+        _u128(view["borrowed_value_lo"], view["borrowed_value_hi"]) / 1e18,
+        0.0,
+    )
+    return collateral, debt
+
+
+def solend_deposits(rows: np.ndarray, lengths: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(reserve, value_usd) per deposit slot of packed Solend obligations; empty slots are 0"""
+    first = SOLEND_DEPOSITS_LEN_OFFSET + 1
+    rows = _ensure_width(rows, first + SOLEND_MAX_DEPOSITS * SOLEND_DEPOSIT.size)
+    n, width = rows.shape
+    view = rows.view(_row_dtype(width, {
+        "deposits_len": ("u1", SOLEND_DEPOSITS_LEN_OFFSET),
+        "deposits": ((SOLEND_DEPOSIT_DTYPE, (SOLEND_MAX_DEPOSITS,)), first),
+    })).reshape(n)
+
+    count = np.where(
+        lengths > SOLEND_DEPOSITS_LEN_OFFSET,
+        np.minimum(view["deposits_len"], SOLEND_MAX_DEPOSITS),
+        0,
+    )
+    count = np.clip(np.minimum(count, (lengths - first) // SOLEND_DEPOSIT.size), 0, None)
+    mask = np.arange(SOLEND_MAX_DEPOSITS)[None, :] < count[:, None]
+    deposits = view["deposits"]
+    return deposits["reserve"], np.where(mask, deposits["market_value"], 0) / 1e6
+
+
+ColumnDecoder = Callable[[np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]
+DepositDecoder = Callable[[np.ndarray, np.ndarray], tuple[np.ndarray, np.ndarray]]
+
+
+def liquidation_thresholds(
+    reserves: np.ndarray,
+    values: np.ndarray,
+    threshold_of: Callable[[bytes], float],
+    default: float,
+) -> np.ndarray:
+    """
+    Deposit-value-weighted liquidation threshold per row.
+
+    `reserves` and `values` are (n, slots) from a deposit decoder;
+    `threshold_of` is called once per distinct reserve. Rows without
+    deposits get `default`.
+    """
+    held = values > 0
+    thresholds = np.zeros(values.shape)
+    if held.any():
+        unique, inverse = np.unique(reserves[held], return_inverse=True)
+        per_reserve = np.fromiter(
+            (threshold_of(r.tobytes()) for r in unique), dtype=np.float64, count=len(unique)
+        )
+        thresholds[held] = per_reserve[inverse]
+    total = values.sum(axis=1)
+    weighted = (values * thresholds).sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(total > 0, weighted / total, default)
+
+
+def health_factors(
+    collateral: np.ndarray, debt: np.ndarray, liquidation_threshold: np.ndarray | float
+) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(debt > 0, collateral * liquidation_threshold / debt, np.inf)
+
+
+@dataclass
+class ObligationSnapshot:
+    """Columnar view of every obligation pulled in one market scan"""
+    adapter: "ProtocolAdapter"
+    keys: list[str]
+    accounts: list[bytes]
+    owners: np.ndarray  # (n, 32) uint8
+    collateral_usd: np.ndarray
+    debt_usd: np.ndarray
+    liquidation_threshold: np.ndarray
+    health_factor: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def at_risk(self, threshold: float) -> np.ndarray:
+        """Row indices of indebted obligations with health factor below threshold"""
+        return np.flatnonzero((self.debt_usd > 0) & (self.health_factor < threshold))
+
+    def owner(self, row: int) -> str:
+        return str(Pubkey.from_bytes(self.owners[row].tobytes()))
+
+    def position(self, row: int) -> Optional["PositionData"]:
+        return self.adapter.position_from_bytes(
+            self.owner(row), self.keys[row], self.accounts[row]
+        )
+
+    def positions(self, threshold: float) -> list["PositionData"]:
+        """Build PositionData only for rows below `threshold`, riskiest first"""
+        rows = self.at_risk(threshold)
+        rows = rows[np.argsort(self.health_factor[rows], kind="stable")]
+        return [p for p in (self.position(int(r)) for r in rows) if p is not None]
+
+
+def decode_snapshot(
+    adapter: "ProtocolAdapter", accounts: list[tuple[str, bytes]]
+) -> ObligationSnapshot:
+    """Decode (pubkey, raw data) pairs into columns with the adapter's decoder"""
+    keys = [key for key, _ in accounts]
+    datas = [data for _, data in accounts]
+    offset = adapter.owner_offset
+    rows, lengths = pack_accounts(datas, min_width=offset + 32)
+    collateral, debt = adapter.column_decoder(rows, lengths)
+    default = adapter.default_reserve.liquidation_threshold
+    if adapter.deposit_decoder is not None:
+        thresholds = liquidation_thresholds(
+            *adapter.deposit_decoder(rows, lengths), adapter.liquidation_threshold, default
+        )
+    else:
+        thresholds = np.full(len(keys), default)
+
+    return ObligationSnapshot(
+        adapter=adapter,
+        keys=keys,
+        accounts=datas,
+        owners=rows[:, offset:offset + 32],
+        collateral_usd=collateral,
+        debt_usd=debt,
+        liquidation_threshold=thresholds,
+        health_factor=health_factors(collateral, debt, thresholds),
+    )
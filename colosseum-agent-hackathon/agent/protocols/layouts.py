@@ -0,0 +1,254 @@
+"""Precompiled account layouts for zero-copy obligation decoding
+
+Each record layout is declared once as an ordered list of (name, format)
+fields and compiled into a single little-endian `struct.Struct`. Decoders
+unpack straight out of the account buffer, a whole entry array per call,
+so no intermediate byte slices are created per field.
+"""
+import struct
+from dataclasses import dataclass, field
+from functools import lru_cache, partial
+from typing import NamedTuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+U64 = 2 ** 64
+
+
+@dataclass(frozen=True)
+class RecordLayout:
+    """A fixed-size record compiled from declarative (name, format) fields"""
+    name: str
+    fields: tuple[tuple[str, str], ...]
+    body: str = field(init=False, repr=False)
+    compiled: struct.Struct = field(init=False, repr=False)
+    names: tuple[str, ...] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        body = "".join(fmt for _, fmt in self.fields)
+        # Padding ("x") fields produce no value, so they get no name
+        names = tuple(n for n, fmt in self.fields if not fmt.endswith("x"))
+        object.__setattr__(self, "body", body)
+        object.__setattr__(self, "compiled", struct.Struct("<" + body))
+        object.__setattr__(self, "names", names)
+
+    @property
+    def size(self) -> int:
+        return self.compiled.size
+
+    def unpack_array(self, buf: Buffer, offset: int, count: int) -> tuple:
+        """Unpack `count` consecutive records in one call, as one flat tuple"""
+        return _array_struct(self.body, count).unpack_from(buf, offset)
+
+    def unpack_from(self, buf: Buffer, offset: int = 0) -> tuple:
+        return self.compiled.unpack_from(buf, offset)
+
+    def unpack_dict(self, buf: Buffer, offset: int = 0) -> dict:
+        return dict(zip(self.names, self.compiled.unpack_from(buf, offset)))
+
+    def index(self, name: str) -> int:
+        return self.names.index(name)
+
+
+@lru_cache(maxsize=None)
+def _array_struct(body: str, count: int) -> struct.Struct:
+    return struct.Struct("<" + body * count)
+
+
+def u128(lo: int, hi: int) -> int:
+    """Combine the two little-endian u64 halves of a u128"""
+    return hi * U64 + lo
+
+
+# Kamino obligation (simplified):
+# [8 discriminator][32 owner][32 lending_market]
+# [u8 deposits_len][deposits...][u8 borrows_len][borrows...]
+KAMINO_DEPOSITS_LEN_OFFSET = 72
+KAMINO_MAX_ENTRIES = 8
+KAMINO_ENTRY = RecordLayout("KaminoObligationEntry", (
+    ("reserve", "32s"),
+    ("amount", "Q"),
+    ("market_value", "Q"),
+))
+KAMINO_TOTALS_OFFSET = 80
+KAMINO_TOTALS = RecordLayout("KaminoObligationTotals", (
+    ("deposited_value", "Q"),
+    ("_reserved", "8x"),
+    ("borrowed_value", "Q"),
+))
+
+# MarginFi account (simplified):
+# [8 discriminator][32 group][32 authority][16 x balance]
+MARGINFI_BALANCES_OFFSET = 72
+MARGINFI_MAX_BALANCES = 16
+MARGINFI_BALANCE = RecordLayout("MarginFiBalance", (
+    ("active", "B"),
+    ("bank", "32s"),
+    ("asset_shares_lo", "Q"),
+    ("asset_shares_hi", "Q"),
+    ("liability_shares_lo", "Q"),
+    ("liability_shares_hi", "Q"),
+))
+
+# Solend obligation (simplified):
+# [1 version][8 last_update_slot][1 stale][32 lending_market][32 owner]...
+# [u128 deposited_value][u128 borrowed_value] ... [u8 deposits_len][deposits...]
+SOLEND_VALUES_OFFSET = 66
+SOLEND_VALUES = RecordLayout("SolendObligationValues", (
+    ("deposited_value_lo", "Q"),
+    ("deposited_value_hi", "Q"),
+    ("borrowed_value_lo", "Q"),
+    ("borrowed_value_hi", "Q"),
+))
+SOLEND_DEPOSITS_LEN_OFFSET = 130
+SOLEND_MAX_DEPOSITS = 10
+SOLEND_DEPOSIT = RecordLayout("SolendObligationCollateral", (
+    ("reserve", "32s"),
+    ("deposited_amount", "Q"),
+    ("market_value", "Q"),
+    ("_padding", "8x"),
+))
+
+
+class ObligationEntry(NamedTuple):
+    """One deposit or borrow decoded from an obligation account"""
+    slot: int
+    reserve: bytes
+    amount: int
+    value_usd: float
+
+
+# tuple.__new__ skips the generated keyword-argument __new__, which
+# otherwise dominates decode time for accounts with only a few entries
+_new_entry = partial(tuple.__new__, ObligationEntry)
+
+
+class DecodedObligation(NamedTuple):
+    """Protocol-neutral view of an obligation account"""
+    deposits: list[ObligationEntry]
+    borrows: list[ObligationEntry]
+    total_collateral_usd: float
+    total_debt_usd: float
+
+
+_new_obligation = partial(tuple.__new__, DecodedObligation)
+
+
+@lru_cache(maxsize=None)
+def _kamino_struct(deposits: int, borrows: int, borrows_len: bool) -> struct.Struct:
+    """[u8 len][deposits][u8 len][borrows] as one struct, the second len only if present"""
+    body = "B" + KAMINO_ENTRY.body * deposits
+    if borrows_len:
+        body += "B" + KAMINO_ENTRY.body * borrows
+    return struct.Struct("<" + body)
+
+
+def _entries(
+    values: tuple, start: int, count: int, usd_scale: float
+) -> tuple[list[ObligationEntry], float]:
+    """`count` entries from flat (reserve, amount, market_value) values, and their USD total"""
+    # A plain loop over the unpacked values: obligations hold a handful of
+    # entries, too few to amortize setting up zip/map iterators per call
+    entries = []
+    total = 0.0
+    for i in range(count):
+        j = start + 3 * i
+        value = values[j + 2] / usd_scale
+        total += value
+        entries.append(_new_entry((i, values[j], values[j + 1], value)))
+    return entries, total
+
+
+def decode_kamino_obligation(data: Buffer) -> DecodedObligation:
+    size = len(data)
+    if size <= KAMINO_DEPOSITS_LEN_OFFSET:
+        return _new_obligation(([], [], 0.0, 0.0))
+
+    # Entry counts, capped at the entries actually present
+    entry = KAMINO_ENTRY.size
+    offset = KAMINO_DEPOSITS_LEN_OFFSET + 1
+    deposits = min(data[offset - 1], KAMINO_MAX_ENTRIES, (size - offset) // entry)
+    offset += deposits * entry + 1
+    borrows_len = offset <= size
+    borrows = min(data[offset - 1], KAMINO_MAX_ENTRIES, (size - offset) // entry) if borrows_len else 0
+
+    # Both entry arrays, and the count between them, in one unpack call
+    values = _kamino_struct(deposits, borrows, borrows_len).unpack_from(
+        data, KAMINO_DEPOSITS_LEN_OFFSET
+    )
+    deposit_entries, collateral = _entries(values, 1, deposits, 1e6)
+    borrow_entries, debt = _entries(values, 2 + 3 * deposits, borrows, 1e6)
+    return _new_obligation((deposit_entries, borrow_entries, collateral, debt))
+
+
+def decode_kamino_totals(data: Buffer) -> tuple[float, float]:
+    """(collateral, debt) in USD from the obligation's cached totals"""
+    deposited, borrowed = KAMINO_TOTALS.unpack_from(data, KAMINO_TOTALS_OFFSET)
+    return deposited / 1e6, borrowed / 1e6
+
+
+def decode_marginfi_account(data: Buffer, share_scale: float = 1e15) -> DecodedObligation:
+    mv = memoryview(data)
+    size = MARGINFI_BALANCE.size
+    count = max(0, min(MARGINFI_MAX_BALANCES, (len(mv) - MARGINFI_BALANCES_OFFSET) // size))
+    unpack = MARGINFI_BALANCE.compiled.unpack_from
+
+    deposits = []
+    borrows = []
+    for i in range(count):
+        offset = MARGINFI_BALANCES_OFFSET + i * size
+        # Check the active flag in place so inactive slots are never unpacked
+        if not mv[offset]:
+            continue
+        _, bank, a_lo, a_hi, l_lo, l_hi = unpack(mv, offset)
+        asset_shares = u128(a_lo, a_hi)
+        liability_shares = u128(l_lo, l_hi)
+        if asset_shares / share_scale > 0.01:
+            deposits.append(_new_entry((i, bank, asset_shares, asset_shares / share_scale)))
+        if liability_shares / share_scale > 0.01:
+            borrows.append(
+                _new_entry((i, bank, liability_shares, liability_shares / share_scale))
+            )
+
+    return DecodedObligation(
+        deposits=deposits,
+        borrows=borrows,
+        total_collateral_usd=sum(e.value_usd for e in deposits),
+        total_debt_usd=sum(e.value_usd for e in borrows),
+    )
+
+
+@lru_cache(maxsize=None)
+def _solend_struct(deposits: int) -> struct.Struct:
+    """Values through the deposits array as one struct, skipping the fields between"""
+    gap = SOLEND_DEPOSITS_LEN_OFFSET - SOLEND_VALUES_OFFSET - SOLEND_VALUES.size
+    return struct.Struct(
+        f"<{SOLEND_VALUES.body}{gap}xB" + SOLEND_DEPOSIT.body * deposits
+    )
+
+
+def decode_solend_obligation(data: Buffer) -> DecodedObligation:
+    size = len(data)
+    offset = SOLEND_DEPOSITS_LEN_OFFSET + 1
+    if size >= offset:
+        # Values, and the deposits capped at those present, in one unpack call
+        count = min(data[offset - 1], SOLEND_MAX_DEPOSITS, (size - offset) // SOLEND_DEPOSIT.size)
+        values = _solend_struct(count).unpack_from(data, SOLEND_VALUES_OFFSET)
+        # Padding yields no value, so the deposits unpack as flat triples too
+        entries, _ = _entries(values, 5, count, 1e6)
+        return _new_obligation((
+            [e for e in entries if e.value_usd > 0],
+            [],
+            u128(values[0], values[1]) / 1e18,
+            u128(values[2], values[3]) / 1e18,
+        ))
+
+    total_collateral = total_debt = 0.0
+    if size >= SOLEND_VALUES_OFFSET + SOLEND_VALUES.size:
+        d_lo, d_hi, b_lo, b_hi = SOLEND_VALUES.unpack_from(data, SOLEND_VALUES_OFFSET)
+        total_collateral = u128(d_lo, d_hi) / 1e18
+        total_debt = u128(b_lo, b_hi) / 1e18
+    elif size >= SOLEND_VALUES_OFFSET + 16:
+        d_lo, d_hi = struct.unpack_from("<QQ", data, SOLEND_VALUES_OFFSET)
+        total_collateral = u128(d_lo, d_hi) / 1e18
+    return _new_obligation(([], [], total_collateral, total_debt))
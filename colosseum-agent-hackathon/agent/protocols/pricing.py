@@ -0,0 +1,201 @@
+"""Process-wide token price service with single-flight refresh"""
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import AsyncIterable, Iterable, Optional
+
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+JUPITER_PRICE_API = "https://api.jup.ag/price/v2"
+# Jupiter accepts at most 100 ids per price request
+MAX_IDS_PER_REQUEST = 100
+
+# Observations kept per mint for volatility estimates
+HISTORY_LENGTH = 64
+
+# Served only when a mint has never been priced successfully
+FALLBACK_PRICES = {
+    "So11111111111111111111111111111111111111112": 150.0,
+    "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v": 1.0,
+    "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB": 1.0,
+}
+
+
+@dataclass(frozen=True)
+class PriceQuote:
+    """A USD price and when it was observed"""
+    mint: str
+    price: float
+    updated_at: float
+    source: str  # "jupiter", "push" or "fallback"
+
+    def age_seconds(self, now: Optional[float] = None) -> float:
+        now = now if now is not None else time.time()
+        return now - self.updated_at
+
+
+class PriceService:
+    """
+    One price cache shared by every adapter and the analyzer.
+
+    Each mint has its own timestamp and is refreshed once it is older than
+    `ttl_seconds`. However many callers ask at once, at most one refresh
+    request is in flight; callers whose mints it covers simply await it.
+    Prices can also be pushed from a streaming feed. When a refresh fails
+    the last good quote keeps being served, with its age, and the static
+    fallback is only used for mints that were never priced.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = 30,
+        api_url: str = JUPITER_PRICE_API,
+        timeout: float = 10,
+        fallback_prices: Optional[dict[str, float]] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.api_url = api_url
+        self.fallback_prices = FALLBACK_PRICES if fallback_prices is None else fallback_prices
+        self.client = httpx.AsyncClient(timeout=timeout, transport=transport)
+        self._quotes: dict[str, PriceQuote] = {}
+        self._history: dict[str, deque[tuple[float, float]]] = {}
+        self._inflight: Optional[asyncio.Task] = None
+        self._inflight_mints: frozenset[str] = frozenset()
+        self.refreshes = 0
+        self.refresh_errors = 0
+        self.pushes = 0
+
+    def is_fresh(self, mint: str, now: Optional[float] = None) -> bool:
+        quote = self._quotes.get(mint)
+        return quote is not None and quote.age_seconds(now) < self.ttl_seconds
+
+    def peek(self, mint: str) -> Optional[PriceQuote]:
+        """Latest known quote without refreshing; falls back to static prices"""
+        quote = self._quotes.get(mint)
+        if quote is None and mint in self.fallback_prices:
+            quote = PriceQuote(mint, self.fallback_prices[mint], 0.0, "fallback")
+        return quote
+
+    def volatility_pct(
+        self, mint: str, window_seconds: float = 300, now: Optional[float] = None
+    ) -> float:
+        """High-low range of observed prices over the window, as % of the latest"""
+        history = self._history.get(mint)
+        if not history:
+            return 0.0
+        now = now if now is not None else time.time()
+        recent = [price for ts, price in history if now - ts <= window_seconds]
+        if len(recent) < 2 or history[-1][1] <= 0:
+            return 0.0
+        return (max(recent) - min(recent)) / history[-1][1] * 100
+
+    def _record(self, quote: PriceQuote):
+        self._quotes[quote.mint] = quote
+        history = self._history.setdefault(quote.mint, deque(maxlen=HISTORY_LENGTH))
+        history.append((quote.updated_at, quote.price))
+
+    async def get_prices(self, mints: Iterable[str]) -> dict[str, PriceQuote]:
+        """Quotes for `mints`, refreshing any that are stale first"""
+        wanted = set(mints)
+        await self.refresh(wanted)
+
+        quotes = {}
+        now = time.time()
+        for mint in wanted:
+            quote = self.peek(mint)
+            if quote is None:
+                continue
+            if quote.age_seconds(now) >= self.ttl_seconds:
+                logger.warning(
+                    "price_stale",
+                    mint=mint[:8] + "...",
+                    source=quote.source,
+                    age_s=round(quote.age_seconds(now), 1),
+                )
+            quotes[mint] = quote
+        return quotes
+
+    async def get_price(self, mint: str) -> Optional[PriceQuote]:
+        return (await self.get_prices([mint])).get(mint)
+
+    async def refresh(self, mints: Iterable[str]):
+        """Refresh stale mints, joining the in-flight request where it covers them"""
+        wanted = set(mints)
+        attempted: set[str] = set()
+        while True:
+            now = time.time()
+            missing = {m for m in wanted if not self.is_fresh(m, now)} - attempted
+            if not missing:
+                return
+            if self._inflight is None or self._inflight.done():
+                # Piggyback every other stale mint onto the same request
+                stale = {m for m in self._quotes if not self.is_fresh(m, now)}
+                self._inflight_mints = frozenset(missing | stale)
+                self._inflight = asyncio.create_task(self._fetch(self._inflight_mints))
+            attempted |= self._inflight_mints
+            await asyncio.shield(self._inflight)
+
+    def push(self, mint: str, price: float, timestamp: Optional[float] = None):
+        """Record a price from a push feed (e.g. an oracle stream)"""
+        updated_at = timestamp if timestamp is not None else time.time()
+        current = self._quotes.get(mint)
+        if current is not None and current.updated_at > updated_at:
+            return
+        self._record(PriceQuote(mint, float(price), updated_at, "push"))
+        self.pushes += 1
+
+    async def consume(self, feed: AsyncIterable[tuple[str, float]]):
+        """Apply (mint, price) updates from a push feed until it ends"""
+        async for mint, price in feed:
+            self.push(mint, price)
+
+    async def _fetch(self, mints: frozenset[str]):
+        self.refreshes += 1
+        ordered = sorted(mints)
+        chunks = [
+            ordered[i:i + MAX_IDS_PER_REQUEST]
+            for i in range(0, len(ordered), MAX_IDS_PER_REQUEST)
+        ]
+        results = await asyncio.gather(
+            *(self._fetch_chunk(chunk) for chunk in chunks), return_exceptions=True
+        )
+
+        now = time.time()
+        for result in results:
+            if isinstance(result, Exception):
+                self.refresh_errors += 1
+                logger.warning("price_refresh_error", error=str(result))
+                continue
+            for mint, price in result.items():
+                self._record(PriceQuote(mint, price, now, "jupiter"))
+
+    async def _fetch_chunk(self, mints: list[str]) -> dict[str, float]:
+        response = await self.client.get(self.api_url, params={"ids": ",".join(mints)})
+        response.raise_for_status()
+        prices = {}
+        for mint, info in (response.json().get("data") or {}).items():
+            if info and info.get("price") is not None:
+                prices[mint] = float(info["price"])
+        return prices
+
+    def get_stats(self) -> dict:
+        now = time.time()
+        ages = [q.age_seconds(now) for q in self._quotes.values()]
+        return {
+            "mints": len(self._quotes),
+            "stale": sum(1 for age in ages if age >= self.ttl_seconds),
+            "max_age_s": round(max(ages), 1) if ages else 0.0,
+            "refreshes": self.refreshes,
+            "refresh_errors": self.refresh_errors,
+            "pushes": self.pushes,
+        }
+
+    async def close(self):
+        if self._inflight is not None and not self._inflight.done():
+            await asyncio.gather(self._inflight, return_exceptions=True)
+        await self.client.aclose()
@@ -0,0 +1,345 @@
+"""Reserve and bank metadata cache
+
+Obligations only reference reserves (Kamino, Solend) or banks (MarginFi)
+by pubkey; per-asset LTVs, liquidation thresholds, mint decimals and rate
+indices live on those accounts. `ReserveCache` loads them in bulk with
+getMultipleAccounts and keeps them until they age out by TTL or fall too
+many slots behind the newest slot the cache has observed.
+"""
+import asyncio
+import base64
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Optional
+
+import structlog
+from solders.pubkey import Pubkey
+
+from .layouts import Buffer, RecordLayout, u128
+from .rpc import SolanaRpcClient
+
+logger = structlog.get_logger()
+
+# getMultipleAccounts accepts at most 100 pubkeys per call
+MAX_RESERVES_PER_CALL = 100
+
+# Known token mints (devnet/mainnet)
+TOKEN_INFO = {
+    "So11111111111111111111111111111111111111112": {"symbol": "SOL", "decimals": 9},
+    "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v": {"symbol": "USDC", "decimals": 6},
+    "Es9vMFrzaCERmJfrF4H2FYD4KCoNkY11McCe8BenwNYB": {"symbol": "USDT", "decimals": 6},
+    "mSoLzYCxHdYgdzU16g5QSh3i5K3z3KZK7ytfqcJm7So": {"symbol": "mSOL", "decimals": 9},
+    "7dHbWXmci3dT8UFYWYZweBLXgycu7Y3iL6trKn1Y7ARj": {"symbol": "stSOL", "decimals": 9},
+}
+
+# Kamino reserve (simplified):
+# [8 discriminator][u64 version][u64 last_update_slot][32 lending_market][32 mint]
+# [u8 decimals][u8 ltv_pct][u8 liquidation_threshold_pct][u16 borrow_rate_bps]
+# [u128 cumulative_borrow_rate (1e18)]
+KAMINO_RESERVE_OFFSET = 8
+KAMINO_RESERVE = RecordLayout("KaminoReserve", (
+    ("version", "Q"),
+    ("last_update_slot", "Q"),
+    ("lending_market", "32s"),
+    ("mint", "32s"),
+    ("decimals", "B"),
+    ("ltv_pct", "B"),
+    ("liquidation_threshold_pct", "B"),
+    ("borrow_rate_bps", "H"),
+    ("cumulative_borrow_rate_lo", "Q"),
+    ("cumulative_borrow_rate_hi", "Q"),
+))
+# Followed by the price oracles klend's refresh_reserve reads; an all-zero
+# key means the oracle is not configured. Older accounts may end before it.
+KAMINO_RESERVE_ORACLES_OFFSET = KAMINO_RESERVE_OFFSET + KAMINO_RESERVE.size
+KAMINO_RESERVE_ORACLES = RecordLayout("KaminoReserveOracles", (
+    ("pyth_oracle", "32s"),
+    ("switchboard_price_oracle", "32s"),
+    ("switchboard_twap_oracle", "32s"),
+    ("scope_prices", "32s"),
+))
+
+# MarginFi bank, following the marginfi-v2 zero-copy Bank up to BankConfig.
+# Share values and weights are I80F48 fixed point (48 fractional bits).
+MARGINFI_BANK = RecordLayout("MarginFiBank", (
+    ("_discriminator", "8x"),
+    ("mint", "32s"),
+    ("mint_decimals", "B"),
+    ("group", "32s"),
+    ("_pad0", "7x"),
+    ("asset_share_value_lo", "Q"),
+    ("asset_share_value_hi", "q"),
+    ("liability_share_value_lo", "Q"),
+    ("liability_share_value_hi", "q"),
+    ("_vaults_and_fees", "184x"),
+    ("asset_weight_init_lo", "Q"),
+    ("asset_weight_init_hi", "q"),
+    ("asset_weight_maint_lo", "Q"),
+    ("asset_weight_maint_hi", "q"),
+))
+I80F48_ONE = 2 ** 48
+
+# Solend reserve:
+# [1 version][8 last_update_slot][1 stale][32 lending_market]
+# liquidity: [32 mint][1 decimals][32 supply][32 pyth][32 switchboard]
+#   [u64 available_amount][u128 borrowed_wads][u128 cumulative_borrow_rate_wads][u128 market_price]
+# collateral: [32 mint][u64 mint_total_supply][32 supply]
+# config: [u8 optimal_utilization][u8 ltv][u8 liquidation_bonus][u8 liquidation_threshold]
+#   [u8 min_borrow_rate][u8 optimal_borrow_rate][u8 max_borrow_rate]
+SOLEND_RESERVE = RecordLayout("SolendReserve", (
+    ("version", "B"),
+    ("last_update_slot", "Q"),
+    ("stale", "B"),
+    ("lending_market", "32s"),
+    ("mint", "32s"),
+    ("decimals", "B"),
+    ("_liquidity_accounts", "96x"),
+    ("available_amount", "Q"),
+    ("borrowed_wads_lo", "Q"),
+    ("borrowed_wads_hi", "Q"),
+    ("cumulative_borrow_rate_lo", "Q"),
+    ("cumulative_borrow_rate_hi", "Q"),
+    ("_market_price", "16x"),
+    ("_collateral", "72x"),
+    ("optimal_utilization_pct", "B"),
+    ("ltv_pct", "B"),
+    ("liquidation_bonus_pct", "B"),
+    ("liquidation_threshold_pct", "B"),
+    ("min_borrow_rate_pct", "B"),
+    ("optimal_borrow_rate_pct", "B"),
+    ("max_borrow_rate_pct", "B"),
+))
+
+WAD = 1e18
+
+
+@dataclass
+class ReserveInfo:
+    """Per-asset risk parameters for one reserve or bank"""
+    key: str
+    mint: str
+    decimals: int
+    ltv: float
+    liquidation_threshold: float
+    borrow_rate_apy: Optional[float] = None
+    # Cumulative borrow rate (Kamino, Solend) or liability share value (MarginFi)
+    borrow_index: float = 1.0
+    # Asset share value (MarginFi); 1.0 where deposits are not share-based
+    supply_index: float = 1.0
+    # Lending market (Kamino, Solend) or group (MarginFi) the reserve belongs to
+    market: Optional[str] = None
+    # Kamino (pyth, switchboard price, switchboard twap, scope) oracles, None
+    # where unset; None as a whole when the account does not carry them
+    oracles: Optional[tuple[Optional[str], ...]] = None
+    slot: int = 0
+    fetched_at: float = 0.0
+
+    @property
+    def symbol(self) -> Optional[str]:
+        info = TOKEN_INFO.get(self.mint)
+        return info["symbol"] if info else None
+
+    def to_tokens(self, raw_amount: float) -> float:
+        return raw_amount / 10 ** self.decimals
+
+
+ReserveDecoder = Callable[[str, Buffer], Optional[ReserveInfo]]
+
+
+def decode_kamino_reserve(key: str, data: Buffer) -> Optional[ReserveInfo]:
+    if len(data) < KAMINO_RESERVE_OFFSET + KAMINO_RESERVE.size:
+        return None
+    r = KAMINO_RESERVE.unpack_dict(data, KAMINO_RESERVE_OFFSET)
+    oracles = None
+    if len(data) >= KAMINO_RESERVE_ORACLES_OFFSET + KAMINO_RESERVE_ORACLES.size:
+        oracles = tuple(
+            str(Pubkey.from_bytes(k)) if any(k) else None
+            for k in KAMINO_RESERVE_ORACLES.unpack_from(data, KAMINO_RESERVE_ORACLES_OFFSET)
+        )
+    return ReserveInfo(
+        key=key,
+        mint=str(Pubkey.from_bytes(r["mint"])),
+        decimals=r["decimals"],
+        ltv=r["ltv_pct"] / 100,
+        liquidation_threshold=r["liquidation_threshold_pct"] / 100,
+        borrow_rate_apy=r["borrow_rate_bps"] / 10_000,
+        borrow_index=u128(r["cumulative_borrow_rate_lo"], r["cumulative_borrow_rate_hi"]) / WAD,
+        market=str(Pubkey.from_bytes(r["lending_market"])),
+        oracles=oracles,
+    )
+
+
+def decode_marginfi_bank(key: str, data: Buffer) -> Optional[ReserveInfo]:
+    if len(data) < MARGINFI_BANK.size:
+        return None
+    b = MARGINFI_BANK.unpack_dict(data)
+
+    def i80f48(name: str) -> float:
+        return u128(b[f"{name}_lo"], b[f"{name}_hi"]) / I80F48_ONE
+
+    return ReserveInfo(
+        key=key,
+        mint=str(Pubkey.from_bytes(b["mint"])),
+        decimals=b["mint_decimals"],
+        # Initial weight gates new borrows; maintenance weight gates liquidation
+        ltv=i80f48("asset_weight_init"),
+        liquidation_threshold=i80f48("asset_weight_maint"),
+        borrow_index=i80f48("liability_share_value"),
+        supply_index=i80f48("asset_share_value"),
+        market=str(Pubkey.from_bytes(b["group"])),
+    )
+
+
+def decode_solend_reserve(key: str, data: Buffer) -> Optional[ReserveInfo]:
+    if len(data) < SOLEND_RESERVE.size:
+        return None
+    r = SOLEND_RESERVE.unpack_dict(data)
+
+    borrowed = u128(r["borrowed_wads_lo"], r["borrowed_wads_hi"]) / WAD
+    supplied = r["available_amount"] + borrowed
+    utilization = borrowed / supplied if supplied > 0 else 0.0
+
+    # Solend's kinked utilization curve, rates in percent
+    optimal_util = r["optimal_utilization_pct"] / 100
+    min_rate = r["min_borrow_rate_pct"]
+    optimal_rate = r["optimal_borrow_rate_pct"]
+    max_rate = r["max_borrow_rate_pct"]
+    if optimal_util >= 1 or utilization <= optimal_util:
+        fraction = utilization / optimal_util if optimal_util > 0 else 1.0
+        rate = min_rate + fraction * (optimal_rate - min_rate)
+    else:
+        fraction = (utilization - optimal_util) / (1 - optimal_util)
+        rate = optimal_rate + fraction * (max_rate - optimal_rate)
+
+    return ReserveInfo(
+        key=key,
+        mint=str(Pubkey.from_bytes(r["mint"])),
+        decimals=r["decimals"],
+        ltv=r["ltv_pct"] / 100,
+        liquidation_threshold=r["liquidation_threshold_pct"] / 100,
+        borrow_rate_apy=rate / 100,
+        borrow_index=u128(r["cumulative_borrow_rate_lo"], r["cumulative_borrow_rate_hi"]) / WAD,
+        market=str(Pubkey.from_bytes(r["lending_market"])),
+    )
+
+
+class ReserveCache:
+    """
+    Reserve/bank metadata keyed by pubkey, loaded in bulk.
+
+    `load()` fetches every missing or stale key with as few
+    getMultipleAccounts calls as possible; concurrent loads of the same
+    key share one request. `get()` is synchronous so obligation parsing
+    never touches the network; it returns the last value loaded even if
+    it has since gone stale, since stale parameters beat hardcoded ones.
+    """
+
+    def __init__(
+        self,
+        rpc: SolanaRpcClient,
+        decoder: ReserveDecoder,
+        ttl_seconds: float = 300,
+        max_slot_lag: int = 150,
+    ):
+        self.rpc = rpc
+        self.decoder = decoder
+        self.ttl_seconds = ttl_seconds
+        self.max_slot_lag = max_slot_lag
+        self.latest_slot = 0
+        self._entries: dict[str, ReserveInfo] = {}
+        self._inflight: dict[str, asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.rpc_calls = 0
+
+    def get(self, key: str) -> Optional[ReserveInfo]:
+        info = self._entries.get(key)
+        if info is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return info
+
+    def get_by_bytes(self, key: bytes) -> Optional[ReserveInfo]:
+        return self.get(str(Pubkey.from_bytes(key)))
+
+    def is_fresh(self, key: str, now: Optional[float] = None) -> bool:
+        info = self._entries.get(key)
+        if info is None:
+            return False
+        now = now if now is not None else time.time()
+        if now - info.fetched_at >= self.ttl_seconds:
+            return False
+        return self.latest_slot - info.slot <= self.max_slot_lag
+
+    def observe_slot(self, slot: int):
+        """Advance the slot clock; entries too far behind it go stale"""
+        self.latest_slot = max(self.latest_slot, slot)
+
+    def invalidate(self, key: Optional[str] = None):
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def load(self, keys: Iterable[str]):
+        """Make sure every key is fresh, fetching stale ones in bulk"""
+        now = time.time()
+        waiting = []
+        to_fetch = []
+        for key in set(keys):
+            if key in self._inflight:
+                waiting.append(self._inflight[key])
+            elif not self.is_fresh(key, now):
+                to_fetch.append(key)
+
+        if to_fetch:
+            loop = asyncio.get_running_loop()
+            for key in to_fetch:
+                self._inflight[key] = loop.create_future()
+            await asyncio.gather(*(
+                self._fetch(to_fetch[i:i + MAX_RESERVES_PER_CALL])
+                for i in range(0, len(to_fetch), MAX_RESERVES_PER_CALL)
+            ))
+        if waiting:
+            await asyncio.gather(*waiting)
+
+    def load_bytes(self, keys: Iterable[bytes]):
+        return self.load(str(Pubkey.from_bytes(k)) for k in keys)
+
+    async def _fetch(self, keys: list[str]):
+        self.rpc_calls += 1
+        try:
+            result = await self.rpc.call(
+                "getMultipleAccounts", [keys, {"encoding": "base64"}]
+            ) or {}
+            slot = result.get("context", {}).get("slot", 0)
+            self.observe_slot(slot)
+            now = time.time()
+            for key, value in zip(keys, result.get("value") or []):
+                if value is None:
+                    self._entries.pop(key, None)
+                    continue
+                info = self.decoder(key, base64.b64decode(value["data"][0]))
+                if info is None:
+                    continue
+                info.slot = slot
+                info.fetched_at = now
+                self._entries[key] = info
+        except Exception as e:
+            # Keep serving the last good values; the next load retries
+            logger.warning("reserve_load_error", reserves=len(keys), error=str(e))
+        finally:
+            for key in keys:
+                future = self._inflight.pop(key, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "reserves": len(self._entries),
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "rpc_calls": self.rpc_calls,
+            "latest_slot": self.latest_slot,
+        }
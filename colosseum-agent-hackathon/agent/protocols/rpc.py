@@ -0,0 +1,150 @@
+"""Shared Solana JSON-RPC client with connection pooling and request batching"""
+import asyncio
+import base64
+import itertools
+from typing import Any, Optional
+
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+# Heavy scans are sent on their own so they never hold up a batch of
+# cheap account reads waiting on the same HTTP response.
+UNBATCHED_METHODS = frozenset({"getProgramAccounts"})
+
+
+class RpcError(RuntimeError):
+    """JSON-RPC error returned by the Solana node"""
+
+
+class SolanaRpcClient:
+    """
+    One pooled HTTP/2 client shared by every protocol adapter.
+
+    Calls issued within `batch_window_ms` of each other are coalesced into
+    a single JSON-RPC batch array. Each request carries its own id and the
+    responses are matched back by id, so callers just await `call()`.
+    """
+
+    def __init__(
+        self,
+        rpc_url: str,
+        timeout: float = 30,
+        max_connections: int = 32,
+        max_keepalive_connections: int = 16,
+        batch_window_ms: float = 2.0,
+        max_batch_size: int = 50,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.rpc_url = rpc_url
+        self.batch_window = batch_window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            ),
+            transport=transport,
+        )
+        self._ids = itertools.count(1)
+        self._pending: list[tuple[dict, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._in_flight: set[asyncio.Task] = set()
+        self.requests_sent = 0
+        self.http_posts = 0
+
+    async def call(self, method: str, params: list) -> Any:
+        """Issue a JSON-RPC call and return its `result`"""
+        loop = asyncio.get_running_loop()
+        request = {
+            "jsonrpc": "2.0",
+            "id": next(self._ids),
+            "method": method,
+            "params": params,
+        }
+        future = loop.create_future()
+
+        if method in UNBATCHED_METHODS:
+            self._dispatch([(request, future)])
+            return await future
+
+        self._pending.append((request, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: list[tuple[dict, asyncio.Future]]):
+        task = asyncio.create_task(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: list[tuple[dict, asyncio.Future]]):
+        payload = batch[0][0] if len(batch) == 1 else [req for req, _ in batch]
+        self.requests_sent += len(batch)
+        self.http_posts += 1
+
+        try:
+            response = await self.client.post(self.rpc_url, json=payload)
+            response.raise_for_status()
+            body = response.json()
+        except Exception as e:
+            logger.error("rpc_post_error", requests=len(batch), error=str(e))
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        replies = body if isinstance(body, list) else [body]
+        by_id = {reply.get("id"): reply for reply in replies if isinstance(reply, dict)}
+
+        for request, future in batch:
+            if future.done():
+                continue
+            reply = by_id.get(request["id"])
+            if reply is None:
+                future.set_exception(RpcError(f"No response for {request['method']}"))
+            elif "error" in reply:
+                future.set_exception(RpcError(f"RPC error: {reply['error']}"))
+            else:
+                future.set_result(reply.get("result"))
+
+    async def get_account_info(self, pubkey: str) -> Optional[bytes]:
+        """Fetch raw account data, or None if the account does not exist"""
+        result = await self.call("getAccountInfo", [pubkey, {"encoding": "base64"}])
+        value = (result or {}).get("value")
+        if value:
+            return base64.b64decode(value["data"][0])
+        return None
+
+    async def get_multiple_accounts(self, pubkeys: list[str]) -> list[Optional[dict]]:
+        """Fetch up to 100 accounts; missing accounts come back as None"""
+        result = await self.call("getMultipleAccounts", [pubkeys, {"encoding": "base64"}])
+        return (result or {}).get("value") or []
+
+    async def get_program_accounts(self, program_id: str, filters: list[dict]) -> list[dict]:
+        """Scan a program's accounts with memcmp/dataSize filters"""
+        result = await self.call(
+            "getProgramAccounts",
+            [program_id, {"encoding": "base64", "filters": filters}],
+        )
+        return result if isinstance(result, list) else []
+
+    async def close(self):
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        await self.client.aclose()
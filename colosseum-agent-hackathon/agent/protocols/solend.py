@@ -1,13 +1,20 @@
 """Solend Protocol Adapter for Solana"""
-import struct
+import base64
 from typing import Optional
-import httpx
 import structlog
+from solders.pubkey import Pubkey
 
 from .base import (
     ProtocolAdapter, PositionData, CollateralPosition,
-    DebtPosition, Protocol, RiskLevel,
+    DebtPosition, Protocol, RiskLevel, weighted_liquidation_threshold,
 )
+from .bulk import solend_columns, solend_deposits
+from .layouts import (
+    SOLEND_VALUES, SOLEND_VALUES_OFFSET, DecodedObligation, decode_solend_obligation, u128,
+)
+from .pricing import PriceService
+from .reserves import ReserveCache, decode_solend_reserve
+from .rpc import SolanaRpcClient
 
 logger = structlog.get_logger()
 
@@ -17,9 +24,30 @@ SOLEND_PROGRAM = "So1endDq2YkqhipRh3WViPa8hFMqRV1JimkXg5H2RGD"
 class SolendAdapter(ProtocolAdapter):
     """Adapter for Solend V2 lending protocol on Solana"""
 
-    def __init__(self, rpc_url: str):
+    program_id = SOLEND_PROGRAM
+    protocol = Protocol.SOLEND
+    owner_offset = 2
+    column_decoder = staticmethod(solend_columns)
+    deposit_decoder = staticmethod(solend_deposits)
+    decoder = staticmethod(decode_solend_obligation)
+
+    def __init__(
+        self,
+        rpc_url: str,
+        rediscovery_interval_seconds: float = 600,
+        rpc: Optional[SolanaRpcClient] = None,
+        reserve_ttl_seconds: float = 300,
+        reserve_max_slot_lag: int = 150,
+        prices: Optional[PriceService] = None,
+    ):
+        super().__init__(rediscovery_interval_seconds)
         self.rpc_url = rpc_url
-        self.client = httpx.AsyncClient(timeout=30)
+        self._owns_rpc = rpc is None
+        self.rpc = rpc or SolanaRpcClient(rpc_url)
+        self.reserves = ReserveCache(
+            self.rpc, decode_solend_reserve, reserve_ttl_seconds, reserve_max_slot_lag
+        )
+        self.prices = prices
 
     async def get_protocol_name(self) -> str:
         return "Solend"
@@ -30,6 +58,12 @@ class SolendAdapter(ProtocolAdapter):
 
         try:
             obligations = await self._get_obligations(wallet_address)
+            self.tracker.record_discovery(
+                wallet_address, [a["pubkey"] for a in obligations]
+            )
+            await self._prefetch_reserves(
+                [base64.b64decode(a["account"]["data"][0]) for a in obligations]
+            )
             for obligation in obligations:
                 position = await self._parse_obligation(wallet_address, obligation)
                 if position and position.total_debt_usd > 0:
@@ -44,152 +78,99 @@ class SolendAdapter(ProtocolAdapter):
         try:
             data = await self._get_account_data(obligation_key)
             if data:
+                await self._prefetch_reserves([data])
                 return self._calculate_health_factor(data)
         except Exception as e:
             logger.error("solend_health_error", obligation=obligation_key, error=str(e))
         return 0.0
 
+    def market_filters(self) -> list[dict]:
+        return [{"dataSize": 916}]  # Solend obligation size
+
     async def _get_obligations(self, wallet_address: str) -> list[dict]:
         """Query Solend obligation accounts"""
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getProgramAccounts",
-            "params": [
-                SOLEND_PROGRAM,
-                {
-                    "encoding": "base64",
-                    "filters": [
-                        {"dataSize": 916},  # Solend obligation size
-                        {
-                            "memcmp": {
-                                "offset": 2,  # Owner offset
-                                "bytes": wallet_address,
-                            }
-                        },
-                    ],
-                },
-            ],
-        }
-
-        response = await self.client.post(self.rpc_url, json=payload)
-        result = response.json()
-        return result.get("result", [])
+        return await self.rpc.get_program_accounts(
+            self.program_id, self.owner_filters(wallet_address)
+        )
 
     async def _get_account_data(self, account_key: str) -> Optional[bytes]:
         """Fetch raw account data"""
-        payload = {
-            "jsonrpc": "2.0",
-            "id": 1,
-            "method": "getAccountInfo",
-            "params": [account_key, {"encoding": "base64"}],
-        }
+        return await self.rpc.get_account_info(account_key)
 
-        response = await self.client.post(self.rpc_url, json=payload)
-        result = response.json()
-
-        if result.get("result", {}).get("value"):
-            import base64
-            return base64.b64decode(result["result"]["value"]["data"][0])
-        return None
+    async def _parse_account(
+        self, wallet_address: str, account: dict
+    ) -> Optional[PositionData]:
+        return await self._parse_obligation(wallet_address, account)
 
     async def _parse_obligation(
         self, wallet_address: str, account: dict
     ) -> Optional[PositionData]:
         """Parse Solend obligation into PositionData"""
         try:
-            import base64
             pubkey = account["pubkey"]
             data = base64.b64decode(account["account"]["data"][0])
-
-            # Solend obligation layout:
-            # [1 version][1 last_update_slot...][32 lending_market][32 owner]
-            # [u128 deposited_value][u128 borrowed_value][u128 allowed_borrow_value]
-            # [u128 unhealthy_borrow_value]
-            # [deposits_count][deposits...][borrows_count][borrows...]
-
-            total_collateral = 0.0
-            total_debt = 0.0
-            collaterals = []
-            debts = []
-
-            # Parse deposited_value (u128 at offset ~66)
-            offset = 66
-            if len(data) >= offset + 16:
-                deposited_lo = struct.unpack_from("<Q", data, offset)[0]
-                deposited_hi = struct.unpack_from("<Q", data, offset + 8)[0]
-                total_collateral = (deposited_hi * (2**64) + deposited_lo) / 1e18
-
-            # Parse borrowed_value (u128)
-            offset += 16
-            if len(data) >= offset + 16:
-                borrowed_lo = struct.unpack_from("<Q", data, offset)[0]
-                borrowed_hi = struct.unpack_from("<Q", data, offset + 8)[0]
-                total_debt = (borrowed_hi * (2**64) + borrowed_lo) / 1e18
-
-            # Parse individual deposits
-            deposits_offset = 130  # Approximate
-            if len(data) > deposits_offset:
-                num_deposits = data[deposits_offset]
-                dep_offset = deposits_offset + 1
-
-                for i in range(min(num_deposits, 10)):
-                    if dep_offset + 56 > len(data):
-                        break
-                    reserve_key = data[dep_offset:dep_offset + 32]
-                    deposited_amount = struct.unpack_from("<Q", dep_offset + 32, data)[0] if dep_offset + 40 <= len(data) else 0
-                    value = struct.unpack_from("<Q", data, dep_offset + 40)[0] / 1e6 if dep_offset + 48 <= len(data) else 0
-
-                    if value > 0:
-                        collaterals.append(CollateralPosition(
-                            mint=reserve_key[:4].hex(),
-                            symbol=f"COL_{i}",
-                            amount=deposited_amount / 1e9,
-                            value_usd=value,
-                            ltv=0.75,
-                            liquidation_threshold=0.85,
-                        ))
-                    dep_offset += 56
-
-            health_factor = (
-                total_collateral * 0.85 / total_debt
-                if total_debt > 0
-                else float("inf")
-            )
-
-            return PositionData(
-                protocol=Protocol.SOLEND,
-                owner=wallet_address,
-                obligation_key=pubkey,
-                health_factor=health_factor,
-                total_collateral_usd=total_collateral,
-                total_debt_usd=total_debt,
-                net_value_usd=total_collateral - total_debt,
-                risk_level=self.classify_risk(health_factor),
-                collaterals=collaterals,
-                debts=debts,
-            )
+            obligation = decode_solend_obligation(data)
+            await self._load_reserves(obligation)
+            return self._build_position(wallet_address, pubkey, obligation)
 
         except Exception as e:
             logger.error("solend_parse_error", error=str(e))
             return None
 
+    def _build_position(
+        self, wallet_address: str, obligation_key: str, obligation: DecodedObligation
+    ) -> PositionData:
+        collaterals = []
+        for entry in obligation.deposits:
+            reserve = self._reserve_params(entry.reserve)
+            amount = reserve.to_tokens(entry.amount)
+            collaterals.append(CollateralPosition(
+                mint=reserve.mint or entry.reserve[:4].hex(),
+                symbol=reserve.symbol or f"COL_{entry.slot}",
+                amount=amount,
+                value_usd=self._entry_value(reserve, amount, entry.value_usd),
+                ltv=reserve.ltv,
+                liquidation_threshold=reserve.liquidation_threshold,
+                reserve=str(Pubkey.from_bytes(entry.reserve)),
+            ))
+
+        # Borrows are not decoded, so totals stay on the program's own
+        # last-refreshed values rather than mixing in repriced deposits
+        total_collateral = obligation.total_collateral_usd
+        total_debt = obligation.total_debt_usd
+        health_factor = (
+            total_collateral * weighted_liquidation_threshold(collaterals) / total_debt
+            if total_debt > 0
+            else float("inf")
+        )
+
+        return PositionData(
+            protocol=Protocol.SOLEND,
+            owner=wallet_address,
+            obligation_key=obligation_key,
+            health_factor=health_factor,
+            total_collateral_usd=total_collateral,
+            total_debt_usd=total_debt,
+            net_value_usd=total_collateral - total_debt,
+            risk_level=self.classify_risk(health_factor),
+            collaterals=collaterals,
+            debts=[],
+        )
+
     def _calculate_health_factor(self, data: bytes) -> float:
         """Calculate health factor from raw obligation data"""
         try:
-            offset = 66
-            deposited_lo = struct.unpack_from("<Q", data, offset)[0]
-            total_collateral = deposited_lo / 1e18
-
-            offset += 16
-            borrowed_lo = struct.unpack_from("<Q", data, offset)[0]
-            total_debt = borrowed_lo / 1e18
+            d_lo, d_hi, b_lo, b_hi = SOLEND_VALUES.unpack_from(data, SOLEND_VALUES_OFFSET)
+            total_collateral = u128(d_lo, d_hi) / 1e18
+            total_debt = u128(b_lo, b_hi) / 1e18
 
             if total_debt == 0:
                 return float("inf")
-            return (total_collateral * 0.85) / total_debt
+            threshold = self._weighted_threshold(decode_solend_obligation(data))
+            return (total_collateral * threshold) / total_debt
         except Exception:
             return 0.0
 
     async def close(self):
-        await self.client.aclose()
+        if self._owns_rpc:
+            await self.rpc.close()
@@ -0,0 +1,238 @@
+"""Quote Cache — Keep Jupiter quotes warm for swaps we are likely to make"""
+import asyncio
+import math
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+import httpx
+import structlog
+
+from protocols.pricing import PriceService
+
+logger = structlog.get_logger()
+
+JUPITER_QUOTE_API = "https://quote-api.jup.ag/v6/quote"
+
+QuoteKey = tuple[str, str, int]  # (input_mint, output_mint, bucketed amount)
+
+
+def size_bucket(amount: int, step: float) -> int:
+    """Round `amount` up onto a geometric grid of ratio 1 + `step`"""
+    if amount <= 1:
+        return max(amount, 0)
+    k = math.ceil(math.log(amount) / math.log1p(step) - 1e-9)
+    bucket = math.ceil((1 + step) ** k)
+    return bucket if bucket >= amount else math.ceil((1 + step) ** (k + 1))
+
+
+@dataclass
+class CachedQuote:
+    quote: dict
+    fetched_at: float
+    context_slot: int
+    # Input/output USD price ratio when fetched, to measure drift against
+    price_ratio: Optional[float]
+
+
+class QuoteCache:
+    """
+    Jupiter quotes keyed by (input mint, output mint, size bucket).
+
+    Amounts are rounded up onto a geometric grid, but a bucket is only
+    used while it exceeds the requested amount by no more than
+    `slippage_bps`; otherwise the exact amount is quoted and not cached,
+    so a swap never runs materially larger than asked. A cached quote is
+    served while it is younger than `max_age_seconds`, no more than
+    `max_slot_lag` slots behind the newest quote seen, and the pair's USD
+    price ratio has not moved more than `slippage_bps` since it was
+    fetched.
+
+    `track()` marks pairs to keep warm; a background task refreshes them
+    every `refresh_interval` seconds until they have not been tracked for
+    `track_ttl` seconds.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[PriceService] = None,
+        api_url: str = JUPITER_QUOTE_API,
+        slippage_bps: int = 50,
+        size_step: float = 0.005,
+        max_age_seconds: float = 10,
+        max_slot_lag: int = 25,
+        refresh_interval: float = 4,
+        track_ttl: float = 120,
+        timeout: float = 10,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.prices = prices
+        self.api_url = api_url
+        self.slippage_bps = slippage_bps
+        self.size_step = size_step
+        self.max_age_seconds = max_age_seconds
+        self.max_slot_lag = max_slot_lag
+        self.refresh_interval = refresh_interval
+        self.track_ttl = track_ttl
+        self.client = httpx.AsyncClient(timeout=timeout, transport=transport)
+        self.latest_slot = 0
+        self._entries: dict[QuoteKey, CachedQuote] = {}
+        self._inflight: dict[QuoteKey, asyncio.Task] = {}
+        self._tracked: dict[QuoteKey, float] = {}  # key -> last tracked at
+        self._refresher: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+        self.prefetches = 0
+        self.fetch_errors = 0
+        self.rejected: dict[str, int] = {"age": 0, "slot": 0, "drift": 0, "size": 0}
+
+    def key(self, input_mint: str, output_mint: str, amount: int) -> QuoteKey:
+        return input_mint, output_mint, size_bucket(amount, self.size_step)
+
+    def _within_tolerance(self, amount: int, bucket: int) -> bool:
+        """Whether swapping `bucket` instead of `amount` stays within slippage"""
+        return (bucket - amount) * 10_000 <= amount * self.slippage_bps
+
+    def _price_ratio(self, input_mint: str, output_mint: str) -> Optional[float]:
+        if self.prices is None:
+            return None
+        quote_in, quote_out = self.prices.peek(input_mint), self.prices.peek(output_mint)
+        if quote_in is None or quote_out is None or quote_out.price <= 0:
+            return None
+        return quote_in.price / quote_out.price
+
+    def _rejection(self, key: QuoteKey, entry: CachedQuote, now: float) -> Optional[str]:
+        """Why a cached quote may no longer be served, or None if it still may"""
+        if now - entry.fetched_at >= self.max_age_seconds:
+            return "age"
+        if self.latest_slot - entry.context_slot > self.max_slot_lag:
+            return "slot"
+        ratio = self._price_ratio(key[0], key[1])
+        if ratio is not None and entry.price_ratio:
+            if abs(ratio / entry.price_ratio - 1) * 10_000 > self.slippage_bps:
+                return "drift"
+        return None
+
+    async def get_quote(
+        self, input_mint: str, output_mint: str, amount: int
+    ) -> tuple[Optional[dict], int]:
+        """
+        A quote for `amount`, rounded up to its size bucket when that is
+        within slippage tolerance and quoted exactly otherwise.
+
+        Returns (quote, quoted amount); the quote is None if Jupiter
+        could not be reached.
+        """
+        key = self.key(input_mint, output_mint, amount)
+        if not self._within_tolerance(amount, key[2]):
+            self.rejected["size"] += 1
+            self.misses += 1
+            entry = await self._refresh((input_mint, output_mint, amount), store=False)
+            return (entry.quote if entry else None), amount
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            reason = self._rejection(key, entry, time.time())
+            if reason is None:
+                self.hits += 1
+                return entry.quote, key[2]
+            self.rejected[reason] += 1
+        self.misses += 1
+        entry = await self._refresh(key)
+        return (entry.quote if entry else None), key[2]
+
+    def track(self, pairs: Iterable[tuple[str, str, int]]):
+        """Keep quotes warm for these (input_mint, output_mint, amount) swaps"""
+        now = time.time()
+        for input_mint, output_mint, amount in pairs:
+            key = self.key(input_mint, output_mint, amount)
+            # A bucket too far above the amount would never be served
+            if amount > 0 and self._within_tolerance(amount, key[2]):
+                self._tracked[key] = now
+        if self._tracked and self._refresher is None:
+            self._refresher = asyncio.create_task(self._run_refresher())
+
+    async def _run_refresher(self):
+        try:
+            while self._tracked:
+                await self.refresh_tracked()
+                await asyncio.sleep(self.refresh_interval)
+        finally:
+            self._refresher = None
+
+    async def refresh_tracked(self):
+        """Fetch tracked quotes that are missing or due, dropping pairs no longer tracked"""
+        now = time.time()
+        for key in [k for k, at in self._tracked.items() if now - at > self.track_ttl]:
+            del self._tracked[key]
+            self._entries.pop(key, None)
+        due = [
+            key for key in self._tracked
+            if key not in self._entries
+            or now - self._entries[key].fetched_at >= self.max_age_seconds - self.refresh_interval
+            or self._rejection(key, self._entries[key], now) is not None
+        ]
+        if due:
+            self.prefetches += len(due)
+            await asyncio.gather(*(self._refresh(key) for key in due))
+
+    async def _refresh(self, key: QuoteKey, store: bool = True) -> Optional[CachedQuote]:
+        """Fetch one key; concurrent callers for the same key share the request"""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch(key, store))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        return await asyncio.shield(task)
+
+    async def _fetch(self, key: QuoteKey, store: bool = True) -> Optional[CachedQuote]:
+        input_mint, output_mint, amount = key
+        try:
+            params = {
+                "inputMint": input_mint,
+                "outputMint": output_mint,
+                "amount": str(amount),
+                "slippageBps": str(self.slippage_bps),
+            }
+            response = await self.client.get(self.api_url, params=params)
+            if response.status_code != 200:
+                self.fetch_errors += 1
+                logger.warning("jupiter_quote_failed", status=response.status_code)
+                return None
+            quote = response.json()
+        except Exception as e:
+            self.fetch_errors += 1
+            logger.error("jupiter_quote_error", error=str(e))
+            return None
+
+        slot = int(quote.get("contextSlot") or 0)
+        self.latest_slot = max(self.latest_slot, slot)
+        entry = CachedQuote(
+            quote=quote,
+            fetched_at=time.time(),
+            context_slot=slot,
+            price_ratio=self._price_ratio(input_mint, output_mint),
+        )
+        # Exact off-grid quotes serve the one swap that asked for them
+        if store:
+            self._entries[key] = entry
+        return entry
+
+    def get_stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "tracked": len(self._tracked),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "prefetches": self.prefetches,
+            "fetch_errors": self.fetch_errors,
+            "rejected": dict(self.rejected),
+            "latest_slot": self.latest_slot,
+        }
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+        await self.client.aclose()
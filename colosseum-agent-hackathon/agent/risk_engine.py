@@ -0,0 +1,127 @@
+"""Risk Engine — Vectorized health factor scoring and risk classification"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from analyzer import RebalanceStrategy
+from protocols.base import (
+    DEFAULT_LIQUIDATION_THRESHOLD,
+    PositionData,
+    RiskLevel,
+    weighted_liquidation_threshold,
+)
+
+# Risk codes are ordered by severity so `codes < HEALTHY` selects at-risk rows
+EMERGENCY, CRITICAL, WARNING, HEALTHY = range(4)
+RISK_LEVELS = (RiskLevel.EMERGENCY, RiskLevel.CRITICAL, RiskLevel.WARNING, RiskLevel.HEALTHY)
+STRATEGIES = (
+    RebalanceStrategy.EMERGENCY_UNWIND,
+    RebalanceStrategy.DEBT_REPAYMENT,
+    RebalanceStrategy.COLLATERAL_TOP_UP,
+    RebalanceStrategy.NO_ACTION,
+)
+URGENCY = np.array([1.0, 0.8, 0.4, 0.0])
+
+
+@dataclass
+class RiskScores:
+    """Column-oriented scores for a batch of positions"""
+    health_factor: np.ndarray
+    codes: np.ndarray  # int8 indices into RISK_LEVELS
+    rebalance_usd: np.ndarray
+    urgency: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def at_risk(self) -> np.ndarray:
+        """Row indices below the warning threshold, most severe first"""
+        rows = np.flatnonzero(self.codes < HEALTHY)
+        return rows[np.argsort(self.health_factor[rows], kind="stable")]
+
+    def risk_level(self, row: int) -> RiskLevel:
+        return RISK_LEVELS[self.codes[row]]
+
+    def strategy(self, row: int) -> RebalanceStrategy:
+        return STRATEGIES[self.codes[row]]
+
+    def counts(self) -> dict[str, int]:
+        totals = np.bincount(self.codes, minlength=len(RISK_LEVELS))
+        return {level.value: int(n) for level, n in zip(RISK_LEVELS, totals)}
+
+
+class RiskEngine:
+    """
+    Scores whole batches of positions in one call.
+
+    Classification uses the same `<` boundaries as
+    `ProtocolAdapter.classify_risk`, and rebalance amounts mirror the
+    rule-based fallback in `ClaudeAnalyzer`: full debt on emergency,
+    repay down to `repay_target` on critical, top up collateral to
+    `top_up_target` on warning.
+    """
+
+    def __init__(
+        self,
+        warn: float = 1.5,
+        critical: float = 1.2,
+        emergency: float = 1.05,
+        repay_target: float = 1.5,
+        top_up_target: float = 2.0,
+    ):
+        if not emergency <= critical <= warn:
+            raise ValueError("Thresholds must satisfy emergency <= critical <= warn")
+        self.boundaries = np.array([emergency, critical, warn])
+        self.repay_target = repay_target
+        self.top_up_target = top_up_target
+
+    def score(
+        self,
+        collateral_usd: np.ndarray,
+        debt_usd: np.ndarray,
+        liquidation_threshold: np.ndarray | float = DEFAULT_LIQUIDATION_THRESHOLD,
+    ) -> RiskScores:
+        collateral = np.asarray(collateral_usd, dtype=np.float64)
+        debt = np.asarray(debt_usd, dtype=np.float64)
+        threshold = np.broadcast_to(
+            np.asarray(liquidation_threshold, dtype=np.float64), collateral.shape
+        )
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weighted = collateral * threshold
+            health_factor = np.where(debt > 0, weighted / debt, np.inf)
+            top_up = np.maximum(0.0, debt * self.top_up_target / threshold - collateral)
+        repay = np.maximum(0.0, debt - weighted / self.repay_target)
+
+        # hf < emergency -> 0, hf < critical -> 1, hf < warn -> 2, else 3
+        codes = np.searchsorted(self.boundaries, health_factor, side="right").astype(np.int8)
+        rebalance = np.choose(codes, (debt, repay, top_up, np.zeros_like(debt)))
+
+        return RiskScores(
+            health_factor=health_factor,
+            codes=codes,
+            rebalance_usd=rebalance,
+            urgency=URGENCY[codes],
+        )
+
+    def score_positions(self, positions: list[PositionData]) -> RiskScores:
+        n = len(positions)
+        collateral = np.fromiter((p.total_collateral_usd for p in positions), np.float64, n)
+        debt = np.fromiter((p.total_debt_usd for p in positions), np.float64, n)
+        threshold = np.fromiter(
+            (weighted_liquidation_threshold(p.collaterals) for p in positions), np.float64, n
+        )
+        return self.score(collateral, debt, threshold)
+
+    def classify(self, health_factor: float) -> RiskLevel:
+        """Scalar classification for single streamed updates"""
+        return RISK_LEVELS[int(np.searchsorted(self.boundaries, health_factor, side="right"))]
+
+
+def apply_risk_levels(
+    positions: list[PositionData], scores: RiskScores, rows: Optional[np.ndarray] = None
+):
+    """Write engine risk levels back onto the given rows (all rows by default)"""
+    for row in (range(len(positions)) if rows is None else rows):
+        positions[row].risk_level = RISK_LEVELS[scores.codes[row]]
@@ -0,0 +1,147 @@
+"""Re-check Scheduler — Urgency-ordered polling of known positions"""
+import heapq
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from protocols.base import PositionData, Protocol
+from protocols.pricing import PriceService
+
+
+@dataclass(frozen=True)
+class ScheduledCheck:
+    """One obligation waiting for its next re-check"""
+    protocol: Protocol
+    owner: str
+    obligation_key: str
+    due_at: float
+    interval: float
+
+
+class RecheckScheduler:
+    """
+    Heap of positions keyed on when each is next due for a re-check.
+
+    The interval shrinks as a position nears liquidation: it is derived
+    from `distance_to_liquidation_pct`, less a buffer of `volatility_weight`
+    times the recent price range of its assets, and grows quadratically
+    from `min_interval` up to `max_interval` at `safe_distance_pct`.
+
+    Rescheduling pushes a new heap entry; the superseded one is skipped
+    when it reaches the top.
+    """
+
+    def __init__(
+        self,
+        min_interval: float = 2,
+        max_interval: float = 300,
+        safe_distance_pct: float = 60,
+        volatility_weight: float = 2.0,
+        volatility_window_seconds: float = 300,
+        prices: Optional[PriceService] = None,
+    ):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError("Intervals must satisfy 0 < min_interval <= max_interval")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.safe_distance_pct = safe_distance_pct
+        self.volatility_weight = volatility_weight
+        self.volatility_window_seconds = volatility_window_seconds
+        self.prices = prices
+        self._heap: list[tuple[float, int, str]] = []
+        self._checks: dict[str, ScheduledCheck] = {}
+        self._seq = 0
+        self.rechecks = 0
+
+    def __len__(self) -> int:
+        return len(self._checks)
+
+    def __contains__(self, obligation_key: str) -> bool:
+        return obligation_key in self._checks
+
+    def volatility_pct(self, position: PositionData) -> float:
+        """Largest recent price range across the position's assets"""
+        if self.prices is None:
+            return 0.0
+        mints = {c.mint for c in position.collaterals} | {d.mint for d in position.debts}
+        return max(
+            (self.prices.volatility_pct(m, self.volatility_window_seconds) for m in mints),
+            default=0.0,
+        )
+
+    def interval_for(self, position: PositionData) -> float:
+        """Seconds until this position should be checked again"""
+        buffer = self.volatility_weight * self.volatility_pct(position)
+        distance = max(0.0, position.distance_to_liquidation_pct - buffer)
+        fraction = min(1.0, distance / self.safe_distance_pct)
+        return self.min_interval + (self.max_interval - self.min_interval) * fraction ** 2
+
+    def schedule(self, position: PositionData, now: Optional[float] = None) -> ScheduledCheck:
+        now = now if now is not None else time.time()
+        interval = self.interval_for(position)
+        return self._push(ScheduledCheck(
+            protocol=position.protocol,
+            owner=position.owner,
+            obligation_key=position.obligation_key,
+            due_at=now + interval,
+            interval=interval,
+        ))
+
+    def reschedule(self, check: ScheduledCheck, now: Optional[float] = None) -> ScheduledCheck:
+        """Re-queue a check that returned no position, keeping its interval"""
+        now = now if now is not None else time.time()
+        return self._push(ScheduledCheck(
+            check.protocol, check.owner, check.obligation_key, now + check.interval, check.interval
+        ))
+
+    def replace(self, positions: list[PositionData], now: Optional[float] = None):
+        """Schedule every position from a full sweep and drop the rest"""
+        keep = {p.obligation_key for p in positions}
+        for key in [k for k in self._checks if k not in keep]:
+            self.remove(key)
+        for position in positions:
+            self.schedule(position, now)
+
+    def remove(self, obligation_key: str):
+        self._checks.pop(obligation_key, None)
+
+    def pop_due(self, now: Optional[float] = None) -> list[ScheduledCheck]:
+        """Remove and return every check due by `now`, most overdue first"""
+        now = now if now is not None else time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, _, key = heapq.heappop(self._heap)
+            check = self._checks.get(key)
+            if check is None or check.due_at != due_at:
+                continue  # removed or superseded
+            del self._checks[key]
+            due.append(check)
+        self.rechecks += len(due)
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """When the earliest live check comes due, if any"""
+        while self._heap:
+            due_at, _, key = self._heap[0]
+            check = self._checks.get(key)
+            if check is not None and check.due_at == due_at:
+                return due_at
+            heapq.heappop(self._heap)
+        return None
+
+    def _push(self, check: ScheduledCheck) -> ScheduledCheck:
+        self._checks[check.obligation_key] = check
+        self._seq += 1
+        heapq.heappush(self._heap, (check.due_at, self._seq, check.obligation_key))
+        return check
+
+    def get_stats(self) -> dict:
+        intervals = [c.interval for c in self._checks.values()]
+        next_due = self.next_due()
+        return {
+            "tracked": len(self._checks),
+            "rechecks": self.rechecks,
+            "min_interval_s": round(min(intervals), 1) if intervals else 0.0,
+            "max_interval_s": round(max(intervals), 1) if intervals else 0.0,
+            "next_due_in_s": round(max(0.0, next_due - time.time()), 1) if next_due else None,
+        }
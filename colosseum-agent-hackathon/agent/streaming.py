@@ -0,0 +1,326 @@
+"""Account Streamer — Event-driven monitoring over Solana WebSocket subscriptions"""
+import asyncio
+import itertools
+import json
+from typing import Awaitable, Callable, Optional
+
+import structlog
+import websockets
+
+from protocols import PositionData, ProtocolAdapter, SolanaRpcClient
+from protocols.base import MAX_MULTIPLE_ACCOUNTS
+
+logger = structlog.get_logger()
+
+PositionCallback = Callable[[PositionData], Awaitable[None]]
+
+
+class AccountStreamer:
+    """
+    Subscribes to every tracked obligation via `accountSubscribe`.
+
+    Each notification is re-parsed by the owning adapter and handed to
+    `on_update`, so a position is re-scored only when its account changes.
+    On reconnect all subscriptions are re-established, and if the node has
+    moved more than `backfill_slot_gap` slots past the last update seen, the
+    tracked accounts are re-read with getMultipleAccounts to cover the gap.
+
+    Watched wallets also get a `programSubscribe` per adapter using the
+    adapter's owner filters, so newly created obligations are added to the
+    tracked set as soon as they appear instead of at the next scan.
+    """
+
+    def __init__(
+        self,
+        ws_url: str,
+        adapters: list[ProtocolAdapter],
+        rpc: SolanaRpcClient,
+        on_update: PositionCallback,
+        commitment: str = "confirmed",
+        backfill_slot_gap: int = 2,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+    ):
+        self.ws_url = ws_url
+        self.adapters = adapters
+        self.rpc = rpc
+        self.on_update = on_update
+        self.commitment = commitment
+        self.backfill_slot_gap = backfill_slot_gap
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+
+        self.running = False
+        self.last_slot = 0
+        self.notifications = 0
+        self.discovered = 0
+        self.reconnects = 0
+
+        # obligation_key -> (adapter index, wallet)
+        self._tracked: dict[str, tuple[int, str]] = {}
+        self._subscriptions: dict[int, str] = {}
+        self._key_subscription: dict[str, int] = {}
+        # (adapter index, wallet) discovery subscriptions
+        self._watched: set[tuple[int, str]] = set()
+        self._program_subscriptions: dict[int, tuple[int, str]] = {}
+        self._watch_subscription: dict[tuple[int, str], int] = {}
+        # request id -> ("account", key) | ("program", (adapter index, wallet))
+        self._pending: dict[int, tuple[str, object]] = {}
+        # obligation_key -> (slot, data hash) of the last write applied
+        self._key_writes: dict[str, tuple[int, Optional[int]]] = {}
+        self._ids = itertools.count(1)
+        self._ws = None
+
+    @property
+    def subscribed(self) -> int:
+        return len(self._subscriptions)
+
+    async def sync_from_trackers(self):
+        """Align subscriptions with the obligations the adapters currently track"""
+        wanted: dict[str, tuple[int, str]] = {}
+        for idx, adapter in enumerate(self.adapters):
+            for wallet, key in adapter.tracker.all_pairs():
+                wanted[key] = (idx, wallet)
+
+        for key in [k for k in self._tracked if k not in wanted]:
+            await self.untrack(key)
+        for key, (idx, wallet) in wanted.items():
+            if key not in self._tracked:
+                await self.track(idx, wallet, key)
+
+    async def watch_wallets(self, wallets: list[str]):
+        """Keep one programSubscribe per (adapter, wallet) for discovery"""
+        wanted = {(idx, w) for idx in range(len(self.adapters)) for w in wallets}
+
+        for watch in [w for w in self._watched if w not in wanted]:
+            self._watched.discard(watch)
+            sub_id = self._watch_subscription.pop(watch, None)
+            if sub_id is not None:
+                self._program_subscriptions.pop(sub_id, None)
+                if self._ws is not None:
+                    await self._send("programUnsubscribe", [sub_id])
+        for watch in wanted - self._watched:
+            self._watched.add(watch)
+            if self._ws is not None:
+                await self._subscribe_program(*watch)
+
+    async def track(self, adapter_idx: int, wallet: str, key: str):
+        self._tracked[key] = (adapter_idx, wallet)
+        if self._ws is not None:
+            await self._subscribe(key)
+
+    async def untrack(self, key: str):
+        self._tracked.pop(key, None)
+        self._key_writes.pop(key, None)
+        sub_id = self._key_subscription.pop(key, None)
+        if sub_id is None:
+            return
+        self._subscriptions.pop(sub_id, None)
+        if self._ws is not None:
+            await self._send("accountUnsubscribe", [sub_id])
+
+    async def run(self):
+        """Connect, subscribe and dispatch notifications until stopped"""
+        self.running = True
+        delay = self.reconnect_delay
+
+        while self.running:
+            try:
+                async with websockets.connect(self.ws_url, ping_interval=20) as ws:
+                    self._ws = ws
+                    await self._on_connected()
+                    delay = self.reconnect_delay
+                    async for message in ws:
+                        await self._handle_message(message)
+            except asyncio.CancelledError:
+                break
+            except Exception as e:
+                logger.warning("stream_disconnected", error=str(e), retry_in=delay)
+            finally:
+                self._ws = None
+                self._subscriptions.clear()
+                self._key_subscription.clear()
+                self._program_subscriptions.clear()
+                self._watch_subscription.clear()
+                self._pending.clear()
+
+            if self.running:
+                self.reconnects += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def stop(self):
+        self.running = False
+        if self._ws is not None:
+            await self._ws.close()
+
+    async def _on_connected(self):
+        for key in list(self._tracked):
+            await self._subscribe(key)
+        for watch in list(self._watched):
+            await self._subscribe_program(*watch)
+        logger.info(
+            "stream_connected",
+            subscriptions=len(self._tracked),
+            discovery_subscriptions=len(self._watched),
+        )
+
+        if self.last_slot and self._tracked:
+            current_slot = await self.rpc.call("getSlot", [{"commitment": self.commitment}])
+            if current_slot - self.last_slot > self.backfill_slot_gap:
+                await self._backfill(current_slot)
+
+    async def _backfill(self, slot: int):
+        """Re-read tracked accounts to cover updates missed while disconnected"""
+        by_adapter: dict[int, list[tuple[str, str]]] = {}
+        for key, (idx, wallet) in self._tracked.items():
+            by_adapter.setdefault(idx, []).append((wallet, key))
+
+        logger.info(
+            "stream_backfill",
+            from_slot=self.last_slot,
+            to_slot=slot,
+            accounts=len(self._tracked),
+        )
+
+        for idx, pairs in by_adapter.items():
+            for i in range(0, len(pairs), MAX_MULTIPLE_ACCOUNTS):
+                chunk = pairs[i:i + MAX_MULTIPLE_ACCOUNTS]
+                positions = await self.adapters[idx].refresh_obligations(chunk)
+                for position in positions:
+                    self._key_writes[position.obligation_key] = (slot, None)
+                    await self.on_update(position)
+        self.last_slot = max(self.last_slot, slot)
+
+    async def _subscribe(self, key: str):
+        request_id = await self._send(
+            "accountSubscribe",
+            [key, {"encoding": "base64", "commitment": self.commitment}],
+        )
+        self._pending[request_id] = ("account", key)
+
+    async def _subscribe_program(self, adapter_idx: int, wallet: str):
+        adapter = self.adapters[adapter_idx]
+        request_id = await self._send(
+            "programSubscribe",
+            [
+                adapter.program_id,
+                {
+                    "encoding": "base64",
+                    "commitment": self.commitment,
+                    "filters": adapter.owner_filters(wallet),
+                },
+            ],
+        )
+        self._pending[request_id] = ("program", (adapter_idx, wallet))
+
+    async def _send(self, method: str, params: list) -> int:
+        request_id = next(self._ids)
+        await self._ws.send(json.dumps({
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "method": method,
+            "params": params,
+        }))
+        return request_id
+
+    async def _handle_message(self, message: str):
+        data = json.loads(message)
+
+        if "id" in data:
+            pending = self._pending.pop(data["id"], None)
+            if pending is None:
+                return
+            kind, target = pending
+            if "error" in data:
+                logger.error("stream_subscribe_error", kind=kind, error=data["error"])
+                return
+            sub_id = data["result"]
+            if kind == "program":
+                if target in self._watched:
+                    self._program_subscriptions[sub_id] = target
+                    self._watch_subscription[target] = sub_id
+                else:
+                    await self._send("programUnsubscribe", [sub_id])
+            elif target in self._tracked:
+                self._subscriptions[sub_id] = target
+                self._key_subscription[target] = sub_id
+            else:
+                await self._send("accountUnsubscribe", [sub_id])
+            return
+
+        method = data.get("method")
+        if method == "accountNotification":
+            await self._handle_account_notification(data["params"])
+        elif method == "programNotification":
+            await self._handle_program_notification(data["params"])
+
+    async def _handle_program_notification(self, params: dict):
+        watch = self._program_subscriptions.get(params.get("subscription"))
+        if watch is None:
+            return
+
+        result = params["result"]
+        slot = result.get("context", {}).get("slot", 0)
+        value = result.get("value") or {}
+        key = value.get("pubkey")
+        account = value.get("account")
+        if not key or account is None:
+            return
+
+        idx, wallet = watch
+        if self.adapters[idx].tracker.add(wallet, key):
+            self.discovered += 1
+            logger.info("obligation_discovered", wallet=wallet[:8] + "...", key=key[:16])
+        if key not in self._tracked:
+            await self.track(idx, wallet, key)
+
+        await self._apply_update(key, slot, account)
+
+    async def _handle_account_notification(self, params: dict):
+        key = self._subscriptions.get(params.get("subscription"))
+        if key is None or key not in self._tracked:
+            return
+
+        result = params["result"]
+        slot = result.get("context", {}).get("slot", 0)
+        await self._apply_update(key, slot, result.get("value"))
+
+    async def _apply_update(self, key: str, slot: int, value: Optional[dict]):
+        # Writes from older slots are stale. Program and account
+        # subscriptions both report each write, so the same data again in
+        # the same slot is a duplicate; a different write in that slot is not
+        write = (slot, hash(value["data"][0]) if value else None)
+        last = self._key_writes.get(key)
+        if last is not None and (slot < last[0] or write == last):
+            return
+        self._key_writes[key] = write
+        self.last_slot = max(self.last_slot, slot)
+        self.notifications += 1
+
+        idx, wallet = self._tracked[key]
+        reserves = self.adapters[idx].reserves
+        if reserves is not None:
+            reserves.observe_slot(slot)
+        if value is None:
+            self.adapters[idx].tracker.remove(key)
+            await self.untrack(key)
+            return
+
+        position = await self.adapters[idx]._parse_account(
+            wallet, {"pubkey": key, "account": value}
+        )
+        if position and position.total_debt_usd > 0:
+            await self.on_update(position)
+
+    def get_stats(self) -> dict:
+        return {
+            "tracked": len(self._tracked),
+            "subscribed": self.subscribed,
+            "watched": len(self._watched),
+            "discovered": self.discovered,
+            "notifications": self.notifications,
+            "reconnects": self.reconnects,
+            "last_slot": self.last_slot,
+        }
+
@@ -71,6 +71,145 @@ class TestActivityLogger:
         assert summary["actions"]["analyze"] == 1
 
 
+class TestGroupCommit:
+    """Test the buffered background writer"""
+
+    def setup_method(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    @pytest.mark.asyncio
+    async def test_entries_written_in_groups(self):
+        log = ActivityLogger(log_dir=self.tmpdir, agent_name="test", batch_size=10, flush_interval=5)
+        for i in range(15):
+            await log.log_activity("scan", {"i": i})
+            if i == 9:
+                await asyncio.sleep(0.05)
+
+        # The full group went out without waiting for the interval
+        assert log.get_stats()["entries_written"] == 10
+        assert log.get_stats()["pending"] == 5
+
+        await log.close()
+        assert log.groups_written == 2
+        assert log.get_stats()["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_interval_commits_partial_group(self):
+        log = ActivityLogger(log_dir=self.tmpdir, agent_name="test", flush_interval=0.01)
+        await log.log_activity("scan", {})
+        await asyncio.sleep(0.1)
+
+        assert log.entries_written == 1
+        await log.close()
+
+    @pytest.mark.asyncio
+    async def test_chain_continues_after_reopen(self):
+        log = ActivityLogger(log_dir=self.tmpdir, agent_name="test", durability="none")
+        for i in range(5):
+            last = await log.log_activity("scan", {"i": i})
+        await log.close()
+
+        reopened = ActivityLogger(log_dir=self.tmpdir, agent_name="test")
+        entry = await reopened.log_activity("scan", {"i": 5})
+
+        assert entry.sequence == 5
+        assert entry.previous_hash == last.entry_hash
+        assert await reopened.verify_integrity() == (True, 6)
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_fsync_policy_syncs_each_group(self, monkeypatch):
+        synced = []
+        monkeypatch.setattr(os, "fsync", synced.append)
+        log = ActivityLogger(log_dir=self.tmpdir, agent_name="test", durability="fsync")
+        await log.log_activity("a", {})
+        await log.flush()
+        await log.log_activity("b", {})
+        await log.close()
+
+        assert len(synced) == 2
+
+    def test_unknown_durability_rejected(self):
+        with pytest.raises(ValueError):
+            ActivityLogger(log_dir=self.tmpdir, durability="sometimes")
+
+
+class TestCheckpoints:
+    """Test checkpointed incremental verification"""
+
+    def setup_method(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    async def filled(self, n: int, **kwargs) -> ActivityLogger:
+        log = ActivityLogger(log_dir=self.tmpdir, agent_name="test", checkpoint_interval=4, **kwargs)
+        for i in range(n):
+            await log.log_activity("scan", {"i": i})
+        return log
+
+    @pytest.mark.asyncio
+    async def test_verification_resumes_after_last_checkpoint(self, monkeypatch):
+        log = await self.filled(10)
+        assert await log.verify_integrity() == (True, 10)
+
+        hashed = []
+        original = ActivityEntry.compute_hash
+        monkeypatch.setattr(ActivityEntry, "compute_hash", lambda e: hashed.append(e) or original(e))
+        await log.log_activity("scan", {"i": 10})
+        hashed.clear()
+
+        assert await log.verify_integrity() == (True, 11)
+        assert len(hashed) == 1
+        await log.close()
+
+    @pytest.mark.asyncio
+    async def test_checkpoints_persist_across_restart(self):
+        log = await self.filled(10)
+        await log.verify_integrity()
+        await log.close()
+
+        reopened = ActivityLogger(log_dir=self.tmpdir, agent_name="test", checkpoint_interval=4)
+        assert reopened.sequence == 10
+        # Persisted every 4 entries, so the last one covers sequence 7
+        assert reopened.get_stats()["verified_entries"] == 8
+        assert await reopened.verify_integrity() == (True, 10)
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_truncation_below_checkpoint_detected(self):
+        log = await self.filled(10)
+        await log.verify_integrity()
+        await log.close()
+
+        lines = log.log_file.read_text().splitlines(keepends=True)
+        log.log_file.write_text("".join(lines[:3]))
+
+        reopened = ActivityLogger(log_dir=self.tmpdir, agent_name="test")
+        assert reopened.get_stats()["verified_entries"] == 0
+        assert await reopened.verify_integrity() == (True, 3)
+
+    @pytest.mark.asyncio
+    async def test_full_verification_catches_tampering_behind_checkpoint(self):
+        log = await self.filled(6)
+        await log.verify_integrity()
+        await log.close()
+
+        text = log.log_file.read_text().replace('"i": 1}', '"i": 9}')
+        log.log_file.write_text(text)
+
+        assert (await log.verify_integrity())[0]
+        assert await log.verify_integrity(full=True) == (False, 1)
+
+    @pytest.mark.asyncio
+    async def test_torn_final_line_loads_last_complete_entry(self):
+        log = await self.filled(3)
+        await log.close()
+        with open(log.log_file, "a") as f:
+            f.write('{"timestamp": 1.0, "act')
+
+        reopened = ActivityLogger(log_dir=self.tmpdir, agent_name="test")
+        assert reopened.sequence == 3
+
+
 class TestActivityEntry:
     """Test the ActivityEntry model"""
 
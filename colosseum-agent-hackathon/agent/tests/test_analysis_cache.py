@@ -0,0 +1,141 @@
+"""Tests for the analysis cache"""
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analysis_cache import AnalysisCache, position_fingerprint
+from analyzer import ClaudeAnalyzer, RebalanceStrategy
+from tests.test_analyzer import make_position
+
+
+class FakeStream:
+    """Async context manager mimicking `messages.stream`, yielding text in chunks"""
+
+    def __init__(self, messages: "FakeMessages"):
+        self.messages = messages
+
+    async def __aenter__(self):
+        self.messages.calls += 1
+        self.messages.active += 1
+        self.messages.peak = max(self.messages.peak, self.messages.active)
+        return self
+
+    async def __aexit__(self, *exc):
+        self.messages.active -= 1
+
+    @property
+    async def text_stream(self):
+        text, size = self.messages.text, self.messages.chunk_size
+        await asyncio.sleep(self.messages.delay)
+        for i in range(0, len(text), size):
+            self.messages.streamed += len(text[i:i + size])
+            yield text[i:i + size]
+            await asyncio.sleep(self.messages.chunk_delay)
+
+
+class FakeMessages:
+    """Stands in for anthropic's messages API and counts calls"""
+
+    def __init__(self, text: str, delay: float = 0, chunk_size: int = 16, chunk_delay: float = 0):
+        self.text = text
+        self.delay = delay
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.streamed = 0
+
+    def stream(self, **kwargs):
+        return FakeStream(self)
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.active -= 1
+        return SimpleNamespace(content=[SimpleNamespace(text=self.text)])
+
+
+RESPONSE = json.dumps({
+    "strategy": "debt_repayment",
+    "reasoning": "Repay to restore health",
+    "confidence": 0.85,
+    "suggested_amount_usd": 1200,
+    "urgency_score": 0.7,
+})
+
+
+def analyzer_with(text: str, cache: AnalysisCache) -> tuple[ClaudeAnalyzer, FakeMessages]:
+    analyzer = ClaudeAnalyzer(api_key="test-key", cache=cache)
+    messages = FakeMessages(text)
+    analyzer.client = SimpleNamespace(messages=messages)
+    return analyzer, messages
+
+
+class TestFingerprint:
+    def test_small_drift_keeps_key(self):
+        a = make_position(1.150, collateral=10_000, debt=7_391)
+        b = make_position(1.151, collateral=10_010, debt=7_398)
+        assert position_fingerprint(a) == position_fingerprint(b)
+
+    def test_material_changes_change_key(self):
+        base = position_fingerprint(make_position(1.15))
+        assert position_fingerprint(make_position(1.10)) != base
+        assert position_fingerprint(make_position(1.15, collateral=12_000)) != base
+        assert position_fingerprint(make_position(1.15), market_context="SOL -8%") != base
+
+
+class TestAnalysisCache:
+    def test_ttl_expiry(self):
+        cache = AnalysisCache(ttl_seconds=10)
+        cache.put("k", "result", now=0)
+        assert cache.get("k", now=5) == "result"
+        assert cache.get("k", now=10) is None
+        assert len(cache) == 0
+
+    def test_lru_eviction(self):
+        cache = AnalysisCache(max_entries=2)
+        cache.put("a", 1, now=0)
+        cache.put("b", 2, now=0)
+        cache.get("a", now=0)
+        cache.put("c", 3, now=0)
+
+        assert cache.get("b", now=0) is None
+        assert cache.get("a", now=0) == 1
+        assert cache.get_stats()["evictions"] == 1
+
+
+class TestAnalyzerCaching:
+    @pytest.mark.asyncio
+    async def test_repeat_cycle_served_from_cache(self):
+        analyzer, messages = analyzer_with(RESPONSE, AnalysisCache())
+        first = await analyzer.analyze_position(make_position(1.15))
+        second = await analyzer.analyze_position(make_position(1.151))
+
+        assert messages.calls == 1
+        assert second.strategy == RebalanceStrategy.DEBT_REPAYMENT
+        assert second.reasoning_hash == first.reasoning_hash
+        assert second.timestamp >= first.timestamp
+        assert analyzer.cache.hit_rate == pytest.approx(0.5)
+
+    @pytest.mark.asyncio
+    async def test_unparseable_response_is_not_cached(self):
+        analyzer, messages = analyzer_with("no json here", AnalysisCache())
+        started = asyncio.get_running_loop().time()
+        await analyzer.analyze_position(make_position(1.15))
+        await analyzer.analyze_position(make_position(1.15))
+
+        assert asyncio.get_running_loop().time() - started < 1
+        assert analyzer.deadline_misses == 0
+        assert messages.calls == 2
+        assert len(analyzer.cache) == 0
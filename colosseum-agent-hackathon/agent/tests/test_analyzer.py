@@ -104,6 +104,32 @@ class TestFallbackAnalysis:
         assert result.strategy == RebalanceStrategy.NO_ACTION
 
 
+class TestParseResponse:
+    """Test parsing of Claude's JSON responses"""
+
+    def setup_method(self):
+        self.analyzer = ClaudeAnalyzer(api_key="test-key")
+
+    def test_valid_response(self):
+        position = make_position(health_factor=1.15)
+        result = self.analyzer._parse_response(
+            'Here you go: {"strategy": "debt_repayment", "urgency_score": 0.8, "confidence": 0.9}',
+            position,
+        )
+        assert result.strategy == RebalanceStrategy.DEBT_REPAYMENT
+        assert result.urgency_score == 0.8
+
+    def test_malformed_responses_return_none(self):
+        position = make_position(health_factor=1.15)
+        for text in [
+            "I cannot analyze this position.",
+            '{"strategy": "debt_repayment", "urgency_score": ',
+            '{"strategy": "debt_repayment", "confidence": "high"}',
+            '{"strategy": "debt_repayment", "urgency_score": null}',
+        ]:
+            assert self.analyzer._parse_response(text, position) is None
+
+
 class TestPositionData:
     """Test PositionData model"""
 
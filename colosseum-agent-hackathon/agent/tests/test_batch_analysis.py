@@ -0,0 +1,141 @@
+"""Tests for batched multi-position analysis and request deadlines"""
+import asyncio
+import json
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analysis_cache import AnalysisCache
+from analyzer import ClaudeAnalyzer, RebalanceStrategy
+from protocols.base import RiskLevel
+from tests.test_analysis_cache import FakeMessages
+from tests.test_analyzer import make_position
+
+
+def keyed_position(key: str, health_factor: float):
+    position = make_position(health_factor)
+    position.obligation_key = key
+    return position
+
+
+def batch_response(*keys: str) -> str:
+    return "Here you go:\n" + json.dumps([
+        {
+            "obligation_key": key,
+            "strategy": "collateral_top_up",
+            "reasoning": f"Top up {key}",
+            "confidence": 0.8,
+            "suggested_amount_usd": 500,
+            "urgency_score": 0.4,
+        }
+        for key in keys
+    ])
+
+
+def analyzer_with(text: str, **kwargs) -> tuple[ClaudeAnalyzer, FakeMessages]:
+    analyzer = ClaudeAnalyzer(api_key="test-key", **kwargs)
+    messages = FakeMessages(text)
+    analyzer.client = SimpleNamespace(messages=messages)
+    return analyzer, messages
+
+
+class TestBatchAnalysis:
+    @pytest.mark.asyncio
+    async def test_one_request_per_batch_mapped_by_key(self):
+        positions = [keyed_position(f"obl{i}", 1.3) for i in range(4)]
+        # Returned out of order; results still follow input order
+        analyzer, messages = analyzer_with(batch_response("obl3", "obl1", "obl0", "obl2"))
+
+        results = await analyzer.analyze_positions(positions)
+
+        assert messages.calls == 1
+        assert [r.position_key for r in results] == ["obl0", "obl1", "obl2", "obl3"]
+        assert results[1].reasoning == "Top up obl1"
+        assert all(r.strategy == RebalanceStrategy.COLLATERAL_TOP_UP for r in results)
+
+    @pytest.mark.asyncio
+    async def test_missing_positions_fall_back(self):
+        positions = [keyed_position("obl0", 1.3), keyed_position("obl1", 1.4)]
+        analyzer, _ = analyzer_with(batch_response("obl0", "unknown"))
+
+        results = await analyzer.analyze_positions(positions)
+
+        assert results[0].reasoning == "Top up obl0"
+        assert results[1].reasoning.startswith("WARNING")
+        assert results[1].confidence == 0.9
+        assert analyzer.analysis_count == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_size_splits_requests(self):
+        positions = [keyed_position(f"obl{i}", 1.3) for i in range(5)]
+        analyzer, messages = analyzer_with(
+            batch_response(*(p.obligation_key for p in positions)), batch_size=2
+        )
+
+        results = await analyzer.analyze_positions(positions)
+
+        # Two batches of two, then a single through the one-position path
+        assert messages.calls == 3
+        assert [r.position_key for r in results[:4]] == ["obl0", "obl1", "obl2", "obl3"]
+
+    @pytest.mark.asyncio
+    async def test_cached_positions_skip_the_request(self):
+        positions = [keyed_position("obl0", 1.3), keyed_position("obl1", 1.3)]
+        analyzer, messages = analyzer_with(batch_response("obl0", "obl1"), cache=AnalysisCache())
+
+        await analyzer.analyze_positions(positions)
+        await analyzer.analyze_positions(positions)
+
+        assert messages.calls == 1
+        assert analyzer.cache.get_stats()["hits"] == 2
+
+    def test_unparseable_batch_maps_nothing(self):
+        analyzer = ClaudeAnalyzer(api_key="test-key")
+        assert analyzer._parse_batch_response("not json", [keyed_position("a", 1.3)]) == {}
+
+
+class TestDeadlines:
+    @pytest.mark.asyncio
+    async def test_slow_model_falls_back_at_deadline(self):
+        analyzer = ClaudeAnalyzer(api_key="test-key", deadlines={RiskLevel.EMERGENCY: 0.05})
+        analyzer.client = SimpleNamespace(messages=FakeMessages(batch_response("obl0"), delay=5))
+
+        start = time.perf_counter()
+        result = await analyzer.analyze_position(keyed_position("obl0", 1.01))
+
+        assert time.perf_counter() - start < 1
+        assert result.strategy == RebalanceStrategy.EMERGENCY_UNWIND
+        assert analyzer.deadline_misses == 1
+
+    @pytest.mark.asyncio
+    async def test_batches_split_by_risk_level(self):
+        positions = [keyed_position("e0", 1.01), keyed_position("w0", 1.3), keyed_position("w1", 1.4)]
+        positions[0].risk_level = RiskLevel.EMERGENCY
+        analyzer, messages = analyzer_with(
+            batch_response("e0", "w0", "w1"), deadlines={RiskLevel.EMERGENCY: 0.05}
+        )
+        messages.delay = 0.2
+
+        results = await analyzer.analyze_positions(positions)
+
+        # The emergency request times out alone; the warning batch completes
+        assert messages.calls == 2
+        assert results[0].strategy == RebalanceStrategy.EMERGENCY_UNWIND
+        assert [r.reasoning for r in results[1:]] == ["Top up w0", "Top up w1"]
+
+    @pytest.mark.asyncio
+    async def test_request_pool_bounds_concurrency(self):
+        analyzer, messages = analyzer_with(batch_response(), max_concurrent_requests=2)
+        messages.delay = 0.01
+
+        await asyncio.gather(*(
+            analyzer.analyze_position(keyed_position(f"obl{i}", 1.3)) for i in range(6)
+        ))
+
+        assert messages.calls == 6
+        assert messages.peak == 2
@@ -0,0 +1,172 @@
+"""Tests for columnar bulk obligation decoding"""
+import os
+import random
+import struct
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from solders.pubkey import Pubkey
+
+from protocols.base import Protocol, RiskLevel
+from protocols.bulk import (
+    decode_snapshot,
+    kamino_columns,
+    marginfi_columns,
+    pack_accounts,
+    solend_columns,
+)
+from protocols.kamino import KaminoAdapter
+from protocols.layouts import (
+    KAMINO_ENTRY,
+    MARGINFI_BALANCE,
+    SOLEND_DEPOSIT,
+    decode_kamino_obligation,
+    decode_marginfi_account,
+    decode_solend_obligation,
+)
+from protocols.marginfi import MarginFiAdapter
+from protocols.reserves import ReserveInfo
+from protocols.solend import SolendAdapter
+
+
+def kamino_account(rng: random.Random, owner: bytes = bytes(32)) -> bytes:
+    data = bytearray(8) + owner + bytearray(32)
+    for _ in range(2):
+        count = rng.randrange(0, 10)
+        data.append(count)
+        for _ in range(min(count, rng.randrange(0, 9))):
+            data += KAMINO_ENTRY.compiled.pack(
+                rng.randbytes(32), rng.randrange(10**12), rng.randrange(10**11)
+            )
+    return bytes(data)
+
+
+def marginfi_account(rng: random.Random) -> bytes:
+    data = bytearray(72)
+    for _ in range(rng.randrange(0, 17)):
+        data += MARGINFI_BALANCE.compiled.pack(
+            rng.randrange(2), rng.randbytes(32),
+            rng.randrange(2**64), rng.randrange(4),
+            rng.randrange(2**64), rng.randrange(4),
+        )
+    return bytes(data)
+
+
+def solend_account(rng: random.Random) -> bytes:
+    data = bytearray(66) + struct.pack("<QQQQ", *(rng.randrange(2**64) for _ in range(4)))
+    data += bytes(130 - len(data))
+    count = rng.randrange(1, 4)
+    data.append(count)
+    for _ in range(count):
+        data += SOLEND_DEPOSIT.compiled.pack(rng.randbytes(32), 1, rng.randrange(10**9))
+    return bytes(data)
+
+
+class ThresholdReserves:
+    """Reserve cache stand-in whose liquidation threshold depends on the reserve key"""
+
+    def get_by_bytes(self, key: bytes) -> ReserveInfo:
+        return ReserveInfo(
+            key=key.hex(), mint="", decimals=6, ltv=0.5,
+            liquidation_threshold=0.5 + key[0] / 512,
+        )
+
+
+def truncated(rng: random.Random, data: bytes) -> bytes:
+    return data[:rng.randrange(len(data) + 1)]
+
+
+@pytest.mark.parametrize("make, columns, scalar", [
+    (kamino_account, kamino_columns, decode_kamino_obligation),
+    (marginfi_account, marginfi_columns, decode_marginfi_account),
+    (solend_account, solend_columns, decode_solend_obligation),
+])
+def test_columns_match_scalar_decoder(make, columns, scalar):
+    rng = random.Random(7)
+    accounts = [make(rng) for _ in range(200)]
+    accounts += [truncated(rng, make(rng)) for _ in range(200)]
+
+    collateral, debt = columns(*pack_accounts(accounts))
+
+    expected = [scalar(a) for a in accounts]
+    np.testing.assert_allclose(collateral, [e.total_collateral_usd for e in expected], rtol=1e-12)
+    np.testing.assert_allclose(debt, [e.total_debt_usd for e in expected], rtol=1e-12)
+
+
+@pytest.mark.parametrize("make, adapter_cls", [
+    (kamino_account, KaminoAdapter),
+    (marginfi_account, MarginFiAdapter),
+    (solend_account, SolendAdapter),
+])
+@pytest.mark.asyncio
+async def test_snapshot_health_matches_scalar_path(make, adapter_cls):
+    rng = random.Random(11)
+    adapter = adapter_cls("http://localhost")
+    adapter.reserves = ThresholdReserves()
+    accounts = [make(rng) for _ in range(100)]
+    accounts += [truncated(rng, make(rng)) for _ in range(100)]
+
+    snapshot = decode_snapshot(adapter, [(str(i), a) for i, a in enumerate(accounts)])
+
+    checked = 0
+    for row in range(len(snapshot)):
+        position = snapshot.position(row)
+        if position is None or position.total_debt_usd <= 0:
+            continue
+        assert snapshot.health_factor[row] == pytest.approx(position.health_factor, rel=1e-9)
+        checked += 1
+    assert checked > 20
+    await adapter.close()
+
+
+def test_pack_accounts_pads_rows():
+    rows, lengths = pack_accounts([b"\x01\x02", b"\x03"], min_width=4)
+    assert rows.shape == (2, 4)
+    assert rows.tolist() == [[1, 2, 0, 0], [3, 0, 0, 0]]
+    assert lengths.tolist() == [2, 1]
+
+
+class TestObligationSnapshot:
+    def _snapshot(self):
+        adapter = KaminoAdapter("http://localhost")
+        owner = Pubkey.new_unique()
+
+        def account(collateral: int, debt: int) -> bytes:
+            data = bytearray(8) + bytes(owner) + bytearray(32)
+            data.append(1)
+            data += KAMINO_ENTRY.compiled.pack(bytes(32), 10**9, collateral * 10**6)
+            data.append(1 if debt else 0)
+            if debt:
+                data += KAMINO_ENTRY.compiled.pack(bytes(32), 10**9, debt * 10**6)
+            return bytes(data)
+
+        snapshot = decode_snapshot(adapter, [
+            ("healthy", account(1000, 100)),
+            ("critical", account(1000, 750)),
+            ("emergency", account(1000, 840)),
+            ("no-debt", account(1000, 0)),
+        ])
+        return adapter, owner, snapshot
+
+    def test_columns(self):
+        _, _, snapshot = self._snapshot()
+        assert len(snapshot) == 4
+        np.testing.assert_allclose(snapshot.debt_usd, [100, 750, 840, 0])
+        assert snapshot.health_factor[0] == pytest.approx(8.5)
+        assert np.isinf(snapshot.health_factor[3])
+
+    @pytest.mark.asyncio
+    async def test_positions_built_only_below_threshold(self):
+        adapter, owner, snapshot = self._snapshot()
+        positions = snapshot.positions(threshold=1.2)
+        await adapter.close()
+
+        assert [p.obligation_key for p in positions] == ["emergency", "critical"]
+        assert all(p.owner == str(owner) for p in positions)
+        assert positions[0].protocol == Protocol.KAMINO
+        assert positions[0].risk_level == RiskLevel.EMERGENCY
+        assert positions[1].health_factor == pytest.approx(snapshot.health_factor[1])
@@ -0,0 +1,174 @@
+"""Tests for per-position execution coordination"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer import RebalanceStrategy
+from coordinator import ExecutionCoordinator
+from executor import ExecutionResult, RebalanceExecutor
+from tests.test_executor import make_analysis, make_position
+
+
+class SlowExecution:
+    """Counts calls; each takes `delay` seconds and returns the next outcome"""
+
+    def __init__(self, delay: float = 0.02, outcomes=(True,)):
+        self.delay = delay
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self) -> bool:
+        self.calls += 1
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return self.outcomes[min(self.calls, len(self.outcomes)) - 1]
+
+
+def identity(ok: bool) -> bool:
+    return ok
+
+
+class TestExecutionCoordinator:
+    @pytest.mark.asyncio
+    async def test_same_position_is_never_submitted_twice(self):
+        coordinator = ExecutionCoordinator()
+        execute = SlowExecution()
+
+        results = await asyncio.gather(*(coordinator.run("A", execute, identity) for _ in range(5)))
+
+        assert execute.calls == 1
+        assert sorted(reason or "" for _, reason in results) == ["", *["in_flight"] * 4]
+        assert coordinator.get_stats()["rejected"]["in_flight"] == 4
+
+    @pytest.mark.asyncio
+    async def test_independent_positions_run_in_parallel(self):
+        coordinator = ExecutionCoordinator()
+        execute = SlowExecution(delay=0.05)
+
+        start = asyncio.get_running_loop().time()
+        await asyncio.gather(*(coordinator.run(key, execute, identity) for key in "ABCD"))
+
+        assert execute.calls == 4
+        assert execute.max_running == 4
+        assert asyncio.get_running_loop().time() - start < 0.15
+
+    @pytest.mark.asyncio
+    async def test_cooldown_after_success(self):
+        coordinator = ExecutionCoordinator(cooldown_seconds=0.05)
+        execute = SlowExecution(delay=0)
+
+        await coordinator.run("A", execute, identity)
+        _, reason = await coordinator.run("A", execute, identity)
+        _, bypassed = await coordinator.run("A", execute, identity, bypass_cooldown=True)
+        await asyncio.sleep(0.06)
+        _, later = await coordinator.run("A", execute, identity)
+
+        assert reason == "cooldown"
+        assert bypassed is None and later is None
+        assert execute.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_attempt_budget_then_reset(self):
+        coordinator = ExecutionCoordinator(max_attempts=2, cooldown_seconds=0.05)
+        execute = SlowExecution(delay=0, outcomes=(False,))
+
+        reasons = [(await coordinator.run("A", execute, identity))[1] for _ in range(3)]
+        _, bypassed = await coordinator.run("A", execute, identity, bypass_cooldown=True)
+        await asyncio.sleep(0.06)
+        _, retried = await coordinator.run("A", execute, identity)
+
+        assert reasons == [None, None, "attempts_exhausted"]
+        assert bypassed == "attempts_exhausted"
+        assert retried is None
+        assert execute.calls == 3
+
+    @pytest.mark.asyncio
+    async def test_exception_counts_as_failure_and_releases_lock(self):
+        coordinator = ExecutionCoordinator(max_attempts=1)
+
+        async def boom():
+            raise RuntimeError("rpc down")
+
+        with pytest.raises(RuntimeError):
+            await coordinator.run("A", boom, identity)
+
+        assert not coordinator.in_flight("A")
+        _, reason = await coordinator.run("A", boom, identity)
+        assert reason == "attempts_exhausted"
+
+    @pytest.mark.asyncio
+    async def test_idle_positions_are_forgotten(self):
+        coordinator = ExecutionCoordinator(cooldown_seconds=0.01)
+        await coordinator.run("A", SlowExecution(delay=0), identity)
+        await asyncio.sleep(0.02)
+        await coordinator.run("B", SlowExecution(delay=0), identity)
+
+        assert coordinator.get_stats()["tracked"] == 1
+
+    @pytest.mark.asyncio
+    async def test_slow_success_keeps_its_cooldown(self):
+        # Execution outlasts the cooldown; the cooldown counts from the success
+        coordinator = ExecutionCoordinator(cooldown_seconds=0.05)
+        execute = SlowExecution(delay=0.08)
+
+        await coordinator.run("A", execute, identity)
+        await coordinator.run("B", SlowExecution(delay=0), identity)
+        _, reason = await coordinator.run("A", execute, identity)
+
+        assert reason == "cooldown"
+        assert execute.calls == 1
+
+    def test_rejects_empty_budget(self):
+        with pytest.raises(ValueError):
+            ExecutionCoordinator(max_attempts=0)
+
+
+class TestExecutorCoordination:
+    @pytest.mark.asyncio
+    async def test_concurrent_analyses_execute_once(self):
+        executor = RebalanceExecutor("http://rpc", "key", "test-wallet", dry_run=True)
+        position = make_position()
+        analysis = make_analysis(RebalanceStrategy.COLLATERAL_TOP_UP)
+        dry_run_topup = executor._execute_collateral_topup
+
+        async def slow_confirming_topup(*args):
+            await asyncio.sleep(0.02)
+            return await dry_run_topup(*args)
+
+        executor._execute_collateral_topup = slow_confirming_topup
+
+        results = await asyncio.gather(
+            executor.execute_rebalance(position, analysis),
+            executor.execute_rebalance(position, analysis),
+        )
+        again = await executor.execute_rebalance(position, analysis)
+
+        assert [r.success for r in results].count(True) == 1
+        assert {r.skipped for r in results} == {None, "in_flight"}
+        assert again.skipped == "cooldown"
+        assert again.to_dict()["skipped"] == "cooldown"
+        await executor.close()
+
+    @pytest.mark.asyncio
+    async def test_emergency_unwind_is_not_held_by_cooldown(self):
+        executor = RebalanceExecutor("http://rpc", "key", "test-wallet", dry_run=True)
+        position = make_position(1.02)
+
+        await executor.execute_rebalance(position, make_analysis(RebalanceStrategy.DEBT_REPAYMENT))
+        result = await executor.execute_rebalance(
+            position, make_analysis(RebalanceStrategy.EMERGENCY_UNWIND)
+        )
+
+        assert result.success and result.skipped is None
+        assert isinstance(result, ExecutionResult)
+        await executor.close()
@@ -0,0 +1,142 @@
+"""Tests for the prioritized rebalance execution queue"""
+import asyncio
+import os
+import sys
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer import RebalanceStrategy
+from execution_queue import ExecutionQueue, priority
+from protocols.base import RiskLevel
+from tests.test_executor import make_analysis, make_position
+
+
+def job(key: str, debt_usd: float, urgency: float = 0.5, level: RiskLevel = RiskLevel.WARNING):
+    position = make_position()
+    position.obligation_key = key
+    position.total_debt_usd = debt_usd
+    position.risk_level = level
+    analysis = replace(
+        make_analysis(
+            RebalanceStrategy.EMERGENCY_UNWIND
+            if level == RiskLevel.EMERGENCY
+            else RebalanceStrategy.COLLATERAL_TOP_UP
+        ),
+        urgency_score=urgency,
+        risk_level=level,
+    )
+    return position, analysis
+
+
+class Recorder:
+    """Handler that records start order and holds each job for `delay` seconds"""
+
+    def __init__(self, delay: float = 0.02):
+        self.delay = delay
+        self.started: list[str] = []
+        self.running = 0
+        self.max_running = 0
+
+    async def __call__(self, position, analysis):
+        self.started.append(position.obligation_key)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+        finally:
+            self.running -= 1
+        return position.obligation_key
+
+
+class TestExecutionQueue:
+    def test_priority_is_urgency_times_exposure(self):
+        position, analysis = job("A", 2_000_000, urgency=0.9)
+        assert priority(position, analysis) == pytest.approx(1_800_000)
+
+    @pytest.mark.asyncio
+    async def test_batch_runs_by_priority_not_list_order(self):
+        handler = Recorder()
+        queue = ExecutionQueue(handler, workers=1)
+        jobs = [
+            job("small", 1_000, urgency=0.9),
+            job("large", 500_000, urgency=0.5),
+            job("emergency", 2_000_000, urgency=1.0, level=RiskLevel.EMERGENCY),
+            job("medium", 50_000, urgency=0.6),
+        ]
+
+        results = await asyncio.gather(*(queue.submit(p, a) for p, a in jobs))
+
+        assert handler.started == ["emergency", "large", "medium", "small"]
+        assert results == ["small", "large", "emergency", "medium"]
+
+    @pytest.mark.asyncio
+    async def test_worker_pool_bounds_concurrency(self):
+        handler = Recorder()
+        queue = ExecutionQueue(handler, workers=3)
+
+        await asyncio.gather(*(queue.submit(*job(f"W{i}", 1_000 * i)) for i in range(10)))
+
+        assert handler.max_running == 3
+        assert queue.get_stats()["dispatched"] == 10
+
+    @pytest.mark.asyncio
+    async def test_emergency_starts_even_when_pool_is_busy(self):
+        handler = Recorder(delay=0.1)
+        queue = ExecutionQueue(handler, workers=2)
+        warnings = [queue.submit(*job(f"W{i}", 10_000)) for i in range(4)]
+        await asyncio.sleep(0.01)
+
+        emergency = queue.submit(*job("E", 1_000, level=RiskLevel.EMERGENCY))
+        await asyncio.sleep(0.01)
+
+        assert handler.started[-1] == "E"
+        assert handler.running == 3
+        assert queue.get_stats()["preempted"] == 1
+        await asyncio.gather(emergency, *warnings)
+        assert handler.started[3:] == ["W2", "W3"]
+
+    @pytest.mark.asyncio
+    async def test_handler_errors_reach_the_submitter(self):
+        async def failing(position, analysis):
+            raise RuntimeError("wallet unavailable")
+
+        queue = ExecutionQueue(failing, workers=1)
+        first = queue.submit(*job("A", 1))
+        second = queue.submit(*job("B", 1))
+
+        with pytest.raises(RuntimeError):
+            await first
+        with pytest.raises(RuntimeError):
+            await second
+
+    @pytest.mark.asyncio
+    async def test_close_drains_running_and_drops_queued(self):
+        queue = ExecutionQueue(Recorder(delay=0.05), workers=1)
+        running = queue.submit(*job("A", 1))
+        queued = queue.submit(*job("B", 1))
+        await asyncio.sleep(0.01)
+
+        await queue.close()
+
+        assert running.done() and running.result() == "A"
+        assert queued.cancelled()
+        assert queue.submit(*job("C", 1)).cancelled()
+        assert queue.get_stats()["queued"] == queue.get_stats()["running"] == 0
+
+    @pytest.mark.asyncio
+    async def test_close_cancels_running_after_timeout(self):
+        queue = ExecutionQueue(Recorder(delay=1), workers=1)
+        running = queue.submit(*job("A", 1))
+        await asyncio.sleep(0.01)
+
+        await queue.close(timeout=0.02)
+
+        assert running.cancelled()
+        assert queue.get_stats()["running"] == 0
+
+    def test_rejects_empty_pool(self):
+        with pytest.raises(ValueError):
+            ExecutionQueue(Recorder(), workers=0)
@@ -0,0 +1,73 @@
+"""Tests for the fast-path rule tier and latency histograms"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer import RebalanceStrategy
+from fast_path import FastPathRules
+from metrics import LatencyHistogram
+from protocols.base import CollateralPosition
+from risk_engine import RiskEngine
+from tests.test_analyzer import make_position
+
+
+def scored(*health_factors):
+    positions = [make_position(hf, collateral=10_000, debt=8_500 / hf) for hf in health_factors]
+    engine = RiskEngine()
+    scores = engine.score_positions(positions)
+    return engine, positions, scores, np.arange(len(positions))
+
+
+class TestFastPathRules:
+    def test_clear_cases_resolved_ambiguous_left(self):
+        # 1.01 unwind floor, 1.10 mid-critical, 1.19 next to the 1.2 boundary, 1.35 mid-warning
+        engine, positions, scores, rows = scored(1.01, 1.10, 1.19, 1.35)
+        mask = FastPathRules(engine).resolve(positions, scores, rows)
+        assert mask.tolist() == [True, True, False, True]
+
+    def test_multi_asset_positions_go_to_model(self):
+        engine, positions, scores, rows = scored(1.10, 1.01)
+        for p in positions:
+            p.collaterals.append(CollateralPosition("mSOL", "mSOL", 1, 100, 0.7, 0.8))
+        mask = FastPathRules(engine).resolve(positions, scores, rows)
+        # The unwind floor applies regardless of composition
+        assert mask.tolist() == [False, True]
+
+    def test_disabled_sends_everything_to_model(self):
+        engine, positions, scores, rows = scored(1.01, 1.10)
+        assert not FastPathRules(engine, enabled=False).resolve(positions, scores, rows).any()
+
+    def test_decisions_match_rule_strategies(self):
+        engine, positions, scores, _ = scored(1.01, 1.10, 1.35)
+        rules = FastPathRules(engine)
+
+        unwind = rules.decide(positions[0], scores, 0)
+        repay = rules.decide(positions[1], scores, 1)
+        top_up = rules.decide(positions[2], scores, 2)
+
+        assert unwind.strategy == RebalanceStrategy.EMERGENCY_UNWIND
+        assert unwind.suggested_amount_usd == pytest.approx(positions[0].total_debt_usd)
+        assert repay.strategy == RebalanceStrategy.DEBT_REPAYMENT
+        assert repay.suggested_amount_usd == pytest.approx(scores.rebalance_usd[1])
+        assert top_up.strategy == RebalanceStrategy.COLLATERAL_TOP_UP
+        assert repay.needs_action and repay.confidence >= 0.7
+        assert len(repay.reasoning_hash) == 64
+
+
+class TestLatencyHistogram:
+    def test_percentiles_use_bucket_bounds(self):
+        hist = LatencyHistogram()
+        hist.observe(0.000_010, n=90)
+        hist.observe(0.5, n=10)
+
+        assert hist.count == 100
+        assert hist.percentile(50) < 0.000_02
+        assert hist.percentile(99) == 0.5
+        assert hist.to_dict()["max_ms"] == 500.0
+
+    def test_empty(self):
+        assert LatencyHistogram().to_dict()["p99_ms"] == 0.0
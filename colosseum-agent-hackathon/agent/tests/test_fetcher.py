@@ -0,0 +1,206 @@
+"""Tests for the concurrent Position Fetcher"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fetcher import PositionFetcher
+from protocols.base import PositionData, Protocol, ProtocolAdapter, RiskLevel
+
+
+class FakeAdapter(ProtocolAdapter):
+    """Adapter that sleeps instead of calling RPC and tracks concurrency"""
+
+    def __init__(self, name: str, delay: float = 0.01, fail: bool = False):
+        super().__init__()
+        self.name = name
+        self.delay = delay
+        self.fail = fail
+        self.active = 0
+        self.peak = 0
+
+    async def get_protocol_name(self) -> str:
+        return self.name
+
+    async def get_health_factor(self, obligation_key: str) -> float:
+        return 2.0
+
+    def market_filters(self) -> list[dict]:
+        return []
+
+    def _build_position(self, wallet_address, obligation_key, obligation):
+        return None
+
+    async def _parse_account(self, wallet_address: str, account: dict):
+        return None
+
+    async def get_positions(self, wallet_address: str) -> list[PositionData]:
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("rpc down")
+        finally:
+            self.active -= 1
+        return [
+            PositionData(
+                protocol=Protocol.KAMINO,
+                owner=wallet_address,
+                obligation_key=f"{self.name}-{wallet_address}",
+                health_factor=2.0,
+                total_collateral_usd=1000,
+                total_debt_usd=400,
+                net_value_usd=600,
+                risk_level=RiskLevel.HEALTHY,
+            )
+        ]
+
+
+class RefreshingAdapter(FakeAdapter):
+    """Adapter whose wallets each own a fixed set of obligations"""
+
+    def __init__(self, name: str, keys_per_wallet: int):
+        super().__init__(name, delay=0)
+        self.keys_per_wallet = keys_per_wallet
+        self.scanned: list[str] = []
+        self.chunks: list[int] = []
+
+    async def get_positions(self, wallet_address: str) -> list[PositionData]:
+        self.scanned.append(wallet_address)
+        keys = [f"{wallet_address}-{i}" for i in range(self.keys_per_wallet)]
+        self.tracker.record_discovery(wallet_address, keys)
+        return []
+
+    async def refresh_obligations(self, pairs):
+        self.chunks.append(len(pairs))
+        return []
+
+
+class TestPositionFetcher:
+    @pytest.mark.asyncio
+    async def test_fetches_every_wallet_adapter_pair(self):
+        adapters = [FakeAdapter("a"), FakeAdapter("b")]
+        fetcher = PositionFetcher(adapters)
+        result = await fetcher.fetch_all(["w1", "w2", "w3"])
+        assert len(result.positions) == 6
+        assert result.latencies["a"].calls == 3
+        assert result.latencies["b"].calls == 3
+
+    @pytest.mark.asyncio
+    async def test_per_adapter_limit(self):
+        adapter = FakeAdapter("a")
+        fetcher = PositionFetcher([adapter], max_concurrency=50, per_adapter_concurrency=4)
+        await fetcher.fetch_all([f"w{i}" for i in range(20)])
+        assert adapter.peak == 4
+
+    @pytest.mark.asyncio
+    async def test_global_limit(self):
+        adapters = [FakeAdapter("a"), FakeAdapter("b"), FakeAdapter("c")]
+        fetcher = PositionFetcher(adapters, max_concurrency=3, per_adapter_concurrency=10)
+        await fetcher.fetch_all([f"w{i}" for i in range(10)])
+        assert sum(a.peak for a in adapters) <= 9
+        assert all(a.peak <= 3 for a in adapters)
+
+    @pytest.mark.asyncio
+    async def test_runs_concurrently(self):
+        adapters = [FakeAdapter("a", delay=0.05), FakeAdapter("b", delay=0.05)]
+        fetcher = PositionFetcher(adapters)
+        result = await fetcher.fetch_all([f"w{i}" for i in range(10)])
+        # 20 sequential fetches would take ~1s
+        assert result.duration_seconds < 0.5
+
+    @pytest.mark.asyncio
+    async def test_adapter_errors_are_isolated(self):
+        adapters = [FakeAdapter("ok"), FakeAdapter("bad", fail=True)]
+        fetcher = PositionFetcher(adapters)
+        result = await fetcher.fetch_all(["w1", "w2"])
+        assert len(result.positions) == 2
+        assert result.latencies["bad"].errors == 2
+        summary = result.latency_summary()
+        assert summary["ok"]["calls"] == 2
+        assert summary["bad"]["errors"] == 2
+
+    @pytest.mark.asyncio
+    async def test_refresh_mode_skips_known_wallets(self):
+        adapter = RefreshingAdapter("a", keys_per_wallet=5)
+        fetcher = PositionFetcher([adapter])
+        wallets = [f"w{i}" for i in range(50)]
+
+        await fetcher.fetch_all(wallets)
+        assert len(adapter.scanned) == 50
+        assert adapter.chunks == []
+
+        result = await fetcher.fetch_all(wallets)
+        assert len(adapter.scanned) == 50
+        assert sorted(adapter.chunks) == [50, 100, 100]
+        assert result.latencies["a"].refreshes == 3
+        assert result.latencies["a"].scans == 0
+
+    @pytest.mark.asyncio
+    async def test_rediscovery_when_interval_elapses(self):
+        adapter = RefreshingAdapter("a", keys_per_wallet=1)
+        adapter.tracker.rediscovery_interval_seconds = 0
+        fetcher = PositionFetcher([adapter])
+        await fetcher.fetch_all(["w1"])
+        await fetcher.fetch_all(["w1"])
+        assert adapter.scanned == ["w1", "w1"]
+
+    @pytest.mark.asyncio
+    async def test_refresh_mode_disabled_always_scans(self):
+        adapter = RefreshingAdapter("a", keys_per_wallet=3)
+        fetcher = PositionFetcher([adapter], refresh_mode=False)
+        await fetcher.fetch_all(["w1"])
+        await fetcher.fetch_all(["w1"])
+        assert adapter.scanned == ["w1", "w1"]
+        assert adapter.chunks == []
+
+
+class FakeRpc:
+    def __init__(self, values: list):
+        self.values = values
+        self.requested: list[list[str]] = []
+
+    async def get_multiple_accounts(self, pubkeys: list[str]) -> list:
+        self.requested.append(pubkeys)
+        return self.values
+
+
+class TestRefreshObligations:
+    @pytest.mark.asyncio
+    async def test_closed_accounts_are_untracked(self):
+        adapter = FakeAdapter("a")
+        adapter.rpc = FakeRpc([{"data": ["", "base64"]}, None])
+        adapter.tracker.record_discovery("w1", ["k1", "k2"])
+
+        async def parse(wallet, account):
+            return (await FakeAdapter.get_positions(adapter, wallet))[0]
+
+        adapter._parse_account = parse
+        positions = await adapter.refresh_obligations([("w1", "k1"), ("w1", "k2")])
+
+        assert len(positions) == 1
+        assert adapter.rpc.requested == [["k1", "k2"]]
+        assert adapter.tracker.known_pairs(["w1"]) == [("w1", "k1")]
+
+    @pytest.mark.asyncio
+    async def test_refresh_keys_groups_by_protocol(self):
+        kamino = RefreshingAdapter("kamino", keys_per_wallet=0)
+        solend = RefreshingAdapter("solend", keys_per_wallet=0)
+        kamino.protocol, solend.protocol = Protocol.KAMINO, Protocol.SOLEND
+        fetcher = PositionFetcher([kamino, solend])
+
+        checks = [(Protocol.KAMINO, "w1", f"k{i}") for i in range(150)]
+        checks.append((Protocol.SOLEND, "w1", "s1"))
+        checks.append((Protocol.MARGINFI, "w1", "m1"))
+        await fetcher.refresh_keys(checks)
+
+        assert sorted(kamino.chunks) == [50, 100]
+        assert solend.chunks == [1]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
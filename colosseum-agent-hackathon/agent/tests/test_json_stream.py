@@ -0,0 +1,106 @@
+"""Tests for incremental JSON parsing and streamed analysis"""
+import asyncio
+import json
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analysis_cache import AnalysisCache
+from analyzer import ClaudeAnalyzer, RebalanceStrategy
+from json_stream import IncrementalJsonObject
+from tests.test_analysis_cache import FakeMessages
+from tests.test_analyzer import make_position
+
+RESPONSE = "Assessment follows.\n" + json.dumps({
+    "strategy": "debt_repayment",
+    "confidence": 0.85,
+    "suggested_amount_usd": 1200.5,
+    "urgency_score": 0.9,
+    "risk_assessment": "SOL down 8% in an hour, \"thin\" books {not json}",
+    "reasoning": "Repay USDC debt to lift HF above 1.3",
+    "market_context": {"sol_change_pct": [-8.1, -2.0]},
+})
+
+
+def fed(text: str, size: int) -> IncrementalJsonObject:
+    parser = IncrementalJsonObject()
+    for i in range(0, len(text), size):
+        parser.feed(text[i:i + size])
+    return parser
+
+
+class TestIncrementalJsonObject:
+    @pytest.mark.parametrize("size", [1, 3, 7, 64, 10_000])
+    def test_matches_full_parse_at_any_chunking(self, size):
+        parser = fed(RESPONSE, size)
+        assert parser.done
+        assert parser.fields == json.loads(RESPONSE[RESPONSE.index("{"):])
+
+    def test_field_commits_once_delimiter_arrives(self):
+        parser = IncrementalJsonObject()
+        parser.feed('{"strategy": "no_action", "confidence": 0.7')
+        assert parser.fields == {"strategy": "no_action"}
+        parser.feed(", ")
+        assert parser.has_all(["strategy", "confidence"])
+        assert not parser.done
+
+    def test_malformed_field_is_skipped(self):
+        parser = fed('{"a": nope, "b": 2}', 4)
+        assert parser.fields == {"b": 2}
+        assert parser.done
+
+
+class TestStreamedAnalysis:
+    @pytest.mark.asyncio
+    async def test_decision_returned_before_reasoning_arrives(self):
+        analyzer = ClaudeAnalyzer(api_key="test-key", cache=AnalysisCache())
+        messages = FakeMessages(RESPONSE, chunk_size=8, chunk_delay=0.005)
+        analyzer.client = SimpleNamespace(messages=messages)
+        position = make_position(1.1)
+
+        result = await analyzer.analyze_position(position)
+
+        assert result.strategy == RebalanceStrategy.DEBT_REPAYMENT
+        assert result.confidence == 0.85
+        assert messages.streamed < len(RESPONSE)
+        assert result.reasoning == ""
+        assert analyzer.cache.get_stats()["entries"] == 0
+
+        await result.finalize()
+
+        assert result.reasoning == "Repay USDC debt to lift HF above 1.3"
+        assert len(result.reasoning_hash) == 64
+        cached = await analyzer.analyze_position(position)
+        assert messages.calls == 1
+        assert cached.reasoning == result.reasoning
+
+    @pytest.mark.asyncio
+    async def test_unstreamed_levels_use_single_request(self):
+        analyzer = ClaudeAnalyzer(api_key="test-key", stream_levels=())
+        messages = FakeMessages(RESPONSE)
+        messages.stream = None
+        analyzer.client = SimpleNamespace(messages=messages)
+
+        result = await analyzer.analyze_position(make_position(1.1))
+
+        assert result.reasoning_pending is None
+        assert result.reasoning == "Repay USDC debt to lift HF above 1.3"
+
+    @pytest.mark.asyncio
+    async def test_unparseable_stream_falls_back(self):
+        analyzer = ClaudeAnalyzer(api_key="test-key")
+        analyzer.client = SimpleNamespace(messages=FakeMessages("I cannot assess this position."))
+        started = asyncio.get_running_loop().time()
+
+        result = await analyzer.analyze_position(make_position(1.1))
+        await asyncio.wait_for(result.finalize(), 1)
+
+        # Falls back as soon as the stream ends, not at the urgency deadline
+        assert asyncio.get_running_loop().time() - started < 1
+        assert analyzer.deadline_misses == 0
+        assert result.reasoning_pending is None
+        assert analyzer.analysis_count == 0
@@ -0,0 +1,115 @@
+"""Tests for the precompiled obligation layouts"""
+import base64
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from protocols.layouts import (
+    KAMINO_ENTRY,
+    MARGINFI_BALANCE,
+    SOLEND_DEPOSIT,
+    decode_kamino_obligation,
+    decode_marginfi_account,
+    decode_solend_obligation,
+)
+from protocols.solend import SolendAdapter
+
+
+def kamino_account(deposits, borrows) -> bytes:
+    data = bytearray(72)
+    data.append(len(deposits))
+    for amount, value in deposits:
+        data += KAMINO_ENTRY.compiled.pack(b"\x01" * 32, amount, value)
+    data.append(len(borrows))
+    for amount, value in borrows:
+        data += KAMINO_ENTRY.compiled.pack(b"\x02" * 32, amount, value)
+    return bytes(data)
+
+
+def solend_account(deposited: int, borrowed: int, deposits) -> bytes:
+    data = bytearray(66)
+    data += struct.pack(
+        "<QQQQ", deposited % 2**64, deposited >> 64, borrowed % 2**64, borrowed >> 64
+    )
+    data += bytes(130 - len(data))
+    data.append(len(deposits))
+    for amount, value in deposits:
+        data += SOLEND_DEPOSIT.compiled.pack(b"\x03" * 32, amount, value)
+    return bytes(data)
+
+
+class TestLayouts:
+    def test_entry_layout_size(self):
+        assert KAMINO_ENTRY.size == 48
+        assert MARGINFI_BALANCE.size == 65
+        assert SOLEND_DEPOSIT.size == 56
+        assert SOLEND_DEPOSIT.names == ("reserve", "deposited_amount", "market_value")
+
+    def test_kamino_decode(self):
+        data = kamino_account([(5 * 10**9, 1_000 * 10**6)], [(1, 400 * 10**6), (2, 100 * 10**6)])
+        obligation = decode_kamino_obligation(data)
+
+        assert len(obligation.deposits) == 1
+        assert obligation.deposits[0].amount == 5 * 10**9
+        assert [b.slot for b in obligation.borrows] == [0, 1]
+        assert obligation.total_collateral_usd == pytest.approx(1000)
+        assert obligation.total_debt_usd == pytest.approx(500)
+
+    def test_kamino_truncated_account(self):
+        data = kamino_account([(1, 10**6), (1, 10**6)], [])[:-20]
+        obligation = decode_kamino_obligation(data)
+        assert len(obligation.deposits) == 1
+        assert obligation.borrows == []
+
+    def test_kamino_cut_at_each_count(self):
+        data = kamino_account([(1, 10**6)], [(2, 3 * 10**6)])
+        # Ends before the borrow count, then before the borrow entries
+        for cut, borrows in ((72, 0), (73, 0), (121, 0), (122, 0), (len(data), 1)):
+            obligation = decode_kamino_obligation(data[:cut])
+            assert len(obligation.deposits) == (cut >= 121)
+            assert len(obligation.borrows) == borrows
+            assert obligation.total_debt_usd == pytest.approx(3 * borrows)
+
+    def test_solend_short_account_keeps_values(self):
+        data = solend_account(1_000 * 10**18, 500 * 10**18, [(3 * 10**9, 900 * 10**6)])
+        obligation = decode_solend_obligation(data[:130])
+        assert obligation.deposits == []
+        assert obligation.total_debt_usd == pytest.approx(500)
+
+    def test_marginfi_skips_inactive_and_dust(self):
+        data = bytearray(72)
+        data += MARGINFI_BALANCE.compiled.pack(1, b"\x04" * 32, 2 * 10**18, 0, 0, 0)
+        data += MARGINFI_BALANCE.compiled.pack(0, b"\x05" * 32, 9 * 10**18, 0, 0, 0)
+        data += MARGINFI_BALANCE.compiled.pack(1, b"\x06" * 32, 10, 0, 10**18, 0)
+        account = decode_marginfi_account(bytes(data))
+
+        assert [d.slot for d in account.deposits] == [0]
+        assert [b.slot for b in account.borrows] == [2]
+        assert account.total_collateral_usd == pytest.approx(2000)
+        assert account.total_debt_usd == pytest.approx(1000)
+
+    def test_solend_decode_reads_deposits(self):
+        data = solend_account(1_000 * 10**18, 500 * 10**18, [(3 * 10**9, 900 * 10**6), (1, 0)])
+        obligation = decode_solend_obligation(data)
+
+        assert obligation.total_collateral_usd == pytest.approx(1000)
+        assert obligation.total_debt_usd == pytest.approx(500)
+        assert len(obligation.deposits) == 1
+        assert obligation.deposits[0].amount == 3 * 10**9
+
+    @pytest.mark.asyncio
+    async def test_solend_adapter_parses_obligation_with_deposits(self):
+        adapter = SolendAdapter("http://localhost")
+        data = solend_account(1_000 * 10**18, 500 * 10**18, [(3 * 10**9, 900 * 10**6)])
+        account = {"pubkey": "Obl1", "account": {"data": [base64.b64encode(data).decode(), "base64"]}}
+
+        position = await adapter._parse_obligation("wallet", account)
+        await adapter.close()
+
+        assert position is not None
+        assert position.health_factor == pytest.approx(1.7)
+        assert position.collaterals[0].amount == pytest.approx(3.0)
@@ -0,0 +1,110 @@
+"""Tests for the segmented activity log store and its sequence index"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from activity_logger import ActivityLogger
+
+
+class TestSegmentedActivityLog:
+    def setup_method(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.t0 = time.time()
+
+    def open(self, **kwargs) -> ActivityLogger:
+        options = dict(batch_size=4, max_segment_bytes=1024, index_interval=8,
+                       retain_entries=10, merkle_batch_size=16)
+        options.update(kwargs)
+        return ActivityLogger(log_dir=self.tmpdir, agent_name="test", **options)
+
+    async def filled(self, n: int, **kwargs) -> ActivityLogger:
+        log = self.open(**kwargs)
+        for i in range(n):
+            await log.log_activity("scan", {"i": i}, timestamp=self.t0 + i)
+            if i % 4 == 3:
+                await log.flush()
+        await log.flush()
+        return log
+
+    @pytest.mark.asyncio
+    async def test_rolls_over_and_verifies_across_segments(self):
+        log = await self.filled(60)
+
+        assert len(log.store.segments) > 3
+        # A segment overshoots by at most one group of four lines
+        assert all(s.size < 1024 + 4 * 300 for s in log.store.segments)
+        assert await log.verify_integrity(full=True) == (True, 60)
+        # Merkle batches span segment boundaries
+        assert log.verify_proof(log.prove(20))
+        await log.close()
+
+    @pytest.mark.asyncio
+    async def test_memory_is_bounded_and_old_entries_read_from_store(self):
+        log = await self.filled(60)
+
+        assert len(log.entries) == 10
+        assert log.read(59) is log.entries[-1]
+        old = log.read(13)
+        assert old.details == {"i": 13}
+        assert old.entry_hash == log.prove(13).entry_hash
+        assert log.read(60) is None
+        summary = await log.get_summary()
+        assert summary["actions"] == {"scan": 60}
+        await log.close()
+
+    @pytest.mark.asyncio
+    async def test_time_range_iteration(self):
+        log = await self.filled(60)
+
+        entries = list(log.iter_range(self.t0 + 10, self.t0 + 25))
+
+        assert [e.sequence for e in entries] == list(range(10, 25))
+        assert list(log.iter_range(self.t0 + 100, self.t0 + 200)) == []
+        await log.close()
+
+    @pytest.mark.asyncio
+    async def test_restart_reuses_segments_and_index(self):
+        log = await self.filled(30)
+        segments = len(log.store.segments)
+        points = log.store.index_points
+        await log.close()
+
+        reopened = self.open()
+        assert len(reopened.store.segments) == segments
+        assert reopened.store.index_points == points
+        assert reopened.sequence == 30
+        entry = await reopened.log_activity("scan", {"i": 30})
+        assert entry.previous_hash == log.last_hash
+        assert await reopened.verify_integrity(full=True) == (True, 31)
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_rolls_over_by_age(self):
+        log = await self.filled(3, max_segment_age=60)
+        assert len(log.store.segments) == 1
+        log.store.active.first_timestamp -= 120
+        await log.log_activity("scan", {})
+        await log.flush()
+        assert len(log.store.segments) == 2
+        await log.close()
+
+    @pytest.mark.asyncio
+    async def test_single_file_log_is_adopted(self):
+        log = await self.filled(5, max_segment_bytes=1 << 20)
+        await log.close()
+        legacy = os.path.join(self.tmpdir, "test_activity.jsonl")
+        os.rename(log.log_file, legacy)
+        os.remove(log.store.index_file)
+
+        reopened = self.open(max_segment_bytes=1 << 20)
+
+        assert not os.path.exists(legacy)
+        assert reopened.sequence == 5
+        assert json.loads(reopened.log_file.read_text().splitlines()[2])["sequence"] == 2
+        assert reopened.read(2).details == {"i": 2}
@@ -0,0 +1,125 @@
+"""Tests for Merkle batch roots and activity entry inclusion proofs"""
+import hashlib
+import os
+import sys
+import tempfile
+from dataclasses import replace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from activity_logger import ActivityLogger
+from merkle import MerkleProof, merkle_path, merkle_root, verify_proof
+
+
+def hashes(n: int) -> list[str]:
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+class TestMerkle:
+    @pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 13])
+    def test_every_leaf_proves_against_root(self, n):
+        leaves = hashes(n)
+        root = merkle_root(leaves)
+        for i, leaf in enumerate(leaves):
+            proof = MerkleProof(i, leaf, 0, root, merkle_path(leaves, i))
+            assert verify_proof(proof, i, n)
+            assert len(proof.siblings) <= max(1, (n - 1).bit_length())
+
+    def test_wrong_leaf_or_sibling_fails(self):
+        leaves = hashes(6)
+        root = merkle_root(leaves)
+        proof = MerkleProof(2, leaves[2], 0, root, merkle_path(leaves, 2))
+
+        assert not verify_proof(replace(proof, entry_hash=leaves[3]), 2, 6)
+        side, _ = proof.siblings[0]
+        assert not verify_proof(replace(proof, siblings=[(side, leaves[0])] + proof.siblings[1:]), 2, 6)
+
+    def test_proof_is_bound_to_its_position(self):
+        leaves = hashes(6)
+        root = merkle_root(leaves)
+        proof = MerkleProof(3, leaves[3], 0, root, merkle_path(leaves, 3))
+
+        assert verify_proof(proof, 3, 6)
+        assert not verify_proof(proof, 5, 6)
+        assert not verify_proof(proof, 2, 6)
+        assert not verify_proof(proof, 6, 6)
+
+    def test_odd_node_is_not_duplicated(self):
+        # With duplication, [a, b, c] and [a, b, c, c] would share a root
+        leaves = hashes(3)
+        assert merkle_root(leaves) != merkle_root(leaves + leaves[-1:])
+
+
+class TestActivityProofs:
+    def setup_method(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    async def filled(self, n: int) -> ActivityLogger:
+        log = ActivityLogger(log_dir=self.tmpdir, agent_name="test", merkle_batch_size=4)
+        for i in range(n):
+            await log.log_activity("decision", {"i": i})
+        await log.flush()
+        return log
+
+    @pytest.mark.asyncio
+    async def test_sealed_entries_prove(self):
+        log = await self.filled(10)
+
+        assert len(log.batch_roots) == 2
+        proof = log.prove(6)
+        assert proof.batch == 1
+        assert proof.entry_hash == log.entries[6].entry_hash
+        assert log.verify_proof(proof)
+        # Entries 8 and 9 are in the open batch
+        assert log.prove(9) is None
+        await log.close()
+
+    @pytest.mark.asyncio
+    async def test_roots_survive_restart_and_open_batch_resumes(self):
+        log = await self.filled(6)
+        roots = {b: r.root for b, r in log.batch_roots.items()}
+        await log.close()
+
+        reopened = ActivityLogger(log_dir=self.tmpdir, agent_name="test", merkle_batch_size=4)
+        assert {b: r.root for b, r in reopened.batch_roots.items()} == roots
+        await reopened.log_activity("decision", {"i": 6})
+        await reopened.log_activity("decision", {"i": 7})
+        await reopened.flush()
+
+        assert len(reopened.batch_roots) == 2
+        assert reopened.verify_proof(reopened.prove(7))
+        await reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_existing_log_is_sealed_on_load(self):
+        log = await self.filled(9)
+        await log.close()
+        os.remove(log.roots_file)
+
+        reopened = ActivityLogger(log_dir=self.tmpdir, agent_name="test", merkle_batch_size=4)
+        assert len(reopened.batch_roots) == 2
+        assert reopened.verify_proof(reopened.prove(3))
+
+    @pytest.mark.asyncio
+    async def test_rewritten_entry_breaks_its_batch(self):
+        log = await self.filled(8)
+        await log.close()
+        forged = log.entries[5].entry_hash
+        log.log_file.write_text(log.log_file.read_text().replace(forged, "0" * 64))
+
+        assert log.prove(5) is None
+        assert log.verify_proof(log.prove(1))
+
+    @pytest.mark.asyncio
+    async def test_relabeled_proof_fails(self):
+        log = await self.filled(8)
+        proof = log.prove(3)
+
+        assert log.verify_proof(proof)
+        assert not log.verify_proof(replace(proof, sequence=1))
+        # Same batch root, but sequence 5 belongs to batch 1
+        assert not log.verify_proof(replace(proof, sequence=5))
+        assert not log.verify_proof(replace(proof, sequence=7, batch=1))
+        await log.close()
@@ -0,0 +1,126 @@
+"""Tests for the shared price service"""
+import asyncio
+import base64
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from solders.pubkey import Pubkey
+
+from protocols.kamino import KaminoAdapter
+from protocols.layouts import KAMINO_ENTRY
+from protocols.pricing import PriceService
+from tests.test_reserves import USDC, FakeRpc, kamino_reserve
+
+SOL = "So11111111111111111111111111111111111111112"
+BONK = "DezXAZ8z7PnrnRJjz3wXBoRgixCa6xjnB7YaB1pPB263"
+
+
+class FakeJupiter(httpx.AsyncBaseTransport):
+    """Answers price requests from a dict and records every requested id list"""
+
+    def __init__(self, prices: dict[str, float]):
+        self.prices = prices
+        self.requests: list[list[str]] = []
+        self.fail = False
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        ids = request.url.params["ids"].split(",")
+        self.requests.append(ids)
+        await asyncio.sleep(0.01)
+        if self.fail:
+            return httpx.Response(503)
+        data = {m: {"id": m, "price": str(self.prices[m])} for m in ids if m in self.prices}
+        return httpx.Response(200, json={"data": data})
+
+
+class TestPriceService:
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_request(self):
+        jupiter = FakeJupiter({SOL: 140.0, USDC: 1.0})
+        prices = PriceService(transport=jupiter)
+
+        results = await asyncio.gather(*(prices.get_prices([SOL, USDC]) for _ in range(20)))
+        await prices.close()
+
+        assert len(jupiter.requests) == 1
+        assert all(r[SOL].price == 140.0 for r in results)
+
+    @pytest.mark.asyncio
+    async def test_fresh_quotes_are_not_refetched(self):
+        jupiter = FakeJupiter({SOL: 140.0})
+        prices = PriceService(ttl_seconds=60, transport=jupiter)
+
+        await prices.get_price(SOL)
+        await prices.get_price(SOL)
+        assert len(jupiter.requests) == 1
+
+        prices.ttl_seconds = 0
+        await prices.get_price(SOL)
+        await prices.close()
+        assert len(jupiter.requests) == 2
+
+    @pytest.mark.asyncio
+    async def test_refresh_piggybacks_stale_mints(self):
+        jupiter = FakeJupiter({SOL: 140.0, BONK: 0.00002})
+        prices = PriceService(ttl_seconds=0, transport=jupiter)
+        await prices.get_price(BONK)
+
+        await prices.get_price(SOL)
+        await prices.close()
+        assert sorted(jupiter.requests[-1]) == sorted([SOL, BONK])
+
+    @pytest.mark.asyncio
+    async def test_failure_serves_last_good_then_fallback(self):
+        jupiter = FakeJupiter({SOL: 140.0})
+        prices = PriceService(ttl_seconds=0, transport=jupiter)
+        await prices.get_price(SOL)
+
+        jupiter.fail = True
+        quote = await prices.get_price(SOL)
+        fallback = await prices.get_price(USDC)
+        await prices.close()
+
+        assert (quote.price, quote.source) == (140.0, "jupiter")
+        assert (fallback.price, fallback.source) == (1.0, "fallback")
+        assert prices.get_stats()["refresh_errors"] == 2
+
+    @pytest.mark.asyncio
+    async def test_push_updates_skip_out_of_order(self):
+        prices = PriceService(transport=FakeJupiter({}))
+        prices.push(SOL, 150.0, timestamp=200)
+        prices.push(SOL, 120.0, timestamp=100)
+        await prices.close()
+
+        assert prices.peek(SOL).price == 150.0
+        assert prices.peek(SOL).source == "push"
+
+
+class TestAdapterRepricing:
+    @pytest.mark.asyncio
+    async def test_kamino_values_entries_at_shared_price(self):
+        reserve = Pubkey.new_unique()
+        jupiter = FakeJupiter({USDC: 0.5})
+        prices = PriceService(transport=jupiter)
+        adapter = KaminoAdapter("http://localhost", prices=prices)
+        adapter.reserves.rpc = FakeRpc({str(reserve): kamino_reserve()})
+
+        data = bytearray(72)
+        data.append(1)
+        data += KAMINO_ENTRY.compiled.pack(bytes(reserve), 2_000 * 10**6, 2_000 * 10**6)
+        data.append(1)
+        data += KAMINO_ENTRY.compiled.pack(bytes(reserve), 1_000 * 10**6, 1_000 * 10**6)
+        account = {"pubkey": "Obl1", "account": {"data": [base64.b64encode(bytes(data)).decode(), "base64"]}}
+
+        position = await adapter._parse_obligation("wallet", account)
+        await adapter.close()
+        await prices.close()
+
+        assert len(jupiter.requests) == 1
+        assert position.total_collateral_usd == pytest.approx(1_000)
+        assert position.total_debt_usd == pytest.approx(500)
+        assert position.health_factor == pytest.approx(1.8)
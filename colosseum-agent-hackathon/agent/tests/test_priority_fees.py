@@ -0,0 +1,220 @@
+"""Tests for the priority fee estimator"""
+import asyncio
+import base64
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from solders.transaction import Transaction
+
+from analyzer import RebalanceStrategy
+from executor import DEFAULT_PRIORITY_FEE, RebalanceExecutor, route_accounts
+from priority_fees import PriorityFeeEstimator, nearest_rank
+from tests.test_executor import make_analysis
+from tests.test_tx_templates import PAYER, critical_position, template_cache
+
+
+class FakeRpc:
+    """Serves per-slot fees and reports signatures confirmed after `confirm_after` polls"""
+
+    def __init__(self, fees: list[int], first_slot: int = 1000, confirm_after: int = 2):
+        self.fees = fees
+        self.first_slot = first_slot
+        self.confirm_after = confirm_after
+        self.calls: list[tuple[str, list]] = []
+        self.status_polls = 0
+        self.fail = False
+        self.err = None
+
+    async def call(self, method: str, params: list):
+        self.calls.append((method, params))
+        await asyncio.sleep(0.005)
+        if self.fail:
+            raise RuntimeError("rpc down")
+        if method == "getRecentPrioritizationFees":
+            return [
+                {"slot": self.first_slot + i, "prioritizationFee": fee}
+                for i, fee in enumerate(self.fees)
+            ]
+        if method == "getSignatureStatuses":
+            self.status_polls += 1
+            landed = self.status_polls >= self.confirm_after
+            return {"value": [{
+                "confirmationStatus": "confirmed" if landed else "processed",
+                "err": self.err,
+            }]}
+        raise AssertionError(method)
+
+    def sampled(self) -> int:
+        return sum(m == "getRecentPrioritizationFees" for m, _ in self.calls)
+
+
+def estimator(fees: list[int], confirm_after: int = 2, **kwargs) -> tuple[PriorityFeeEstimator, FakeRpc]:
+    rpc = FakeRpc(fees, confirm_after=confirm_after)
+    kwargs.setdefault("min_fee", 0)
+    kwargs.setdefault("confirm_poll_interval", 0.01)
+    return PriorityFeeEstimator(rpc, **kwargs), rpc
+
+
+class TestPriorityFeeEstimator:
+    def test_nearest_rank(self):
+        values = list(range(1, 101))
+        assert nearest_rank(values, 50) == 50
+        assert nearest_rank(values, 95) == 95
+        assert nearest_rank(values, 0) == 1
+        assert nearest_rank([7], 99) == 7
+
+    @pytest.mark.asyncio
+    async def test_urgency_selects_percentile(self):
+        fees, rpc = estimator(list(range(0, 100_000, 1_000)))
+
+        calm = await fees.estimate(["PoolA"], urgency=0.0)
+        urgent = await fees.estimate(["PoolA"], urgency=1.0)
+
+        assert calm == 49_000  # p50
+        assert urgent == 94_000  # p95
+        assert rpc.sampled() == 1
+        assert rpc.calls[0][1] == [["PoolA"]]
+
+    @pytest.mark.asyncio
+    async def test_clamped_to_bounds(self):
+        fees, _ = estimator([5_000_000] * 10, max_fee=2_000_000)
+        assert await fees.estimate(["PoolA"], 1.0) == 2_000_000
+        quiet, _ = estimator([0] * 10, min_fee=1_000)
+        assert await quiet.estimate(["PoolA"], 0.0) == 1_000
+
+    @pytest.mark.asyncio
+    async def test_window_rolls_forward_by_slot(self):
+        fees, rpc = estimator([100] * 10, window_slots=10, max_age_seconds=0)
+        await fees.estimate(["PoolA"], 1.0)
+
+        rpc.first_slot, rpc.fees = 1005, [9_000] * 10
+        assert await fees.estimate(["PoolA"], 0.0) == 9_000
+        assert len(fees._samples[fees._key(["PoolA"])]) == 10
+
+    @pytest.mark.asyncio
+    async def test_account_sets_sampled_separately_and_shared(self):
+        fees, rpc = estimator([1_000] * 5)
+
+        await asyncio.gather(
+            fees.estimate(["PoolA", "PoolB"], 0.5),
+            fees.estimate(["PoolB", "PoolA"], 0.5),
+            fees.estimate(["PoolC"], 0.5),
+        )
+
+        assert rpc.sampled() == 2
+        assert fees.get_stats()["account_sets"] == 2
+
+    @pytest.mark.asyncio
+    async def test_falls_back_without_samples(self):
+        fees, rpc = estimator([1_000], default_fee=42_000)
+        rpc.fail = True
+
+        assert await fees.estimate(["PoolA"], 1.0) == 42_000
+        assert fees.get_stats()["fallbacks"] == 1
+        assert fees.get_stats()["sample_errors"] == 1
+
+    @pytest.mark.asyncio
+    async def test_wait_for_landing(self):
+        fees, rpc = estimator([], confirm_after=3)
+        loop_start = asyncio.get_running_loop().time()
+
+        landed, err = await fees.wait_for_landing("sig", time.time())
+
+        assert landed is not None and 0 < landed < 1
+        assert err is None
+        assert rpc.status_polls == 3
+        assert fees.get_stats()["landing"]["count"] == 1
+
+        slow, _ = estimator([], confirm_after=1_000, confirm_timeout=0.05)
+        assert await slow.wait_for_landing("sig", time.time()) == (None, None)
+        assert slow.get_stats()["unconfirmed"] == 1
+        assert asyncio.get_running_loop().time() - loop_start < 1
+
+    @pytest.mark.asyncio
+    async def test_landed_with_error_is_reported(self):
+        fees, rpc = estimator([], confirm_after=1)
+        rpc.err = {"InstructionError": [2, {"Custom": 6001}]}
+
+        landed, err = await fees.wait_for_landing("sig", time.time())
+
+        assert landed is not None
+        assert "InstructionError" in err
+        assert fees.get_stats()["failed"] == 1
+
+
+class TestExecutorFees:
+    def test_route_accounts(self):
+        quote = {"routePlan": [
+            {"swapInfo": {"ammKey": "PoolA"}},
+            {"swapInfo": {"ammKey": "PoolB"}},
+            {"swapInfo": {}},
+        ]}
+        assert route_accounts(quote) == ["PoolA", "PoolB"]
+        assert route_accounts({}) == []
+
+    @pytest.mark.asyncio
+    async def test_repay_records_fee_and_landing(self):
+        fees, rpc = estimator(list(range(0, 100_000, 1_000)))
+        cache, _ = template_cache()
+        executor = RebalanceExecutor(
+            "http://rpc", "key", PAYER, dry_run=False, templates=cache, fees=fees
+        )
+        position = critical_position(1.02)
+        executor.prepare_templates([position])
+        sent = []
+
+        async def sign_and_send(transaction_base64):
+            sent.append(transaction_base64)
+            return "sig"
+
+        executor._sign_and_send = sign_and_send
+        analysis = make_analysis(RebalanceStrategy.EMERGENCY_UNWIND)  # urgency 0.8
+
+        result = await executor.execute_rebalance(position, analysis)
+
+        assert result.priority_fee_micro_lamports == 85_000  # p86
+        assert result.landing_seconds is not None
+        assert result.to_dict()["priority_fee_micro_lamports"] == 85_000
+        # The template's compute unit price instruction carries the estimate
+        tx = Transaction.from_bytes(base64.b64decode(sent[0]))
+        price = tx.message.instructions[1]
+        assert int.from_bytes(bytes(price.data[1:9]), "little") == 85_000
+        sampled = rpc.calls[0][1][0]
+        assert position.obligation_key in sampled and PAYER not in sampled
+        await executor.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_transaction_is_not_success(self):
+        fees, rpc = estimator([1_000] * 10, confirm_after=1)
+        rpc.err = {"InstructionError": [2, {"Custom": 6001}]}
+        cache, _ = template_cache()
+        executor = RebalanceExecutor(
+            "http://rpc", "key", PAYER, dry_run=False, templates=cache, fees=fees
+        )
+        position = critical_position(1.02)
+        executor.prepare_templates([position])
+
+        async def sign_and_send(transaction_base64):
+            return "sig"
+
+        executor._sign_and_send = sign_and_send
+
+        result = await executor.execute_rebalance(
+            position, make_analysis(RebalanceStrategy.EMERGENCY_UNWIND)
+        )
+
+        assert not result.success
+        assert result.tx_signature == "sig"
+        assert "InstructionError" in result.error
+        await executor.close()
+
+    @pytest.mark.asyncio
+    async def test_without_estimator_uses_default(self):
+        executor = RebalanceExecutor("http://rpc", "key", "test-wallet", dry_run=False)
+        assert await executor._priority_fee(["PoolA"], 1.0) == DEFAULT_PRIORITY_FEE
+        await executor.close()
@@ -0,0 +1,174 @@
+"""Tests for the prefetching Jupiter quote cache"""
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer import RebalanceStrategy
+from executor import TOKENS, RebalanceExecutor
+from protocols.pricing import PriceQuote, PriceService
+from quote_cache import QuoteCache, size_bucket
+from tests.test_executor import make_analysis, make_position
+
+USDC, SOL = TOKENS["USDC"], TOKENS["SOL"]
+
+
+class FakeQuoteApi(httpx.AsyncBaseTransport):
+    """Answers quote requests, counting them and stamping an advancing slot"""
+
+    def __init__(self):
+        self.requests: list[dict] = []
+        self.slot = 1000
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        params = dict(request.url.params)
+        self.requests.append(params)
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json={
+            "inputMint": params["inputMint"],
+            "outputMint": params["outputMint"],
+            "inAmount": params["amount"],
+            "slippageBps": int(params["slippageBps"]),
+            "contextSlot": self.slot,
+        })
+
+
+def quote_cache(**kwargs) -> tuple[QuoteCache, FakeQuoteApi]:
+    api = FakeQuoteApi()
+    return QuoteCache(transport=api, **kwargs), api
+
+
+class TestSizeBucket:
+    @pytest.mark.parametrize("amount", [2, 7, 999, 500_000_000, 123_456_789])
+    def test_rounds_up_within_step(self, amount):
+        bucket = size_bucket(amount, 0.1)
+        assert amount <= bucket <= amount * 1.1 + 1
+
+    def test_nearby_amounts_share_a_bucket(self):
+        assert size_bucket(500_000_000, 0.1) == size_bucket(499_000_000, 0.1)
+        assert size_bucket(499_500_000, 0.005) == size_bucket(499_000_000, 0.005)
+
+    @pytest.mark.asyncio
+    async def test_bucket_beyond_slippage_quotes_exact_amount(self):
+        cache, api = quote_cache(size_step=0.1, slippage_bps=50)
+        # 500M rounds up to ~541.8M, 8% over; 541M is within 0.2% of it
+        bucket = size_bucket(500_000_000, 0.1)
+        _, exact = await cache.get_quote(USDC, SOL, 500_000_000)
+        _, again = await cache.get_quote(USDC, SOL, 500_000_000)
+        _, bucketed = await cache.get_quote(USDC, SOL, 541_000_000)
+        _, served = await cache.get_quote(USDC, SOL, 540_000_000)
+        cache.track([(USDC, SOL, 500_000_000)])
+        await cache.close()
+
+        assert exact == again == 500_000_000
+        assert bucketed == served == bucket
+        # Exact quotes are not cached; the in-tolerance bucket is
+        assert [r["amount"] for r in api.requests] == ["500000000", "500000000", str(bucket)]
+        assert cache.rejected["size"] == 2
+        assert cache.get_stats()["tracked"] == 0
+
+
+class TestQuoteCache:
+    @pytest.mark.asyncio
+    async def test_fresh_quote_served_from_cache(self):
+        cache, api = quote_cache()
+
+        first, amount = await cache.get_quote(USDC, SOL, 499_500_000)
+        served = await asyncio.gather(*(cache.get_quote(USDC, SOL, 499_000_000) for _ in range(3)))
+        await cache.close()
+
+        assert len(api.requests) == 1
+        assert all(quote is first for quote, _ in served)
+        assert first["inAmount"] == str(amount)
+        assert cache.get_stats()["hits"] == 3
+
+    @pytest.mark.asyncio
+    async def test_concurrent_misses_share_one_request(self):
+        cache, api = quote_cache()
+        await asyncio.gather(*(cache.get_quote(USDC, SOL, 10_000_000) for _ in range(5)))
+        await cache.close()
+        assert len(api.requests) == 1
+
+    @pytest.mark.asyncio
+    async def test_age_and_slot_limits(self):
+        cache, api = quote_cache(max_age_seconds=0.05, max_slot_lag=10)
+        await cache.get_quote(USDC, SOL, 10_000_000)
+        await asyncio.sleep(0.06)
+        await cache.get_quote(USDC, SOL, 10_000_000)
+
+        api.slot += 50
+        await cache.get_quote(USDC, SOL, 99_000_000)
+        await cache.get_quote(USDC, SOL, 10_000_000)
+        await cache.close()
+
+        assert len(api.requests) == 4
+        assert cache.rejected == {"age": 1, "slot": 1, "drift": 0, "size": 0}
+
+    @pytest.mark.asyncio
+    async def test_price_drift_beyond_slippage_refetches(self):
+        prices = PriceService(fallback_prices={})
+        prices._record(PriceQuote(SOL, 150.0, time.time(), "push"))
+        prices._record(PriceQuote(USDC, 1.0, time.time(), "push"))
+        cache, api = quote_cache(prices=prices, slippage_bps=50)
+
+        await cache.get_quote(USDC, SOL, 10_000_000)
+        prices._record(PriceQuote(SOL, 150.5, time.time(), "push"))  # ~33 bps
+        await cache.get_quote(USDC, SOL, 10_000_000)
+        prices._record(PriceQuote(SOL, 153.0, time.time(), "push"))  # ~200 bps
+        await cache.get_quote(USDC, SOL, 10_000_000)
+        await cache.close()
+        await prices.close()
+
+        assert len(api.requests) == 2
+        assert cache.rejected["drift"] == 1
+
+    @pytest.mark.asyncio
+    async def test_tracked_pairs_are_prefetched(self):
+        cache, api = quote_cache(refresh_interval=0.02)
+        cache.track([(USDC, SOL, 300_000_000)])
+        await asyncio.sleep(0.05)
+
+        quote, _ = await cache.get_quote(USDC, SOL, 300_000_000)
+        await cache.close()
+
+        assert quote is not None
+        assert cache.hits == 1 and cache.misses == 0
+        assert cache.prefetches >= 1
+
+
+class TestExecutorQuotes:
+    @pytest.mark.asyncio
+    async def test_topup_uses_prefetched_quote(self):
+        cache, api = quote_cache()
+        executor = RebalanceExecutor("rpc", "key", "wallet", dry_run=False, quotes=cache)
+        swapped = []
+
+        async def fake_swap(quote, priority_fee):
+            swapped.append(quote)
+            return "sig", None, None
+
+        executor._execute_jupiter_swap = fake_swap
+        position = make_position(1.35)
+        executor.prefetch_quotes([(position, 499.5)])
+        await asyncio.sleep(0.05)
+
+        # Same bucket as the prefetched amount, and within slippage of it
+        result = await executor.execute_rebalance(
+            position, make_analysis(RebalanceStrategy.COLLATERAL_TOP_UP, amount=499.0)
+        )
+        await executor.close()
+
+        assert result.success
+        assert len(api.requests) == 1
+        assert swapped[0]["inAmount"] == api.requests[0]["amount"]
+        assert result.amount_usd == int(swapped[0]["inAmount"]) / 1e6
+
+    def test_dry_run_does_not_prefetch(self):
+        executor = RebalanceExecutor("rpc", "key", "wallet", dry_run=True)
+        executor.prefetch_quotes([(make_position(1.35), 500.0)])
+        assert executor.quotes.get_stats()["tracked"] == 0
@@ -0,0 +1,218 @@
+"""Tests for the reserve/bank metadata cache"""
+import asyncio
+import base64
+import os
+import struct
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from solders.pubkey import Pubkey
+
+from protocols.layouts import SOLEND_DEPOSIT
+from protocols.reserves import (
+    KAMINO_RESERVE,
+    KAMINO_RESERVE_ORACLES,
+    MARGINFI_BANK,
+    SOLEND_RESERVE,
+    ReserveCache,
+    decode_kamino_reserve,
+    decode_marginfi_bank,
+    decode_solend_reserve,
+)
+from protocols.solend import SolendAdapter
+
+USDC = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+
+
+def split(value: int) -> tuple[int, int]:
+    """u128 as its (lo, hi) u64 halves"""
+    return value % 2**64, value >> 64
+
+
+def kamino_reserve(ltv_pct: int = 80, lt_pct: int = 90) -> bytes:
+    return bytes(8) + KAMINO_RESERVE.compiled.pack(
+        1, 100, bytes(32), bytes(Pubkey.from_string(USDC)), 6, ltv_pct, lt_pct, 725, 10**18, 0,
+    )
+
+
+def solend_reserve(ltv_pct: int = 75, lt_pct: int = 80) -> bytes:
+    return SOLEND_RESERVE.compiled.pack(
+        1, 100, 0, bytes(32), bytes(Pubkey.from_string(USDC)), 6,
+        # available 600, borrowed 400 tokens -> 40% utilization
+        600, *split(400 * 10**18), *split(2 * 10**18),
+        80, ltv_pct, 5, lt_pct, 0, 8, 100,
+    )
+
+
+class FakeRpc:
+    """Serves reserve accounts for getMultipleAccounts and counts calls"""
+
+    def __init__(self, accounts: dict[str, bytes], slot: int = 1000):
+        self.accounts = accounts
+        self.slot = slot
+        self.calls: list[list[str]] = []
+
+    async def call(self, method: str, params: list):
+        assert method == "getMultipleAccounts"
+        keys = params[0]
+        self.calls.append(keys)
+        await asyncio.sleep(0)
+        return {
+            "context": {"slot": self.slot},
+            "value": [
+                {"data": [base64.b64encode(self.accounts[k]).decode(), "base64"]}
+                if k in self.accounts else None
+                for k in keys
+            ],
+        }
+
+
+class TestDecoders:
+    def test_kamino_reserve(self):
+        info = decode_kamino_reserve("R", kamino_reserve())
+        assert info.mint == USDC
+        assert info.symbol == "USDC"
+        assert info.decimals == 6
+        assert (info.ltv, info.liquidation_threshold) == (0.8, 0.9)
+        assert info.borrow_rate_apy == pytest.approx(0.0725)
+        assert info.borrow_index == pytest.approx(1.0)
+        # Accounts cut before the oracle keys leave them unknown
+        assert info.oracles is None
+
+    def test_kamino_reserve_oracles(self):
+        pyth, scope = Pubkey.new_unique(), Pubkey.new_unique()
+        data = kamino_reserve() + KAMINO_RESERVE_ORACLES.compiled.pack(
+            bytes(pyth), bytes(32), bytes(32), bytes(scope),
+        )
+        info = decode_kamino_reserve("R", data)
+        assert info.oracles == (str(pyth), None, None, str(scope))
+
+    def test_marginfi_bank_fixed_point(self):
+        one = 2 ** 48
+        data = MARGINFI_BANK.compiled.pack(
+            bytes(32), 9, bytes(32),
+            int(1.25 * one), 0, int(1.5 * one), 0,
+            int(0.7 * one), 0, int(0.8 * one), 0,
+        )
+        info = decode_marginfi_bank("B", data)
+        assert info.decimals == 9
+        assert info.supply_index == pytest.approx(1.25)
+        assert info.borrow_index == pytest.approx(1.5)
+        assert info.ltv == pytest.approx(0.7)
+        assert info.liquidation_threshold == pytest.approx(0.8)
+        assert info.borrow_rate_apy is None
+
+    def test_solend_reserve_rate_curve(self):
+        info = decode_solend_reserve("S", solend_reserve())
+        assert (info.ltv, info.liquidation_threshold) == (0.75, 0.8)
+        # 40% utilization is half way to the 80% optimum: 0% -> 8%
+        assert info.borrow_rate_apy == pytest.approx(0.04)
+        assert info.borrow_index == pytest.approx(2.0)
+
+    def test_short_account_is_ignored(self):
+        assert decode_solend_reserve("S", b"\x01" * 10) is None
+
+
+class TestReserveCache:
+    @pytest.mark.asyncio
+    async def test_bulk_load_and_hit(self):
+        keys = [str(Pubkey.new_unique()) for _ in range(150)]
+        rpc = FakeRpc({k: kamino_reserve() for k in keys})
+        cache = ReserveCache(rpc, decode_kamino_reserve)
+
+        await cache.load(keys)
+        assert sorted(len(c) for c in rpc.calls) == [50, 100]
+        assert cache.get(keys[0]).decimals == 6
+
+        await cache.load(keys)
+        assert len(rpc.calls) == 2
+        assert cache.get_stats()["reserves"] == 150
+
+    @pytest.mark.asyncio
+    async def test_concurrent_loads_share_request(self):
+        key = str(Pubkey.new_unique())
+        rpc = FakeRpc({key: kamino_reserve()})
+        cache = ReserveCache(rpc, decode_kamino_reserve)
+
+        await asyncio.gather(*(cache.load([key]) for _ in range(10)))
+        assert len(rpc.calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_ttl_and_slot_invalidation(self):
+        key = str(Pubkey.new_unique())
+        rpc = FakeRpc({key: kamino_reserve()}, slot=1000)
+        cache = ReserveCache(rpc, decode_kamino_reserve, ttl_seconds=60, max_slot_lag=10)
+        await cache.load([key])
+        assert cache.is_fresh(key)
+
+        cache.observe_slot(1011)
+        assert not cache.is_fresh(key)
+        # Stale entries keep serving until reloaded
+        assert cache.get(key) is not None
+
+        rpc.slot = 1011
+        await cache.load([key])
+        assert cache.is_fresh(key)
+        assert not cache.is_fresh(key, now=cache.get(key).fetched_at + 60)
+        assert len(rpc.calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_rpc_failure_keeps_last_good(self):
+        key = str(Pubkey.new_unique())
+        rpc = FakeRpc({key: kamino_reserve()})
+        cache = ReserveCache(rpc, decode_kamino_reserve, ttl_seconds=0)
+        await cache.load([key])
+
+        async def fail(method, params):
+            raise RuntimeError("rpc down")
+
+        rpc.call = fail
+        await cache.load([key])
+        assert cache.get(key).mint == USDC
+
+
+class TestAdapterUsesReserves:
+    @pytest.mark.asyncio
+    async def test_solend_parse_reads_reserve_parameters(self):
+        reserve = Pubkey.new_unique()
+        adapter = SolendAdapter("http://localhost")
+        adapter.reserves.rpc = FakeRpc({str(reserve): solend_reserve(lt_pct=80)})
+
+        data = bytearray(66) + struct.pack("<QQQQ", *split(1000 * 10**18), *split(500 * 10**18))
+        data += bytes(130 - len(data))
+        data.append(1)
+        data += SOLEND_DEPOSIT.compiled.pack(bytes(reserve), 3 * 10**6, 1000 * 10**6)
+        account = {"pubkey": "Obl1", "account": {"data": [base64.b64encode(bytes(data)).decode(), "base64"]}}
+
+        position = await adapter._parse_obligation("wallet", account)
+        await adapter.close()
+
+        collateral = position.collaterals[0]
+        assert collateral.symbol == "USDC"
+        assert collateral.amount == pytest.approx(3.0)
+        assert collateral.liquidation_threshold == 0.8
+        assert position.health_factor == pytest.approx(1.6)
+
+    @pytest.mark.asyncio
+    async def test_solend_health_factor_uses_reserve_thresholds(self):
+        reserve = Pubkey.new_unique()
+        adapter = SolendAdapter("http://localhost")
+        adapter.reserves.rpc = FakeRpc({str(reserve): solend_reserve(lt_pct=60)})
+
+        data = bytearray(66) + struct.pack("<QQQQ", *split(1000 * 10**18), *split(500 * 10**18))
+        data += bytes(130 - len(data))
+        data.append(1)
+        data += SOLEND_DEPOSIT.compiled.pack(bytes(reserve), 3 * 10**6, 1000 * 10**6)
+
+        async def account_data(key):
+            return bytes(data)
+
+        adapter._get_account_data = account_data
+        health_factor = await adapter.get_health_factor("Obl1")
+        await adapter.close()
+
+        # 1000 collateral at the reserve's 60% threshold over 500 debt
+        assert health_factor == pytest.approx(1.2)
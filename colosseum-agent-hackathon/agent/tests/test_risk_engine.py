@@ -0,0 +1,106 @@
+"""Tests for the vectorized Risk Engine"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from analyzer import ClaudeAnalyzer
+from protocols.base import (
+    CollateralPosition,
+    PositionData,
+    Protocol,
+    ProtocolAdapter,
+    RiskLevel,
+)
+from risk_engine import RiskEngine, apply_risk_levels
+
+
+def make_position(collateral: float, debt: float, key: str = "Obl") -> PositionData:
+    hf = collateral * 0.85 / debt if debt else float("inf")
+    return PositionData(
+        protocol=Protocol.KAMINO,
+        owner="Wallet",
+        obligation_key=key,
+        health_factor=hf,
+        total_collateral_usd=collateral,
+        total_debt_usd=debt,
+        net_value_usd=collateral - debt,
+        risk_level=RiskLevel.HEALTHY,
+        collaterals=[
+            CollateralPosition(
+                mint="SOL", symbol="SOL", amount=1, value_usd=collateral,
+                ltv=0.75, liquidation_threshold=0.85,
+            )
+        ],
+    )
+
+
+class TestRiskEngine:
+    def setup_method(self):
+        self.engine = RiskEngine()
+
+    def test_matches_scalar_classification(self):
+        rng = np.random.default_rng(3)
+        collateral = rng.uniform(0, 20_000, 5_000)
+        debt = rng.uniform(0, 15_000, 5_000)
+        debt[:100] = 0
+
+        scores = self.engine.score(collateral, debt)
+
+        classify = ProtocolAdapter.classify_risk
+        for i in range(len(debt)):
+            hf = collateral[i] * 0.85 / debt[i] if debt[i] > 0 else float("inf")
+            assert scores.health_factor[i] == pytest.approx(hf)
+            assert scores.risk_level(i) == classify(None, hf)
+
+    def test_boundaries_are_exclusive(self):
+        debt = np.full(3, 850.0)
+        # Health factors of exactly 1.05, 1.2 and 1.5
+        scores = self.engine.score(np.array([1050.0, 1200.0, 1500.0]), debt)
+        assert [scores.risk_level(i) for i in range(3)] == [
+            RiskLevel.CRITICAL, RiskLevel.WARNING, RiskLevel.HEALTHY,
+        ]
+
+    def test_rebalance_amounts_match_fallback(self):
+        analyzer = ClaudeAnalyzer(api_key="test-key")
+        positions = [make_position(10_000, d) for d in (8_500, 7_500, 6_000, 2_000)]
+
+        scores = self.engine.score_positions(positions)
+
+        for i, position in enumerate(positions):
+            fallback = analyzer._fallback_analysis(position)
+            assert scores.strategy(i) == fallback.strategy
+            assert scores.rebalance_usd[i] == pytest.approx(fallback.suggested_amount_usd)
+            assert scores.urgency[i] == pytest.approx(fallback.urgency_score)
+
+    def test_at_risk_sorted_by_severity(self):
+        positions = [
+            make_position(10_000, 2_000, "healthy"),
+            make_position(10_000, 6_000, "warning"),
+            make_position(10_000, 8_500, "emergency"),
+            make_position(10_000, 0, "no-debt"),
+        ]
+        scores = self.engine.score_positions(positions)
+        rows = scores.at_risk()
+        apply_risk_levels(positions, scores, rows)
+
+        assert [positions[r].obligation_key for r in rows] == ["emergency", "warning"]
+        assert positions[2].risk_level == RiskLevel.EMERGENCY
+        assert scores.counts() == {"emergency": 1, "critical": 0, "warning": 1, "healthy": 2}
+
+    def test_custom_thresholds(self):
+        engine = RiskEngine(warn=2.0, critical=1.5, emergency=1.1)
+        assert engine.classify(1.6) == RiskLevel.WARNING
+        assert engine.classify(float("inf")) == RiskLevel.HEALTHY
+        with pytest.raises(ValueError):
+            RiskEngine(warn=1.1, critical=1.2)
+
+    def test_scores_large_batch(self):
+        n = 100_000
+        scores = self.engine.score(np.full(n, 1000.0), np.linspace(1, 1000, n))
+        assert len(scores) == n
+        assert scores.codes.dtype == np.int8
+        assert scores.rebalance_usd.shape == (n,)
@@ -0,0 +1,106 @@
+"""Tests for the shared Solana RPC client"""
+import asyncio
+import base64
+import json
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from protocols.rpc import RpcError, SolanaRpcClient
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Answers every request with its id echoed into the result"""
+
+    def __init__(self, error_ids: tuple = ()):
+        self.bodies: list = []
+        self.error_ids = error_ids
+
+    def _reply(self, req: dict) -> dict:
+        if req["id"] in self.error_ids:
+            return {"jsonrpc": "2.0", "id": req["id"], "error": {"code": -32000, "message": "boom"}}
+        if req["method"] == "getAccountInfo":
+            data = base64.b64encode(b"obligation").decode()
+            return {"jsonrpc": "2.0", "id": req["id"], "result": {"value": {"data": [data, "base64"]}}}
+        return {"jsonrpc": "2.0", "id": req["id"], "result": {"echo": req["params"]}}
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        self.bodies.append(body)
+        if isinstance(body, list):
+            # Reply out of order to check id-based matching
+            payload = [self._reply(r) for r in reversed(body)]
+        else:
+            payload = self._reply(body)
+        return httpx.Response(200, json=payload)
+
+
+def make_client(transport: RecordingTransport, **kwargs) -> SolanaRpcClient:
+    return SolanaRpcClient("http://rpc.test", http2=False, transport=transport, **kwargs)
+
+
+class TestSolanaRpcClient:
+    @pytest.mark.asyncio
+    async def test_concurrent_calls_are_batched(self):
+        transport = RecordingTransport()
+        rpc = make_client(transport)
+        results = await asyncio.gather(*(rpc.call("getBalance", [f"k{i}"]) for i in range(5)))
+
+        assert [r["echo"] for r in results] == [[f"k{i}"] for i in range(5)]
+        assert len(transport.bodies) == 1
+        batch = transport.bodies[0]
+        assert isinstance(batch, list) and len(batch) == 5
+        assert len({req["id"] for req in batch}) == 5
+        await rpc.close()
+
+    @pytest.mark.asyncio
+    async def test_max_batch_size_splits_posts(self):
+        transport = RecordingTransport()
+        rpc = make_client(transport, max_batch_size=3)
+        await asyncio.gather(*(rpc.call("getBalance", [i]) for i in range(7)))
+        assert rpc.http_posts == 3
+        assert rpc.requests_sent == 7
+        await rpc.close()
+
+    @pytest.mark.asyncio
+    async def test_single_call_is_not_wrapped(self):
+        transport = RecordingTransport()
+        rpc = make_client(transport)
+        data = await rpc.get_account_info("Obligation1111")
+        assert data == b"obligation"
+        assert isinstance(transport.bodies[0], dict)
+        await rpc.close()
+
+    @pytest.mark.asyncio
+    async def test_error_is_scoped_to_its_request(self):
+        transport = RecordingTransport(error_ids=(2,))
+        rpc = make_client(transport)
+        results = await asyncio.gather(
+            rpc.call("getBalance", ["a"]),
+            rpc.call("getBalance", ["b"]),
+            return_exceptions=True,
+        )
+        assert results[0]["echo"] == ["a"]
+        assert isinstance(results[1], RpcError)
+        await rpc.close()
+
+    @pytest.mark.asyncio
+    async def test_program_scans_bypass_batching(self):
+        transport = RecordingTransport()
+        rpc = make_client(transport)
+        await asyncio.gather(
+            rpc.call("getProgramAccounts", ["prog", {}]),
+            rpc.call("getBalance", ["a"]),
+            rpc.call("getBalance", ["b"]),
+        )
+        shapes = sorted(type(b).__name__ for b in transport.bodies)
+        assert shapes == ["dict", "list"]
+        await rpc.close()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,90 @@
+"""Tests for the urgency-ordered re-check scheduler"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from protocols.base import CollateralPosition, PositionData, Protocol, RiskLevel
+from protocols.pricing import PriceService
+from scheduler import RecheckScheduler
+
+SOL = "So11111111111111111111111111111111111111112"
+
+
+def make_position(key: str, health_factor: float, mint: str = SOL) -> PositionData:
+    return PositionData(
+        protocol=Protocol.KAMINO,
+        owner="wallet",
+        obligation_key=key,
+        health_factor=health_factor,
+        total_collateral_usd=1000,
+        total_debt_usd=1000 * 0.85 / health_factor,
+        net_value_usd=0,
+        risk_level=RiskLevel.HEALTHY,
+        collaterals=[CollateralPosition(mint, "SOL", 10, 1000, 0.75, 0.85)],
+    )
+
+
+class TestDistanceToLiquidation:
+    def test_distance_follows_health_factor(self):
+        assert make_position("a", 2.0).distance_to_liquidation_pct == pytest.approx(50)
+        assert make_position("b", 0.9).distance_to_liquidation_pct == 0.0
+
+    def test_no_debt_is_fully_safe(self):
+        position = make_position("a", 2.0)
+        position.total_debt_usd = 0
+        assert position.distance_to_liquidation_pct == 100.0
+
+
+class TestRecheckScheduler:
+    def test_interval_shrinks_near_liquidation(self):
+        scheduler = RecheckScheduler(min_interval=2, max_interval=300)
+        near = scheduler.interval_for(make_position("a", 1.06))
+        mid = scheduler.interval_for(make_position("b", 1.5))
+        whale = scheduler.interval_for(make_position("c", 5.0))
+
+        assert 2 <= near < 10
+        assert near < mid < whale
+        assert whale == 300
+
+    def test_volatility_shortens_interval(self):
+        prices = PriceService()
+        scheduler = RecheckScheduler(prices=prices)
+        calm = scheduler.interval_for(make_position("a", 1.5))
+
+        prices.push(SOL, 100.0, timestamp=time.time() - 60)
+        prices.push(SOL, 90.0)
+        assert prices.volatility_pct(SOL) == pytest.approx(100 / 9)
+        assert scheduler.interval_for(make_position("a", 1.5)) < calm
+
+    def test_pop_due_in_order_and_skips_superseded(self):
+        scheduler = RecheckScheduler(min_interval=1, max_interval=100)
+        scheduler.schedule(make_position("healthy", 5.0), now=0)
+        scheduler.schedule(make_position("risky", 1.1), now=0)
+        scheduler.schedule(make_position("middle", 1.4), now=0)
+        # Rescheduling supersedes the earlier heap entry
+        scheduler.schedule(make_position("middle", 5.0), now=0)
+
+        assert [c.obligation_key for c in scheduler.pop_due(now=100)] == ["risky", "healthy", "middle"]
+        assert len(scheduler) == 0
+        assert scheduler.next_due() is None
+
+    def test_replace_drops_missing_positions(self):
+        scheduler = RecheckScheduler()
+        scheduler.replace([make_position("a", 2.0), make_position("b", 2.0)], now=0)
+        scheduler.replace([make_position("b", 2.0)], now=0)
+
+        assert "a" not in scheduler
+        assert [c.obligation_key for c in scheduler.pop_due(now=1000)] == ["b"]
+
+    def test_reschedule_keeps_interval(self):
+        scheduler = RecheckScheduler()
+        check = scheduler.schedule(make_position("a", 1.2), now=0)
+        (due,) = scheduler.pop_due(now=check.due_at)
+
+        again = scheduler.reschedule(due, now=check.due_at)
+        assert again.due_at == pytest.approx(2 * check.due_at)
+
@@ -0,0 +1,267 @@
+"""Tests for the WebSocket account streamer"""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from protocols.base import PositionData, Protocol, ProtocolAdapter, RiskLevel
+from streaming import AccountStreamer
+
+
+class StubAdapter(ProtocolAdapter):
+    """Parses any account into a position whose HF is stored in the data field"""
+
+    program_id = "StubProgram1111"
+
+    def owner_filters(self, wallet_address: str) -> list[dict]:
+        return [{"memcmp": {"offset": 8, "bytes": wallet_address}}]
+
+    def __init__(self):
+        super().__init__()
+        self.refreshed: list[list[tuple[str, str]]] = []
+
+    async def get_protocol_name(self) -> str:
+        return "stub"
+
+    async def get_positions(self, wallet_address: str) -> list[PositionData]:
+        return []
+
+    async def get_health_factor(self, obligation_key: str) -> float:
+        return 0.0
+
+    def market_filters(self) -> list[dict]:
+        return []
+
+    def _build_position(self, wallet_address, obligation_key, obligation):
+        return None
+
+    async def _parse_account(self, wallet_address: str, account: dict):
+        hf = float(account["account"]["data"][0])
+        return PositionData(
+            protocol=Protocol.SOLEND,
+            owner=wallet_address,
+            obligation_key=account["pubkey"],
+            health_factor=hf,
+            total_collateral_usd=1000,
+            total_debt_usd=500,
+            net_value_usd=500,
+            risk_level=self.classify_risk(hf),
+        )
+
+    async def refresh_obligations(self, pairs):
+        self.refreshed.append(pairs)
+        return [
+            await self._parse_account(w, {"pubkey": k, "account": {"data": ["1.1", "base64"]}})
+            for w, k in pairs
+        ]
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent: list[dict] = []
+
+    async def send(self, message: str):
+        self.sent.append(json.loads(message))
+
+    async def close(self):
+        pass
+
+
+class FakeRpc:
+    def __init__(self, slot: int):
+        self.slot = slot
+
+    async def call(self, method: str, params: list):
+        assert method == "getSlot"
+        return self.slot
+
+
+def notification(sub_id: int, slot: int, hf: str, value: bool = True) -> str:
+    return json.dumps({
+        "jsonrpc": "2.0",
+        "method": "accountNotification",
+        "params": {
+            "subscription": sub_id,
+            "result": {
+                "context": {"slot": slot},
+                "value": {"data": [hf, "base64"]} if value else None,
+            },
+        },
+    })
+
+
+def make_streamer(adapter: StubAdapter, rpc=None):
+    updates: list[PositionData] = []
+
+    async def on_update(position: PositionData):
+        updates.append(position)
+
+    streamer = AccountStreamer("ws://test", [adapter], rpc or FakeRpc(0), on_update)
+    streamer._ws = FakeWebSocket()
+    return streamer, updates
+
+
+async def subscribe(streamer: AccountStreamer, key: str, sub_id: int):
+    await streamer.track(0, "wallet1", key)
+    request = streamer._ws.sent[-1]
+    assert request["method"] == "accountSubscribe"
+    await streamer._handle_message(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": sub_id}))
+
+
+class TestAccountStreamer:
+    @pytest.mark.asyncio
+    async def test_notification_is_parsed_and_scored(self):
+        adapter = StubAdapter()
+        streamer, updates = make_streamer(adapter)
+        await subscribe(streamer, "Obligation1", 42)
+
+        await streamer._handle_message(notification(42, 100, "1.1"))
+
+        assert len(updates) == 1
+        assert updates[0].obligation_key == "Obligation1"
+        assert updates[0].risk_level == RiskLevel.CRITICAL
+        assert streamer.last_slot == 100
+
+    @pytest.mark.asyncio
+    async def test_out_of_order_notifications_are_dropped(self):
+        adapter = StubAdapter()
+        streamer, updates = make_streamer(adapter)
+        await subscribe(streamer, "Obligation1", 7)
+
+        await streamer._handle_message(notification(7, 200, "1.3"))
+        await streamer._handle_message(notification(7, 150, "2.0"))
+        assert [u.health_factor for u in updates] == [1.3]
+
+    @pytest.mark.asyncio
+    async def test_second_write_in_same_slot_is_applied(self):
+        adapter = StubAdapter()
+        streamer, updates = make_streamer(adapter)
+        await subscribe(streamer, "Obligation1", 7)
+
+        await streamer._handle_message(notification(7, 200, "1.3"))
+        await streamer._handle_message(notification(7, 200, "1.1"))
+        await streamer._handle_message(notification(7, 200, "1.1"))
+        assert [u.health_factor for u in updates] == [1.3, 1.1]
+
+    @pytest.mark.asyncio
+    async def test_closed_account_is_unsubscribed(self):
+        adapter = StubAdapter()
+        adapter.tracker.record_discovery("wallet1", ["Obligation1"])
+        streamer, updates = make_streamer(adapter)
+        await subscribe(streamer, "Obligation1", 9)
+
+        await streamer._handle_message(notification(9, 10, "", value=False))
+
+        assert updates == []
+        assert streamer._ws.sent[-1] == {
+            "jsonrpc": "2.0", "id": 2, "method": "accountUnsubscribe", "params": [9],
+        }
+        assert adapter.tracker.all_pairs() == []
+
+    @pytest.mark.asyncio
+    async def test_sync_follows_tracker(self):
+        adapter = StubAdapter()
+        adapter.tracker.record_discovery("wallet1", ["A", "B"])
+        streamer, _ = make_streamer(adapter)
+
+        await streamer.sync_from_trackers()
+        keys = sorted(m["params"][0] for m in streamer._ws.sent)
+        assert keys == ["A", "B"]
+
+        adapter.tracker.record_discovery("wallet1", ["B"])
+        await streamer.sync_from_trackers()
+        assert sorted(streamer._tracked) == ["B"]
+
+    @pytest.mark.asyncio
+    async def test_reconnect_resubscribes_and_backfills_slot_gap(self):
+        adapter = StubAdapter()
+        streamer, updates = make_streamer(adapter, rpc=FakeRpc(500))
+        await subscribe(streamer, "Obligation1", 1)
+        await streamer._handle_message(notification(1, 100, "1.4"))
+
+        # Simulate a dropped connection followed by reconnect
+        streamer._ws = FakeWebSocket()
+        streamer._subscriptions.clear()
+        await streamer._on_connected()
+
+        assert streamer._ws.sent[0]["method"] == "accountSubscribe"
+        assert adapter.refreshed == [[("wallet1", "Obligation1")]]
+        assert updates[-1].health_factor == 1.1
+        assert streamer.last_slot == 500
+
+        # The first notification in the backfilled slot is still applied
+        streamer._subscriptions[2] = "Obligation1"
+        await streamer._handle_message(notification(2, 500, "1.05"))
+        assert updates[-1].health_factor == 1.05
+
+    @pytest.mark.asyncio
+    async def test_small_slot_gap_skips_backfill(self):
+        adapter = StubAdapter()
+        streamer, _ = make_streamer(adapter, rpc=FakeRpc(101))
+        await subscribe(streamer, "Obligation1", 1)
+        await streamer._handle_message(notification(1, 100, "1.4"))
+
+        streamer._ws = FakeWebSocket()
+        await streamer._on_connected()
+        assert adapter.refreshed == []
+
+    @pytest.mark.asyncio
+    async def test_program_subscription_uses_owner_filters(self):
+        adapter = StubAdapter()
+        streamer, _ = make_streamer(adapter)
+        await streamer.watch_wallets(["wallet1"])
+
+        request = streamer._ws.sent[-1]
+        assert request["method"] == "programSubscribe"
+        assert request["params"][0] == "StubProgram1111"
+        assert request["params"][1]["filters"] == adapter.owner_filters("wallet1")
+
+    @pytest.mark.asyncio
+    async def test_new_obligation_is_discovered_and_tracked(self):
+        adapter = StubAdapter()
+        streamer, updates = make_streamer(adapter)
+        await streamer.watch_wallets(["wallet1"])
+        request = streamer._ws.sent[-1]
+        await streamer._handle_message(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": 77}))
+
+        await streamer._handle_message(json.dumps({
+            "jsonrpc": "2.0",
+            "method": "programNotification",
+            "params": {
+                "subscription": 77,
+                "result": {
+                    "context": {"slot": 300},
+                    "value": {"pubkey": "NewObligation", "account": {"data": ["1.3", "base64"]}},
+                },
+            },
+        }))
+
+        assert adapter.tracker.all_pairs() == [("wallet1", "NewObligation")]
+        assert "NewObligation" in streamer._tracked
+        assert streamer._ws.sent[-1]["method"] == "accountSubscribe"
+        assert [u.obligation_key for u in updates] == ["NewObligation"]
+        assert streamer.discovered == 1
+
+        # The matching accountNotification for the same write is deduplicated
+        streamer._subscriptions[5] = "NewObligation"
+        await streamer._handle_message(notification(5, 300, "1.3"))
+        assert len(updates) == 1
+
+    @pytest.mark.asyncio
+    async def test_unwatched_wallet_is_unsubscribed(self):
+        adapter = StubAdapter()
+        streamer, _ = make_streamer(adapter)
+        await streamer.watch_wallets(["wallet1"])
+        request = streamer._ws.sent[-1]
+        await streamer._handle_message(json.dumps({"jsonrpc": "2.0", "id": request["id"], "result": 12}))
+
+        await streamer.watch_wallets([])
+        assert streamer._ws.sent[-1]["method"] == "programUnsubscribe"
+        assert streamer._ws.sent[-1]["params"] == [12]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
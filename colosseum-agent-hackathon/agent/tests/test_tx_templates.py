@@ -0,0 +1,330 @@
+"""Tests for prepared repay transaction templates"""
+import asyncio
+import base64
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from solders.hash import Hash
+from solders.pubkey import Pubkey
+from solders.sysvar import INSTRUCTIONS
+from solders.transaction import Transaction
+
+from analyzer import RebalanceStrategy
+from executor import RebalanceExecutor
+from protocols.base import DebtPosition, Protocol
+from protocols.reserves import ReserveInfo
+from tests.test_executor import make_analysis, make_position
+from tx_templates import (
+    AMOUNT,
+    TOKEN_PROGRAM,
+    RepayAccounts,
+    TemplateCache,
+    anchor_discriminator,
+    associated_token_address,
+    kamino_repay,
+)
+
+USDC = "EPjFWdd5AufqSSqeM2qN1xzybapC8G4wEGGkZwyTDt1v"
+PAYER = str(Pubkey.new_unique())
+PROGRAM = str(Pubkey.new_unique())
+RESERVE = str(Pubkey.new_unique())
+SOL_RESERVE = str(Pubkey.new_unique())
+COLLATERAL_RESERVE = str(Pubkey.new_unique())
+MARKET = str(Pubkey.new_unique())
+PYTH = str(Pubkey.new_unique())
+SCOPE = str(Pubkey.new_unique())
+
+# Accounts of the klend instructions a repay template uses, from the klend
+# IDL: (name, writable, signer), optional accounts marked "?"
+KLEND_IDL = {
+    "refresh_reserve": [
+        ("reserve", True, False),
+        ("lending_market", False, False),
+        ("pyth_oracle?", False, False),
+        ("switchboard_price_oracle?", False, False),
+        ("switchboard_twap_oracle?", False, False),
+        ("scope_prices?", False, False),
+    ],
+    "refresh_obligation": [
+        ("lending_market", False, False),
+        ("obligation", True, False),
+    ],
+    "repay_obligation_liquidity": [
+        ("owner", False, True),
+        ("obligation", True, False),
+        ("lending_market", False, False),
+        ("repay_reserve", True, False),
+        ("reserve_liquidity_mint", False, False),
+        ("reserve_destination_liquidity", True, False),
+        ("user_source_liquidity", True, False),
+        ("token_program", False, False),
+        ("instruction_sysvar_account", False, False),
+    ],
+}
+
+
+class FakeReserves:
+    def __init__(self, *infos: ReserveInfo):
+        self.entries = {info.key: info for info in infos}
+
+    def get(self, key: str):
+        return self.entries.get(key)
+
+
+class FakeRpc:
+    """Answers getLatestBlockhash with a new hash on every call"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def call(self, method: str, params: list):
+        assert method == "getLatestBlockhash"
+        self.calls += 1
+        await asyncio.sleep(0.01)
+        return {"value": {"blockhash": str(Hash(bytes([self.calls]) * 32))}}
+
+
+def reserve(key: str = RESERVE, mint: str = USDC, decimals: int = 6) -> ReserveInfo:
+    return ReserveInfo(
+        key=key, mint=mint, decimals=decimals, ltv=0.8,
+        liquidation_threshold=0.85, market=MARKET, oracles=(PYTH, None, None, SCOPE),
+    )
+
+
+def template_cache(**kwargs) -> tuple[TemplateCache, FakeRpc]:
+    rpc = FakeRpc()
+    adapter = SimpleNamespace(
+        protocol=Protocol.KAMINO,
+        program_id=PROGRAM,
+        reserves=FakeReserves(
+            reserve(),
+            reserve(SOL_RESERVE, "So11111111111111111111111111111111111111112", 9),
+            reserve(COLLATERAL_RESERVE, "So11111111111111111111111111111111111111112", 9),
+        ),
+    )
+    return TemplateCache(rpc, PAYER, [adapter], **kwargs), rpc
+
+
+def critical_position(health_factor: float = 1.1):
+    position = make_position(health_factor)
+    position.obligation_key = str(Pubkey.new_unique())
+    position.collaterals[0].reserve = COLLATERAL_RESERVE
+    position.debts[0].reserve = RESERVE
+    return position
+
+
+def decode(rendered: str) -> Transaction:
+    return Transaction.from_bytes(base64.b64decode(rendered))
+
+
+class TestTemplate:
+    @pytest.mark.asyncio
+    async def test_render_patches_amount_and_blockhash(self):
+        cache, _ = template_cache(compute_units=300_000)
+        position = critical_position()
+        cache.prepare([position])
+        template = cache.get(position.obligation_key)
+        blockhash = Hash(b"\x07" * 32)
+
+        tx = decode(template.render(1_234_567, blockhash))
+
+        assert tx.message.recent_blockhash == blockhash
+        assert str(tx.message.account_keys[0]) == PAYER
+        repay = tx.message.instructions[-1]
+        assert repay.data[:8] == anchor_discriminator("repay_obligation_liquidity")
+        assert AMOUNT.unpack_from(repay.data, 8)[0] == 1_234_567
+        # compute limit, compute price, refresh both reserves, refresh obligation, repay
+        assert len(tx.message.instructions) == 6
+        # The prepared bytes are left untouched for the next send
+        assert decode(template.render(1, blockhash)).message.instructions[-1].data[8:] == AMOUNT.pack(1)
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_repay_amount_is_capped_at_the_debt(self):
+        cache, _ = template_cache()
+        position = critical_position()
+        cache.prepare([position])
+        template = cache.get(position.obligation_key)
+
+        assert template.repay_amount(position) == (3_800_000_000, 3800)
+        assert template.repay_amount(position, 950) == (950_000_000, 950)
+        assert template.repay_amount(position, 10_000) == (3_800_000_000, 3800)
+        position.debts = []
+        assert template.repay_amount(position) == (0, 0.0)
+        await cache.close()
+
+    def test_kamino_accounts_follow_the_idl(self):
+        program, payer, obligation = Pubkey.from_string(PROGRAM), Pubkey.from_string(PAYER), Pubkey.new_unique()
+        market, usdc = Pubkey.from_string(MARKET), Pubkey.from_string(USDC)
+        debt_reserve, collateral = Pubkey.from_string(RESERVE), Pubkey.from_string(COLLATERAL_RESERVE)
+        pyth, scope = Pubkey.from_string(PYTH), Pubkey.from_string(SCOPE)
+        accounts = RepayAccounts(
+            program=program, payer=payer, obligation=obligation, reserve=debt_reserve,
+            market=market, mint=usdc,
+            deposit_reserves=[collateral], borrow_reserves=[debt_reserve],
+            oracles={collateral: (pyth, None, None, scope), debt_reserve: (None, None, None, scope)},
+        )
+
+        instructions = kamino_repay(accounts)
+
+        names = [
+            next(n for n in KLEND_IDL if ix.data[:8] == anchor_discriminator(n))
+            for ix in instructions
+        ]
+        # Every reserve and then the obligation are refreshed ahead of the repay
+        assert names == ["refresh_reserve", "refresh_reserve", "refresh_obligation", "repay_obligation_liquidity"]
+        for name, ix in zip(names, instructions):
+            assert ix.program_id == program
+            expected = KLEND_IDL[name]
+            assert [(m.is_writable, m.is_signer) for m in ix.accounts[:len(expected)]] == [
+                (writable, signer) for _, writable, signer in expected
+            ]
+
+        refresh_collateral, refresh_debt, refresh_obligation, repay = instructions
+        assert [m.pubkey for m in refresh_collateral.accounts] == [collateral, market, pyth, program, program, scope]
+        assert [m.pubkey for m in refresh_debt.accounts] == [debt_reserve, market, program, program, program, scope]
+        # Deposit reserves, then borrow reserves, follow as read-only remaining accounts
+        assert [(m.pubkey, m.is_writable) for m in refresh_obligation.accounts] == [
+            (market, False), (obligation, True), (collateral, False), (debt_reserve, False),
+        ]
+        supply = Pubkey.find_program_address([b"reserve_liq_supply", bytes(market), bytes(usdc)], program)[0]
+        assert [m.pubkey for m in repay.accounts] == [
+            payer, obligation, market, debt_reserve, usdc,
+            supply, associated_token_address(payer, usdc), TOKEN_PROGRAM, INSTRUCTIONS,
+        ]
+
+
+class TestTemplateCache:
+    @pytest.mark.asyncio
+    async def test_built_once_and_rebuilt_when_largest_debt_changes(self):
+        cache, _ = template_cache()
+        position = critical_position()
+        cache.prepare([position])
+        first = cache.get(position.obligation_key)
+        cache.prepare([position])
+        assert cache.get(position.obligation_key) is first
+
+        position.debts.append(DebtPosition(
+            mint="So11111111111111111111111111111111111111112", symbol="SOL",
+            amount=50, value_usd=5000, borrow_rate_apy=0.05, reserve=SOL_RESERVE,
+        ))
+        cache.prepare([position])
+        rebuilt = cache.get(position.obligation_key)
+        assert rebuilt.debt_mint == "So11111111111111111111111111111111111111112"
+        assert rebuilt.decimals == 9
+        assert cache.get_stats()["built"] == 2
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_unresolvable_positions_are_skipped(self):
+        cache, _ = template_cache()
+        unknown_reserve = critical_position()
+        unknown_reserve.debts[0].reserve = str(Pubkey.new_unique())
+        solend = critical_position()
+        solend.protocol = Protocol.SOLEND
+        bad_key = critical_position()
+        bad_key.obligation_key = "not-a-pubkey"
+        # klend refreshes every reserve, so an unknown collateral reserve
+        # or one without oracles cannot be repaid from a template either
+        unknown_collateral = critical_position()
+        unknown_collateral.collaterals[0].reserve = str(Pubkey.new_unique())
+        no_oracles = critical_position()
+        no_oracles.collaterals[0].reserve = SOL_RESERVE
+        cache.adapters[Protocol.KAMINO].reserves.entries[SOL_RESERVE].oracles = None
+
+        cache.prepare([unknown_reserve, solend, bad_key, unknown_collateral, no_oracles])
+
+        assert cache.get_stats()["templates"] == 0
+        assert cache.get_stats()["build_errors"] == 1
+        assert TemplateCache(FakeRpc(), "test-wallet", []).payer is None
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_templates_not_prepared_again_expire(self):
+        cache, _ = template_cache(ttl_seconds=0.02)
+        stale, live = critical_position(), critical_position()
+        cache.prepare([stale, live])
+        await asyncio.sleep(0.03)
+        cache.prepare([live])
+
+        assert cache.get(stale.obligation_key) is None
+        assert cache.get(live.obligation_key) is not None
+        await cache.close()
+
+    @pytest.mark.asyncio
+    async def test_prepare_warms_the_blockhash(self):
+        cache, rpc = template_cache(blockhash_max_age=0.05)
+        cache.prepare([critical_position()])
+        await asyncio.sleep(0.02)
+
+        hashes = await asyncio.gather(cache.blockhash(), cache.blockhash())
+        assert rpc.calls == 1
+        assert hashes[0] == hashes[1] == Hash(b"\x01" * 32)
+
+        await asyncio.sleep(0.06)
+        assert await cache.blockhash() == Hash(b"\x02" * 32)
+        assert rpc.calls == 2
+        await cache.close()
+
+
+class TestExecutorTemplates:
+    @pytest.mark.asyncio
+    async def test_emergency_unwind_sends_patched_template(self):
+        cache, _ = template_cache()
+        executor = RebalanceExecutor("http://rpc", "key", PAYER, dry_run=False, templates=cache)
+        position = critical_position()
+        executor.prepare_templates([position])
+
+        sent = []
+
+        async def sign_and_send(transaction_base64):
+            sent.append(transaction_base64)
+            return "sig"
+
+        executor._sign_and_send = sign_and_send
+        position.health_factor = 1.02
+        result = await executor.execute_rebalance(
+            position, make_analysis(RebalanceStrategy.EMERGENCY_UNWIND)
+        )
+
+        assert result.success and result.tx_signature == "sig"
+        assert result.amount_usd == 3800
+        repay = decode(sent[0]).message.instructions[-1]
+        assert AMOUNT.unpack_from(repay.data, 8)[0] == 3_800_000_000
+        await executor.close()
+
+    @pytest.mark.asyncio
+    async def test_partial_repayment_uses_suggested_amount(self):
+        cache, _ = template_cache()
+        executor = RebalanceExecutor("http://rpc", "key", PAYER, dry_run=False, templates=cache)
+        position = critical_position()
+        executor.prepare_templates([position])
+
+        sent = []
+
+        async def sign_and_send(transaction_base64):
+            sent.append(transaction_base64)
+            return "sig"
+
+        executor._sign_and_send = sign_and_send
+        result = await executor.execute_rebalance(position, make_analysis(amount=500))
+
+        assert result.amount_usd == 500
+        repay = decode(sent[0]).message.instructions[-1]
+        assert AMOUNT.unpack_from(repay.data, 8)[0] == 500_000_000
+        await executor.close()
+
+    @pytest.mark.asyncio
+    async def test_dry_run_prepares_nothing(self):
+        cache, rpc = template_cache()
+        executor = RebalanceExecutor("http://rpc", "key", PAYER, dry_run=True, templates=cache)
+        executor.prepare_templates([critical_position()])
+
+        assert cache.get_stats()["templates"] == 0
+        assert rpc.calls == 0
+        await executor.close()
@@ -0,0 +1,424 @@
+"""Transaction Templates — Repay transactions prepared before they are needed
+
+Building a protocol transaction means resolving the reserve, market, vault
+and token accounts, setting a compute budget and compiling the message.
+For positions already at CRITICAL risk that work is done ahead of time, so
+when one crosses into EMERGENCY only the amount, a recent blockhash and the
+compute unit price are patched into the prepared bytes before the wallet
+signs and sends them.
+"""
+import asyncio
+import base64
+import hashlib
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Iterable, Optional
+
+import structlog
+from solders.compute_budget import set_compute_unit_limit, set_compute_unit_price
+from solders.hash import Hash
+from solders.instruction import AccountMeta, Instruction
+from solders.message import Message
+from solders.pubkey import Pubkey
+from solders.sysvar import INSTRUCTIONS
+from solders.transaction import Transaction
+
+from protocols.base import DebtPosition, PositionData, Protocol
+from protocols.rpc import SolanaRpcClient
+
+logger = structlog.get_logger()
+
+TOKEN_PROGRAM = Pubkey.from_string("TokenkegQfeZyiNwAJbNbGKPFXCWuBvf9Ss623VQ5DA")
+ASSOCIATED_TOKEN_PROGRAM = Pubkey.from_string("ATokenGPvbdGVxr1b2hvZbsiqW5xWH25efTNsLJA8knL")
+
+# Compiled into every template and overwritten at send time; each must
+# occur exactly once in the serialized transaction
+AMOUNT = struct.Struct("<Q")
+AMOUNT_PLACEHOLDER = bytes.fromhex("a55ac33c9669f00f")
+PRICE_PLACEHOLDER = bytes.fromhex("5ac3a5f00f96693c")
+BLOCKHASH_PLACEHOLDER = Hash(bytes(range(0xA0, 0xC0)))
+
+
+def anchor_discriminator(name: str) -> bytes:
+    """First 8 bytes of sha256("global:<name>"), Anchor's instruction tag"""
+    return hashlib.sha256(f"global:{name}".encode()).digest()[:8]
+
+
+def associated_token_address(owner: Pubkey, mint: Pubkey) -> Pubkey:
+    return Pubkey.find_program_address(
+        [bytes(owner), bytes(TOKEN_PROGRAM), bytes(mint)], ASSOCIATED_TOKEN_PROGRAM
+    )[0]
+
+
+@dataclass
+class RepayAccounts:
+    """Everything a protocol needs to address a repay of one debt"""
+    program: Pubkey
+    payer: Pubkey  # Signs, and repays from its associated token account
+    obligation: Pubkey
+    reserve: Pubkey  # Reserve (Kamino) or bank (MarginFi)
+    market: Pubkey  # Lending market (Kamino) or group (MarginFi)
+    mint: Pubkey
+    # The obligation's reserves in account order, deposits then borrows,
+    # each with its (pyth, switchboard price, switchboard twap, scope)
+    # oracles; Kamino refreshes them all ahead of the repay
+    deposit_reserves: list[Pubkey] = field(default_factory=list)
+    borrow_reserves: list[Pubkey] = field(default_factory=list)
+    oracles: dict[Pubkey, tuple[Optional[Pubkey], ...]] = field(default_factory=dict)
+
+
+def kamino_refresh_reserve(a: RepayAccounts, reserve: Pubkey) -> Instruction:
+    """klend refresh_reserve; unset optional oracles are passed as the program id"""
+    oracles = a.oracles.get(reserve) or (None,) * 4
+    return Instruction(
+        a.program,
+        anchor_discriminator("refresh_reserve"),
+        [
+            AccountMeta(reserve, False, True),
+            AccountMeta(a.market, False, False),
+        ] + [AccountMeta(oracle or a.program, False, False) for oracle in oracles],
+    )
+
+
+def kamino_refresh_obligation(a: RepayAccounts) -> Instruction:
+    """klend refresh_obligation; the obligation's reserves follow as remaining accounts"""
+    return Instruction(
+        a.program,
+        anchor_discriminator("refresh_obligation"),
+        [
+            AccountMeta(a.market, False, False),
+            AccountMeta(a.obligation, False, True),
+        ] + [
+            AccountMeta(reserve, False, False)
+            for reserve in a.deposit_reserves + a.borrow_reserves
+        ],
+    )
+
+
+def kamino_repay(a: RepayAccounts) -> list[Instruction]:
+    """
+    klend repay_obligation_liquidity, after the refreshes klend requires.
+
+    Every reserve of the obligation is refreshed, the repay reserve last,
+    then the obligation, immediately ahead of the repay. The reserve's
+    supply vault is a PDA of (market, mint).
+    """
+    supply = Pubkey.find_program_address(
+        [b"reserve_liq_supply", bytes(a.market), bytes(a.mint)], a.program
+    )[0]
+    others = dict.fromkeys(r for r in a.deposit_reserves + a.borrow_reserves if r != a.reserve)
+    repay = Instruction(
+        a.program,
+        anchor_discriminator("repay_obligation_liquidity") + AMOUNT_PLACEHOLDER,
+        [
+            AccountMeta(a.payer, True, False),
+            AccountMeta(a.obligation, False, True),
+            AccountMeta(a.market, False, False),
+            AccountMeta(a.reserve, False, True),
+            AccountMeta(a.mint, False, False),
+            AccountMeta(supply, False, True),
+            AccountMeta(associated_token_address(a.payer, a.mint), False, True),
+            AccountMeta(TOKEN_PROGRAM, False, False),
+            AccountMeta(INSTRUCTIONS, False, False),
+        ],
+    )
+    return [kamino_refresh_reserve(a, r) for r in others] + [
+        kamino_refresh_reserve(a, a.reserve),
+        kamino_refresh_obligation(a),
+        repay,
+    ]
+
+
+def marginfi_repay(a: RepayAccounts) -> list[Instruction]:
+    """marginfi-v2 lending_account_repay; the bank's liquidity vault is a PDA of the bank"""
+    vault = Pubkey.find_program_address([b"liquidity_vault", bytes(a.reserve)], a.program)[0]
+    repay = Instruction(
+        a.program,
+        # amount, then repay_all: Option<bool> = None
+        anchor_discriminator("lending_account_repay") + AMOUNT_PLACEHOLDER + b"\x00",
+        [
+            AccountMeta(a.market, False, False),
+            AccountMeta(a.obligation, False, True),
+            AccountMeta(a.payer, True, False),
+            AccountMeta(a.reserve, False, True),
+            AccountMeta(associated_token_address(a.payer, a.mint), False, True),
+            AccountMeta(vault, False, True),
+            AccountMeta(TOKEN_PROGRAM, False, False),
+        ],
+    )
+    return [repay]
+
+
+# Instructions for a repay, the repay itself last. Solend borrows are not
+# decoded yet, so there is no debt reserve to address
+REPAY_BUILDERS: dict[Protocol, Callable[[RepayAccounts], list[Instruction]]] = {
+    Protocol.KAMINO: kamino_repay,
+    Protocol.MARGINFI: marginfi_repay,
+}
+
+
+def _find_once(wire: bytes, needle: bytes, what: str) -> int:
+    offset = wire.find(needle)
+    if offset < 0 or wire.find(needle, offset + 1) >= 0:
+        raise ValueError(f"{what} placeholder must occur exactly once")
+    return offset
+
+
+@dataclass
+class TransactionTemplate:
+    """An unsigned repay transaction with the amount, blockhash and price left open"""
+    obligation_key: str
+    protocol: Protocol
+    debt_mint: str
+    decimals: int
+    # Reserves of the obligation the template was built against, in order
+    reserves: tuple[str, ...]
+    wire: bytes
+    amount_offset: int
+    blockhash_offset: int
+    price_offset: int
+    # Writable accounts other than the payer, to sample priority fees for
+    fee_accounts: list[str]
+    built_at: float
+
+    def repay_amount(self, position: PositionData, amount_usd: Optional[float] = None) -> tuple[int, float]:
+        """
+        (raw token amount, USD value) to repay against the position's current debt.
+
+        The whole debt when `amount_usd` is None, otherwise `amount_usd`
+        worth of it, capped at the whole debt.
+        """
+        debt = next((d for d in position.debts if d.mint == self.debt_mint), None)
+        if debt is None or debt.amount <= 0:
+            return 0, 0.0
+        fraction = 1.0
+        if amount_usd is not None and debt.value_usd > 0:
+            fraction = min(1.0, amount_usd / debt.value_usd)
+        return int(debt.amount * fraction * 10 ** self.decimals), debt.value_usd * fraction
+
+    def render(self, amount: int, blockhash: Hash, priority_fee: Optional[int] = None) -> str:
+        """
+        The transaction with `amount` and `blockhash` patched in, base64
+        encoded; `priority_fee` replaces the compute unit price it was built with
+        """
+        wire = bytearray(self.wire)
+        AMOUNT.pack_into(wire, self.amount_offset, amount)
+        if priority_fee is not None:
+            AMOUNT.pack_into(wire, self.price_offset, priority_fee)
+        wire[self.blockhash_offset:self.blockhash_offset + 32] = bytes(blockhash)
+        return base64.b64encode(wire).decode()
+
+
+def obligation_reserves(position: PositionData) -> tuple[str, ...]:
+    """Reserve keys of the position's deposits, then its borrows"""
+    return tuple(
+        entry.reserve or "" for entry in [*position.collaterals, *position.debts]
+    )
+
+
+def build_template(
+    position: PositionData,
+    debt: DebtPosition,
+    accounts: RepayAccounts,
+    decimals: int,
+    compute_units: int,
+    priority_fee_micro_lamports: int,
+) -> TransactionTemplate:
+    """Compile a repay of `debt` with the protocol's builder and locate its placeholders"""
+    repay = REPAY_BUILDERS[position.protocol](accounts)
+    instructions = [
+        set_compute_unit_limit(compute_units),
+        set_compute_unit_price(AMOUNT.unpack(PRICE_PLACEHOLDER)[0]),
+        *repay,
+    ]
+    message = Message.new_with_blockhash(instructions, accounts.payer, BLOCKHASH_PLACEHOLDER)
+    wire = bytearray(bytes(Transaction.new_unsigned(message)))
+    price_offset = _find_once(wire, PRICE_PLACEHOLDER, "Price")
+    AMOUNT.pack_into(wire, price_offset, priority_fee_micro_lamports)
+    return TransactionTemplate(
+        obligation_key=position.obligation_key,
+        protocol=position.protocol,
+        debt_mint=debt.mint,
+        decimals=decimals,
+        reserves=obligation_reserves(position),
+        wire=bytes(wire),
+        amount_offset=_find_once(wire, AMOUNT_PLACEHOLDER, "Amount"),
+        blockhash_offset=_find_once(wire, bytes(BLOCKHASH_PLACEHOLDER), "Blockhash"),
+        price_offset=price_offset,
+        fee_accounts=list(dict.fromkeys(
+            str(meta.pubkey) for ix in repay for meta in ix.accounts
+            if meta.is_writable and meta.pubkey != accounts.payer
+        )),
+        built_at=time.time(),
+    )
+
+
+class TemplateCache:
+    """
+    Repay templates keyed by obligation, for positions close to liquidation.
+
+    `prepare()` builds a template for each position's largest debt, using
+    the owning adapter's program id and cached reserve metadata, and
+    reuses it while that debt stays the largest. Templates not prepared
+    again within `ttl_seconds` are dropped. A recent blockhash is kept
+    warm alongside and refetched once older than `blockhash_max_age`.
+    """
+
+    def __init__(
+        self,
+        rpc: SolanaRpcClient,
+        payer: str,
+        adapters: Iterable,
+        compute_units: int = 400_000,
+        priority_fee_micro_lamports: int = 50_000,
+        blockhash_max_age: float = 20,
+        ttl_seconds: float = 120,
+    ):
+        self.rpc = rpc
+        self.adapters = {adapter.protocol: adapter for adapter in adapters}
+        self.compute_units = compute_units
+        self.priority_fee_micro_lamports = priority_fee_micro_lamports
+        self.blockhash_max_age = blockhash_max_age
+        self.ttl_seconds = ttl_seconds
+        try:
+            self.payer: Optional[Pubkey] = Pubkey.from_string(payer)
+        except ValueError:
+            logger.warning("tx_template_invalid_payer", payer=payer)
+            self.payer = None
+        self._templates: dict[str, TransactionTemplate] = {}
+        self._prepared_at: dict[str, float] = {}
+        self._blockhash: Optional[tuple[Hash, float]] = None
+        self._blockhash_task: Optional[asyncio.Task] = None
+        self.built = 0
+        self.build_errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.blockhash_fetches = 0
+
+    def prepare(self, positions: Iterable[PositionData]):
+        """Build or keep templates for these positions and warm the blockhash"""
+        if self.payer is None:
+            return
+        now = time.time()
+        for key in [k for k, at in self._prepared_at.items() if now - at > self.ttl_seconds]:
+            del self._prepared_at[key]
+            self._templates.pop(key, None)
+
+        prepared = False
+        for position in positions:
+            if not position.debts or position.protocol not in REPAY_BUILDERS:
+                continue
+            debt = max(position.debts, key=lambda d: d.value_usd)
+            template = self._templates.get(position.obligation_key)
+            if (
+                template is None
+                or template.debt_mint != debt.mint
+                or template.reserves != obligation_reserves(position)
+            ):
+                template = self._build(position, debt)
+                if template is None:
+                    continue
+                self._templates[position.obligation_key] = template
+            self._prepared_at[position.obligation_key] = now
+            prepared = True
+
+        if prepared and not self._blockhash_fresh(now) and self._blockhash_task is None:
+            self._blockhash_task = asyncio.create_task(self._refresh_blockhash())
+
+    def _build(self, position: PositionData, debt: DebtPosition) -> Optional[TransactionTemplate]:
+        adapter = self.adapters.get(position.protocol)
+        reserve = (
+            adapter.reserves.get(debt.reserve)
+            if adapter is not None and adapter.reserves is not None and debt.reserve
+            else None
+        )
+        if reserve is None or reserve.market is None:
+            return None
+        # klend refreshes every reserve of the obligation, so all of them
+        # and their oracles must be known before a Kamino repay can land
+        refreshed = []
+        if position.protocol == Protocol.KAMINO:
+            refreshed = [
+                adapter.reserves.get(key) if key else None
+                for key in obligation_reserves(position)
+            ]
+            if any(info is None or info.oracles is None for info in refreshed):
+                return None
+        try:
+            keys = [Pubkey.from_string(info.key) for info in refreshed]
+            deposits = len(position.collaterals)
+            accounts = RepayAccounts(
+                program=Pubkey.from_string(adapter.program_id),
+                payer=self.payer,
+                obligation=Pubkey.from_string(position.obligation_key),
+                reserve=Pubkey.from_string(reserve.key),
+                market=Pubkey.from_string(reserve.market),
+                mint=Pubkey.from_string(debt.mint),
+                deposit_reserves=keys[:deposits],
+                borrow_reserves=keys[deposits:],
+                oracles={
+                    key: tuple(Pubkey.from_string(o) if o else None for o in info.oracles)
+                    for key, info in zip(keys, refreshed)
+                },
+            )
+            template = build_template(
+                position, debt, accounts, reserve.decimals,
+                self.compute_units, self.priority_fee_micro_lamports,
+            )
+        except ValueError as e:
+            self.build_errors += 1
+            logger.warning(
+                "tx_template_build_error",
+                position=position.obligation_key[:16],
+                error=str(e),
+            )
+            return None
+        self.built += 1
+        return template
+
+    def get(self, obligation_key: str) -> Optional[TransactionTemplate]:
+        template = self._templates.get(obligation_key)
+        if template is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return template
+
+    def _blockhash_fresh(self, now: float) -> bool:
+        return self._blockhash is not None and now - self._blockhash[1] < self.blockhash_max_age
+
+    async def blockhash(self) -> Optional[Hash]:
+        """A recent blockhash, fetched only if the warm one has aged out"""
+        if not self._blockhash_fresh(time.time()):
+            if self._blockhash_task is None:
+                self._blockhash_task = asyncio.create_task(self._refresh_blockhash())
+            await asyncio.shield(self._blockhash_task)
+        return self._blockhash[0] if self._blockhash else None
+
+    async def _refresh_blockhash(self):
+        try:
+            self.blockhash_fetches += 1
+            result = await self.rpc.call("getLatestBlockhash", [{"commitment": "confirmed"}])
+            self._blockhash = (Hash.from_string(result["value"]["blockhash"]), time.time())
+        except Exception as e:
+            logger.error("blockhash_fetch_error", error=str(e))
+        finally:
+            self._blockhash_task = None
+
+    def get_stats(self) -> dict:
+        return {
+            "templates": len(self._templates),
+            "built": self.built,
+            "build_errors": self.build_errors,
+            "hits": self.hits,
+            "misses": self.misses,
+            "blockhash_fetches": self.blockhash_fetches,
+            "blockhash_age_seconds": (
+                round(time.time() - self._blockhash[1], 1) if self._blockhash else None
+            ),
+        }
+
+    async def close(self):
+        if self._blockhash_task is not None:
+            self._blockhash_task.cancel()
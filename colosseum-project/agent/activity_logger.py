@@ -7,6 +7,7 @@ Logs all AI office operations on-chain with cryptographic proof
 import hashlib
 import json
 import time
+from collections import deque
 from datetime import datetime
 from typing import Dict, Any, Optional
 import requests
@@ -17,12 +18,20 @@ class ActivityLogger:
     Each activity is: hashed (SHA256) → signed (Ed25519) → anchored (memo program)
     """
     
-    def __init__(self, agent_id: str, agent_name: str, wallet_address: Optional[str] = None):
+    def __init__(
+        self,
+        agent_id: str,
+        agent_name: str,
+        wallet_address: Optional[str] = None,
+        max_retained: int = 10_000
+    ):
         self.agent_id = agent_id
         self.agent_name = agent_name
         self.wallet_address = wallet_address
         self.activity_count = 0
-        self.activities = []
+        # Only the most recent activities are kept; counts cover all of them
+        self.activities = deque(maxlen=max_retained)
+        self.counts_by_type: Dict[str, int] = {}
     
     def create_activity_hash(self, activity_data: Dict[str, Any]) -> str:
         """
@@ -71,6 +80,7 @@ class ActivityLogger:
         # Store locally
         self.activities.append(activity)
         self.activity_count += 1
+        self.counts_by_type[activity_type] = self.counts_by_type.get(activity_type, 0) + 1
         
         print(f"✅ Activity logged: {activity_type} ({self.activity_count} total)")
         
@@ -218,7 +228,7 @@ class ActivityLogger:
     
     def export_activities(self, format: str = "json") -> str:
         """
-        Export all activities
+        Export retained activities
         
         Args:
             format: Output format (json, csv)
@@ -227,7 +237,7 @@ class ActivityLogger:
             Formatted activity data
         """
         if format == "json":
-            return json.dumps(self.activities, indent=2)
+            return json.dumps(list(self.activities), indent=2)
         elif format == "csv":
             # CSV export
             import csv
@@ -253,16 +263,13 @@ class ActivityLogger:
         """Get activity statistics"""
         stats = {
             "total_activities": self.activity_count,
-            "by_type": {},
+            "by_type": dict(self.counts_by_type),
+            "retained_activities": len(self.activities),
             "coordination_count": 0,
             "agents_involved": set()
         }
         
         for activity in self.activities:
-            # Count by type
-            activity_type = activity["activity_type"]
-            stats["by_type"][activity_type] = stats["by_type"].get(activity_type, 0) + 1
-            
             # Count coordination activities
             if activity.get("from_agent") and activity.get("to_agent"):
                 stats["coordination_count"] += 1